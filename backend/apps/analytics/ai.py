@@ -1,58 +1,272 @@
-import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncWeek
+from django.utils import timezone
+
 from apps.patients.models import Patient
+from apps.scheduling.models import Appointment
+from .cache import LOCK_KEY, WAIT_ATTEMPTS, WAIT_INTERVAL
+from .models import DemandForecast
+from .training import load_model, with_patient_history
+
+# Used when the date of birth is unknown (same default as Patient.age)
+DEFAULT_AGE = 30
+HIGH_RISK_ABOVE = 50
+MAX_RISK = 98
+
 
+def ages(dates_of_birth, today=None):
+    """
+    Ages in whole years for a sequence of dates of birth (None allowed),
+    as an int array.
+    """
+    today = today or date.today()
+    born = np.array(dates_of_birth, dtype='datetime64[D]')
+    missing = np.isnat(born)
+
+    years = born.astype('datetime64[Y]').astype(int) + 1970
+    month_start = born.astype('datetime64[M]')
+    months = month_start.astype(int) % 12 + 1
+    days = (born - month_start).astype(int) + 1
+
+    # Not had this year's birthday yet
+    before_birthday = months * 100 + days > today.month * 100 + today.day
+    result = today.year - years - before_birthday
+    result[missing] = DEFAULT_AGE
+    return result
 
 
 class NoShowPredictor:
-    def predict_risk(self, patient_id):
+    def score(self, no_show_history, distance_from_clinic, age):
         """
-        Calculates a risk score (0-100) based on patient history and demographics.
+        Risk scores (0-100) for arrays of patient features, computed for
+        all patients at once.
         """
-        try:
-            patient = Patient.objects.get(id=patient_id)
-
-            risk_score = 15
+        no_show_history = np.asarray(no_show_history)
+        distance_from_clinic = np.asarray(distance_from_clinic, dtype=float)
+        age = np.asarray(age)
 
-            if patient.no_show_history > 0:
-                risk_score += (patient.no_show_history * 15)
+        risk = np.full(no_show_history.shape, 15)
+        risk += np.where(no_show_history > 0, no_show_history * 15, 0)
+        risk += np.select([distance_from_clinic > 20, distance_from_clinic > 10], [15, 5], 0)
+        risk += np.where((age >= 18) & (age <= 25), 10, 0)
 
-            if patient.distance_from_clinic > 20:
-                risk_score += 15
-            elif patient.distance_from_clinic > 10:
-                risk_score += 5
+        return np.minimum(risk, MAX_RISK)
 
-            if 18 <= patient.age <= 25:
-                risk_score += 10
+    def predict_many(self, patient_ids):
+        """
+        Risk of each of the given patients, keyed by patient id, loaded
+        with a single query. Unknown ids are left out.
+        """
+        rows = list(Patient.objects.filter(id__in=patient_ids).values_list(
+            'id', 'no_show_history', 'distance_from_clinic', 'date_of_birth'
+        ))
+        if not rows:
+            return {}
 
-            risk_score = min(risk_score, 98)
+        ids, no_show_history, distance_from_clinic, dates_of_birth = zip(*rows)
+        scores = self.score(no_show_history, distance_from_clinic, ages(dates_of_birth))
 
-            return {
+        return {
+            patient_id: {
                 "patient_id": patient_id,
                 "risk_score": int(risk_score),
-                "risk_label": "High" if risk_score > 50 else "Low"
+                "risk_label": "High" if risk_score > HIGH_RISK_ABOVE else "Low"
             }
+            for patient_id, risk_score in zip(ids, scores.tolist())
+        }
 
-        except Patient.DoesNotExist:
+    def predict_appointments(self, appointment_ids):
+        """
+        Risk of each appointment, keyed by appointment id. Uses the trained
+        model (see apps.analytics.training) when there is one, from the
+        appointment's lead time, weekday, hour, service and the patient's
+        past no-shows; otherwise the patient-level rules of predict_many.
+        """
+        appointments = Appointment.objects.filter(id__in=appointment_ids)
+        model = load_model()
+
+        if model is None:
+            rows = list(appointments.values_list('id', 'patient_id'))
+            by_patient = self.predict_many({patient_id for _, patient_id in rows})
+            return {
+                appointment_id: {key: value for key, value in by_patient[patient_id].items() if key != 'patient_id'}
+                for appointment_id, patient_id in rows if patient_id in by_patient
+            }
+
+        # History up to each appointment's own start, so past ones don't count their own outcome
+        rows = list(with_patient_history(appointments).values_list(
+            'id', 'start_time', 'created_at', 'service_id', 'prior_visits', 'prior_no_shows'
+        ))
+        probabilities = model.predict_proba([row[1:] for row in rows]) if rows else []
+
+        results = {}
+        for row, probability in zip(rows, probabilities):
+            risk_score = min(int(round(probability * 100)), MAX_RISK)
+            results[row[0]] = {
+                "risk_score": risk_score,
+                "risk_label": "High" if risk_score > HIGH_RISK_ABOVE else "Low",
+                "model_version": model.version,
+            }
+        return results
+
+    def predict_risk(self, patient_id):
+        """
+        Calculates a risk score (0-100) based on patient history and demographics.
+        """
+        try:
+            patient_id = Patient._meta.pk.to_python(patient_id)
+        except ValidationError:
+            patient_id = None
+
+        result = self.predict_many([patient_id]).get(patient_id) if patient_id else None
+        if result is None:
             return {"error": "Patient not found", "risk_score": 0}
+        return result
 
 
 class DemandForecaster:
-    def predict_next_week(self, therapist=None):
+    """
+    Forecasts next week's appointments per weekday and hour from the
+    booking history: each (weekday, hour) slot is smoothed exponentially
+    over past weeks, so recent weeks weigh more. Forecasts are precomputed
+    nightly into DemandForecast; predict_next_week only reads them.
+    """
+    WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+    def history(self, weeks, now=None):
         """
-        Returns predicted appointment counts for the next 7 days.
+        Appointment counts of the last `weeks` full weeks as an array of
+        shape (therapists, weeks, 7 weekdays, 24 hours), from one grouped
+        query, together with the therapist ids of the first axis.
         """
-        forecast = []
-        days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+        local = timezone.localtime(now)
+        this_week = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        first_week = this_week - timedelta(weeks=weeks)
+
+        rows = Appointment.objects.filter(
+            start_time__gte=first_week, start_time__lt=this_week, therapist__isnull=False
+        ).exclude(
+            status=Appointment.Status.CANCELLED
+        ).annotate(
+            week=TruncWeek('start_time'), weekday=ExtractIsoWeekDay('start_time'), hour=ExtractHour('start_time')
+        ).values_list('therapist_id', 'week', 'weekday', 'hour').annotate(count=Count('id')).order_by()
+
+        rows = list(rows)
+        therapist_ids = sorted({row[0] for row in rows}, key=str)
+        index = {therapist_id: i for i, therapist_id in enumerate(therapist_ids)}
 
-        base_demand = [12, 15, 14, 16, 18, 8, 2]
+        counts = np.zeros((len(therapist_ids), weeks, 7, 24))
+        for therapist_id, week, weekday, hour, count in rows:
+            week_index = (timezone.localtime(week).date() - first_week.date()).days // 7
+            counts[index[therapist_id], week_index, weekday - 1, hour] += count
+        return counts, therapist_ids
 
-        for i, day in enumerate(days):
-            variation = random.randint(-2, 3)
-            count = max(0, base_demand[i] + variation)
+    def smooth(self, series, alpha):
+        """
+        Simple exponential smoothing along axis 1 (weeks) of `series`,
+        for every other index at once. Returns the level after the last week.
+        """
+        weeks = series.shape[1]
+        # Level = sum of alpha * (1 - alpha)^age * x, the oldest week seeding the level
+        weights = alpha * (1 - alpha) ** np.arange(weeks - 1, -1, -1)
+        weights[0] = (1 - alpha) ** (weeks - 1)
+        return np.tensordot(weights, series, axes=([0], [1]))
 
-            forecast.append({
-                "weekday": day,
-                "predicted_count": count
-            })
+    def to_days(self, hourly):
+        return [
+            {
+                "weekday": weekday,
+                "predicted_count": int(round(hourly[i].sum())),
+                "hourly": [round(float(value), 2) for value in hourly[i]],
+            }
+            for i, weekday in enumerate(self.WEEKDAYS)
+        ]
 
-        return forecast
\ No newline at end of file
+    def forecasts(self, now=None):
+        """
+        Fits the forecasts of the clinic and of every therapist with
+        history. Returns unsaved DemandForecast rows, the clinic's first.
+        """
+        counts, therapist_ids = self.history(settings.DEMAND_FORECAST_HISTORY_WEEKS, now)
+        clinic = counts.sum(axis=0)
+
+        # Weeks before the first booking aren't history, they would pull the forecast to zero
+        active_weeks = np.flatnonzero(clinic.sum(axis=(1, 2)))
+        start = active_weeks[0] if len(active_weeks) else len(clinic)
+        history_weeks = len(clinic) - start
+
+        if history_weeks:
+            series = np.concatenate([clinic[None], counts])[:, start:]
+            levels = self.smooth(series, settings.DEMAND_FORECAST_SMOOTHING)
+        else:
+            levels = np.zeros((1, 7, 24))
+
+        return [
+            DemandForecast(therapist_id=therapist_id, forecast=self.to_days(level), history_weeks=history_weeks)
+            for therapist_id, level in zip([None] + therapist_ids, levels)
+        ]
+
+    def precompute(self, now=None):
+        """
+        Replaces the stored forecasts. Returns the number of forecasts, or
+        None if another process is precomputing them right now: the two
+        would replace the table at the same time.
+        """
+        lock = LOCK_KEY.format(entry='demand-forecast')
+        if not cache.add(lock, 1, timeout=settings.ANALYTICS_CACHE_LOCK_TIMEOUT):
+            return None
+
+        try:
+            forecasts = self.forecasts(now)
+            with transaction.atomic():
+                DemandForecast.objects.all().delete()
+                DemandForecast.objects.bulk_create(forecasts)
+        finally:
+            cache.delete(lock)
+        return len(forecasts)
+
+    def stored(self, therapist_id=None):
+        """
+        The stored clinic forecast and, if `therapist_id` is given, that
+        therapist's one (all zeros without history), in one query.
+
+        If nothing was precomputed yet, one request precomputes while
+        concurrent ones wait for its rows. If those don't show up in time,
+        the forecasts are computed without storing them.
+        """
+        scope = Q(therapist__isnull=True)
+        if therapist_id is not None:
+            scope |= Q(therapist_id=therapist_id)
+
+        def read():
+            return {row.therapist_id: row.forecast for row in DemandForecast.objects.filter(scope)}
+
+        rows = read()
+        attempts = 0
+        while None not in rows:
+            if self.precompute() is None:
+                if attempts == WAIT_ATTEMPTS:
+                    rows = {row.therapist_id: row.forecast for row in self.forecasts()}
+                    break
+                attempts += 1
+                time.sleep(WAIT_INTERVAL)
+            rows = read()
+
+        if therapist_id is None:
+            return rows[None], None
+        return rows[None], rows.get(therapist_id) or self.to_days(np.zeros((7, 24)))
+
+    def predict_next_week(self, therapist=None):
+        """
+        Returns predicted appointment counts for the next 7 days.
+        """
+        clinic, personal = self.stored(therapist.pk if therapist else None)
+        return personal if therapist else clinic
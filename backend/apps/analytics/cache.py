@@ -0,0 +1,107 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'analytics:version'
+ENTRY_KEY = 'analytics:{name}:v{version}:{scope}'
+LOCK_KEY = 'analytics:lock:{entry}'
+STATS_KEY = 'analytics:stats:{name}:{outcome}'
+
+OUTCOMES = ('hit', 'miss')
+
+# How often and for how long a worker waits for another one computing the same entry
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 20
+
+
+def user_scope(user, today=None):
+    """
+    Part of the cache key that depends on who is asking: admins share one
+    entry, physios get one each, anyone else shares a 'default' entry.
+    """
+    if user.role == 'ADMIN' or user.is_superuser:
+        scope = 'admin'
+    elif user.role == 'PHYSIO':
+        scope = f'physio:{user.pk}'
+    else:
+        scope = 'default'
+    return f'{scope}:{today.isoformat()}' if today else scope
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seeded from the clock, so an evicted version never reuses an old number
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """
+    Bumps the version shared by all analytics entries, so they are
+    recomputed on their next request. Old entries expire on their own.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def count(name, outcome):
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    """
+    Hit and miss counts per cached view, e.g. {'dashboard': {'hit': 10, 'miss': 2}}.
+    With the local-memory backend these are per worker process.
+    """
+    names = ('dashboard', 'forecast')
+    keys = [STATS_KEY.format(name=name, outcome=outcome) for name in names for outcome in OUTCOMES]
+    values = cache.get_many(keys)
+    return {
+        name: {outcome: values.get(STATS_KEY.format(name=name, outcome=outcome), 0) for outcome in OUTCOMES}
+        for name in names
+    }
+
+
+def cached(name, scope, compute):
+    """
+    Returns the cached value of `name` for `scope`, calling `compute` on a miss.
+
+    Only one worker recomputes a missing entry at a time: it takes a short
+    lock with cache.add(), the others wait for its result instead of all
+    hitting the database together. If the result doesn't show up in time
+    they compute it themselves.
+    """
+    entry = ENTRY_KEY.format(name=name, version=current_version(), scope=scope)
+
+    value = cache.get(entry)
+    if value is not None:
+        count(name, 'hit')
+        return value
+
+    count(name, 'miss')
+    lock = LOCK_KEY.format(entry=entry)
+
+    if not cache.add(lock, 1, timeout=settings.ANALYTICS_CACHE_LOCK_TIMEOUT):
+        for _ in range(WAIT_ATTEMPTS):
+            time.sleep(WAIT_INTERVAL)
+            value = cache.get(entry)
+            if value is not None:
+                return value
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(entry, value, settings.ANALYTICS_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock)
+    return value
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.training import save_artifact, train
+
+
+class Command(BaseCommand):
+    help = 'Trains the no-show model on finished appointments and saves a new version of it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help='Share of the most recent appointments held out for evaluation.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Appointments loaded per query.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print the metrics without saving the model.')
+
+    def handle(self, *args, **options):
+        if not 0 < options['test_fraction'] < 1:
+            raise CommandError('--test-fraction must be between 0 and 1.')
+
+        try:
+            artifact, seconds = train(options['test_fraction'], options['chunk_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for name, metrics in artifact['metrics'].items():
+            auc = metrics['roc_auc']
+            self.stdout.write(
+                f"{name:>8}: {metrics['rows']} rows, no-show rate {metrics['no_show_rate']:.3f}, "
+                f"accuracy {metrics['accuracy']:.3f}, log loss {metrics['log_loss']:.4f}, "
+                f"AUC {'n/a' if auc is None else f'{auc:.3f}'}"
+            )
+        self.stdout.write(f"Trained in {seconds:.2f}s")
+
+        if options['dry_run']:
+            return
+        path = save_artifact(artifact)
+        self.stdout.write(self.style.SUCCESS(f"Saved model v{artifact['version']} to {path}"))
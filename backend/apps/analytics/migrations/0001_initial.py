@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('APPOINTMENTS', 'Appointments'), ('REVENUE', 'Revenue'), ('ACTIVE_PATIENTS', 'Active patients'), ('PENDING_INVOICES', 'Pending invoices')], max_length=20)),
+                ('day', models.DateField()),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('therapist', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('therapist__isnull', False)), fields=('metric', 'day', 'therapist'), name='dashboard_counter_therapist_uniq'), models.UniqueConstraint(condition=models.Q(('therapist__isnull', True)), fields=('metric', 'day'), name='dashboard_counter_clinic_uniq')],
+            },
+        ),
+    ]
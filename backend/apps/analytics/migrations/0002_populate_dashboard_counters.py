@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from apps.analytics.stats import rebuild_counters
+
+
+def populate_counters(apps, schema_editor):
+    rebuild_counters(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('billing', '0003_alter_invoice_status'),
+        ('patients', '0002_initial'),
+        ('scheduling', '0006_appointment_no_overlap_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:03
+
+import django.db.models.lookups
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_duplicate_clinic_rows(apps, schema_editor):
+    # Concurrent precomputes could leave several clinic-wide rows; keep the newest
+    DemandForecast = apps.get_model('analytics', 'DemandForecast')
+    newest = DemandForecast.objects.filter(therapist__isnull=True).order_by('-generated_at', '-id').first()
+    if newest:
+        DemandForecast.objects.filter(therapist__isnull=True).exclude(pk=newest.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_demand_forecast'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_clinic_rows, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='demandforecast',
+            name='demand_forecast_therapist_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='demandforecast',
+            constraint=models.UniqueConstraint(condition=models.Q(('therapist__isnull', False)), fields=('therapist',), name='demand_forecast_therapist_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='demandforecast',
+            constraint=models.UniqueConstraint(django.db.models.lookups.IsNull(models.F('therapist'), True), condition=models.Q(('therapist__isnull', True)), name='demand_forecast_clinic_uniq'),
+        ),
+    ]
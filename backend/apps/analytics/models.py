@@ -1,3 +1,90 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.lookups import IsNull
 
-# Create your models here.
+
+class DashboardCounter(models.Model):
+    """
+    Pre-aggregated numbers behind the dashboard, so it doesn't have to run
+    aggregates over the appointment, payment and invoice tables. Kept up to
+    date by apps.analytics.signals and rebuilt nightly (see stats.rebuild_counters).
+
+    - APPOINTMENTS: appointments starting on `day`, clinic-wide and per therapist.
+    - REVENUE: payments received in the month starting on `day`.
+    - ACTIVE_PATIENTS / PENDING_INVOICES: running totals, stored on a fixed `day`.
+    """
+
+    class Metric(models.TextChoices):
+        APPOINTMENTS = 'APPOINTMENTS', 'Appointments'
+        REVENUE = 'REVENUE', 'Revenue'
+        ACTIVE_PATIENTS = 'ACTIVE_PATIENTS', 'Active patients'
+        PENDING_INVOICES = 'PENDING_INVOICES', 'Pending invoices'
+
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    day = models.DateField()
+    # Empty for clinic-wide counters
+    therapist = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.metric} {self.day} {self.therapist_id or 'clinic'}: {self.value}"
+
+    class Meta:
+        constraints = [
+            # Two partial constraints, since NULL therapists never clash in a plain unique index
+            models.UniqueConstraint(
+                fields=['metric', 'day', 'therapist'],
+                condition=models.Q(therapist__isnull=False),
+                name='dashboard_counter_therapist_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['metric', 'day'],
+                condition=models.Q(therapist__isnull=True),
+                name='dashboard_counter_clinic_uniq'
+            ),
+        ]
+
+
+class DemandForecast(models.Model):
+    """
+    Expected appointments per weekday and hour for the coming week,
+    clinic-wide (no therapist) and per therapist. Recomputed nightly by
+    apps.analytics.tasks.precompute_demand_forecasts, so the forecast
+    endpoint only reads one row per scope.
+    """
+    therapist = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # [{"weekday": "Mon", "predicted_count": 12, "hourly": [24 expected counts]}, ...]
+    forecast = models.JSONField()
+    history_weeks = models.PositiveIntegerField(default=0)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast {self.therapist_id or 'clinic'} ({self.generated_at:%Y-%m-%d})"
+
+    class Meta:
+        # One row per therapist and a single clinic-wide row. As for DashboardCounter, two
+        # partial constraints: NULL therapists never clash in a plain unique index.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['therapist'],
+                condition=models.Q(therapist__isnull=False),
+                name='demand_forecast_therapist_uniq'
+            ),
+            models.UniqueConstraint(
+                IsNull(models.F('therapist'), True),
+                condition=models.Q(therapist__isnull=True),
+                name='demand_forecast_clinic_uniq'
+            ),
+        ]
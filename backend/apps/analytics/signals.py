@@ -0,0 +1,133 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.billing.models import Invoice, Payment
+from apps.patients.models import Patient
+from apps.patients.signals import patients_bulk_created
+from apps.scheduling.models import Appointment
+from apps.scheduling.signals import appointments_bulk_created
+from . import cache
+from .stats import (
+    ACTIVE_PATIENTS, PENDING_INVOICE_STATUSES, PENDING_INVOICES, REVENUE, TOTALS_DAY,
+    bump, bump_appointments, month_of
+)
+
+# Each tracked model remembers the part of its state the counters depend on
+# (read from __dict__, so deferred fields aren't loaded). On save the
+# counters move from the old state to the new one.
+
+
+def appointment_state(instance):
+    start = instance.__dict__.get('start_time')
+    if start is None:
+        return None
+    return timezone.localdate(start), instance.__dict__.get('therapist_id')
+
+
+def payment_state(instance):
+    payment_date, amount = instance.__dict__.get('payment_date'), instance.__dict__.get('amount')
+    if payment_date is None or amount is None:
+        return None
+    return month_of(payment_date), amount
+
+
+def invoice_state(instance):
+    return instance.__dict__.get('status') in PENDING_INVOICE_STATUSES
+
+
+def patient_state(instance):
+    return bool(instance.__dict__.get('is_active'))
+
+
+STATES = {
+    Appointment: appointment_state,
+    Payment: payment_state,
+    Invoice: invoice_state,
+    Patient: patient_state,
+}
+
+
+def apply_appointment(state, sign):
+    if state:
+        bump_appointments(state[0], state[1], sign)
+
+
+def apply_payment(state, sign):
+    if state:
+        bump(REVENUE, state[0], sign * state[1])
+
+
+def apply_invoice(state, sign):
+    bump(PENDING_INVOICES, TOTALS_DAY, sign if state else 0)
+
+
+def apply_patient(state, sign):
+    bump(ACTIVE_PATIENTS, TOTALS_DAY, sign if state else 0)
+
+
+APPLY = {
+    Appointment: apply_appointment,
+    Payment: apply_payment,
+    Invoice: apply_invoice,
+    Patient: apply_patient,
+}
+
+
+def remember_counted_state(sender, instance, **kwargs):
+    instance._counted_state = STATES[sender](instance)
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    new = STATES[sender](instance)
+    old = None if created else instance._counted_state
+    instance._counted_state = new
+
+    if old == new:
+        return
+    if not created and old is None and sender in (Appointment, Payment):
+        # Saved from a partially loaded instance; the nightly rebuild catches up.
+        return
+
+    APPLY[sender](old, -1)
+    APPLY[sender](new, 1)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    APPLY[sender](instance._counted_state, -1)
+
+
+@receiver(appointments_bulk_created)
+def count_bulk_appointments(sender, appointments, **kwargs):
+    for (day, therapist_id), total in Counter(appointment_state(a) for a in appointments).items():
+        bump_appointments(day, therapist_id, total)
+
+
+@receiver(patients_bulk_created)
+def count_bulk_patients(sender, patients, **kwargs):
+    bump(ACTIVE_PATIENTS, TOTALS_DAY, sum(patient_state(p) for p in patients))
+
+
+# Cached analytics responses are dropped once a change to their data commits.
+# Any save counts, the cache can't tell which fields a response depends on.
+
+@receiver(appointments_bulk_created)
+@receiver(patients_bulk_created)
+def invalidate_analytics_cache(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(cache.invalidate)
+
+
+# Connected per model, so saves and loads of other models don't go through these receivers
+for model in STATES:
+    post_init.connect(remember_counted_state, sender=model)
+    post_save.connect(update_counters_on_save, sender=model)
+    post_delete.connect(update_counters_on_delete, sender=model)
+    post_save.connect(invalidate_analytics_cache, sender=model)
+    post_delete.connect(invalidate_analytics_cache, sender=model)
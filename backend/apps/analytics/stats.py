@@ -0,0 +1,121 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+APPOINTMENTS = 'APPOINTMENTS'
+REVENUE = 'REVENUE'
+ACTIVE_PATIENTS = 'ACTIVE_PATIENTS'
+PENDING_INVOICES = 'PENDING_INVOICES'
+
+# Running totals are stored on this fixed day
+TOTALS_DAY = date(2000, 1, 1)
+
+PENDING_INVOICE_STATUSES = ['DRAFT', 'ISSUED']
+
+
+def month_of(value):
+    if isinstance(value, str):
+        value = parse_date(value)
+    return value.replace(day=1) if value else None
+
+
+def bump(metric, day, delta, therapist_id=None):
+    """
+    Adds delta to one counter with a single UPDATE, creating the row the
+    first time. Runs in the caller's transaction, so it rolls back with it.
+    """
+    if not delta or day is None:
+        return
+
+    from .models import DashboardCounter
+
+    lookup = {'metric': metric, 'day': day, 'therapist_id': therapist_id}
+    if DashboardCounter.objects.filter(**lookup).update(value=F('value') + delta):
+        return
+
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(**lookup, value=delta)
+    except IntegrityError:
+        # Created concurrently in the meantime
+        DashboardCounter.objects.filter(**lookup).update(value=F('value') + delta)
+
+
+def bump_appointments(day, therapist_id, delta):
+    bump(APPOINTMENTS, day, delta)
+    if therapist_id is not None:
+        bump(APPOINTMENTS, day, delta, therapist_id)
+
+
+def read_dashboard(today, therapist_id=None):
+    """
+    Every counter the dashboard shows, fetched with one indexed query.
+    `therapist_id` selects the therapist's own appointment count.
+    """
+    from .models import DashboardCounter
+
+    rows = DashboardCounter.objects.filter(
+        Q(metric=APPOINTMENTS, day=today, therapist_id=therapist_id)
+        | Q(metric=REVENUE, day=month_of(today), therapist_id=None)
+        | Q(metric__in=[ACTIVE_PATIENTS, PENDING_INVOICES], day=TOTALS_DAY, therapist_id=None)
+    ).values_list('metric', 'value')
+
+    values = defaultdict(int, rows)
+    return {
+        'total_patients': int(values[ACTIVE_PATIENTS]),
+        'today_appointments': int(values[APPOINTMENTS]),
+        'monthly_revenue': values[REVENUE],
+        'pending_invoices': int(values[PENDING_INVOICES]),
+    }
+
+
+def rebuild_counters(get_model):
+    """
+    Recomputes every counter from the source tables with grouped queries
+    and replaces the table in one transaction. Used by the nightly
+    reconciliation task and by the migration that creates the table
+    (hence the model getter, which can be the historical apps registry).
+    """
+    DashboardCounter = get_model('analytics', 'DashboardCounter')
+    Appointment = get_model('scheduling', 'Appointment')
+    Payment = get_model('billing', 'Payment')
+    Invoice = get_model('billing', 'Invoice')
+    Patient = get_model('patients', 'Patient')
+
+    counters = []
+    clinic_days = defaultdict(int)
+
+    per_day = Appointment.objects.annotate(
+        day=TruncDate('start_time', tzinfo=timezone.get_current_timezone())
+    ).values('day', 'therapist_id').annotate(total=Count('id')).order_by()
+
+    for row in per_day:
+        clinic_days[row['day']] += row['total']
+        if row['therapist_id'] is not None:
+            counters.append(DashboardCounter(
+                metric=APPOINTMENTS, day=row['day'], therapist_id=row['therapist_id'], value=row['total']
+            ))
+    counters += [DashboardCounter(metric=APPOINTMENTS, day=day, value=total) for day, total in clinic_days.items()]
+
+    per_month = Payment.objects.annotate(month=TruncMonth('payment_date')).values('month').annotate(
+        total=Sum('amount')
+    ).order_by()
+    counters += [DashboardCounter(metric=REVENUE, day=row['month'], value=row['total']) for row in per_month]
+
+    counters.append(DashboardCounter(
+        metric=ACTIVE_PATIENTS, day=TOTALS_DAY, value=Patient.objects.filter(is_active=True).count()
+    ))
+    counters.append(DashboardCounter(
+        metric=PENDING_INVOICES, day=TOTALS_DAY, value=Invoice.objects.filter(status__in=PENDING_INVOICE_STATUSES).count()
+    ))
+
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(counters)
+
+    return len(counters)
@@ -0,0 +1,45 @@
+from celery import shared_task
+from django.apps import apps
+
+from . import cache
+from .ai import DemandForecaster
+from .stats import rebuild_counters
+from .training import save_artifact, train
+
+
+@shared_task
+def reconcile_dashboard_counters():
+    """
+    Nightly rebuild of the dashboard counters from the source tables,
+    correcting any drift from writes that bypass signals (queryset
+    update(), raw SQL, partially loaded saves).
+    """
+    count = rebuild_counters(apps.get_model)
+    return f"Rebuilt {count} dashboard counters."
+
+
+@shared_task
+def precompute_demand_forecasts():
+    """
+    Nightly refit of the weekday/hour demand forecasts, so the forecast
+    endpoint only reads stored rows.
+    """
+    count = DemandForecaster().precompute()
+    if count is None:
+        return "Skipped: the forecasts are being precomputed by another process."
+    cache.invalidate()
+    return f"Precomputed {count} demand forecasts."
+
+
+@shared_task
+def train_no_show_model():
+    """
+    Weekly retraining of the no-show model. Other processes load the new
+    version within NO_SHOW_MODEL_RELOAD_SECONDS.
+    """
+    try:
+        artifact, seconds = train()
+    except ValueError as exc:
+        return f"Skipped: {exc}"
+    save_artifact(artifact)
+    return f"Trained no-show model v{artifact['version']} in {seconds:.1f}s (hold-out AUC {artifact['metrics']['holdout']['roc_auc']})."
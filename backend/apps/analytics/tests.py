@@ -1,7 +1,33 @@
-from django.test import TestCase
+import json
+import tempfile
+import numpy as np
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
 from apps.patients.models import Patient
-from apps.analytics.ai import NoShowPredictor
-from datetime import date
+from apps.analytics.ai import DemandForecaster, NoShowPredictor, ages
+from apps.analytics import cache as analytics_cache
+from apps.analytics.models import DashboardCounter, DemandForecast
+from apps.analytics.stats import read_dashboard, rebuild_counters
+from apps.analytics.training import (
+    ARTIFACT_NAME, load_model, reset_model, save_artifact, train, with_patient_history
+)
+from apps.billing.models import Invoice, Payment
+from apps.scheduling.models import Appointment, Service
+from datetime import date, timedelta
+from decimal import Decimal
+
+User = get_user_model()
 
 
 class AIModelTests(TestCase):
@@ -33,4 +59,441 @@ class AIModelTests(TestCase):
 
         predictor = NoShowPredictor()
         risk = predictor.predict_risk(bad_patient.id)
-        self.assertGreater(risk['risk_score'], 50)
\ No newline at end of file
+        self.assertGreater(risk['risk_score'], 50)
+
+
+class DashboardCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.physios = [
+            User.objects.create_user(email=f'physio{n}@test.com', password='password123', role='PHYSIO')
+            for n in range(2)
+        ]
+        self.patient = Patient.objects.create(first_name="Jane", last_name="Roe", tax_id="DASH123456")
+        Patient.objects.create(first_name="Old", last_name="Patient", tax_id="DASH999999", is_active=False)
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+
+        for hours, physio in ((0, self.physios[0]), (1, self.physios[0]), (2, self.physios[1])):
+            self.book(physio, self.now.replace(hour=hours, minute=0, second=0, microsecond=0))
+        self.book(self.physios[0], self.now + timedelta(days=2))
+
+        self.invoice = Invoice.objects.create(patient=self.patient, total_amount=100)
+        Invoice.objects.create(patient=self.patient, total_amount=50, status=Invoice.Status.PAID)
+        Payment.objects.create(invoice=self.invoice, amount=Decimal('40.00'), payment_date=self.today)
+        Payment.objects.create(invoice=self.invoice, amount=Decimal('10.00'), payment_date=self.today - timedelta(days=40))
+
+    def book(self, physio, start):
+        return Appointment.objects.create(
+            patient=self.patient, therapist=physio, service=self.service,
+            start_time=start, end_time=start + timedelta(minutes=30)
+        )
+
+    def counters(self):
+        return set(DashboardCounter.objects.values_list('metric', 'day', 'therapist_id', 'value'))
+
+    def test_dashboard_is_one_query(self):
+        self.client.force_authenticate(user=self.admin)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/dashboard/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_patients'], 1)
+        self.assertEqual(response.data['today_appointments'], 3)
+        self.assertEqual(response.data['monthly_revenue'], Decimal('40.00') + (
+            Decimal('10.00') if (self.today - timedelta(days=40)).replace(day=1) == self.today.replace(day=1) else 0
+        ))
+        self.assertEqual(response.data['pending_invoices'], 1)
+
+    def test_physio_sees_own_appointments(self):
+        self.client.force_authenticate(user=self.physios[0])
+        response = self.client.get('/api/analytics/dashboard/')
+
+        self.assertEqual(response.data['today_appointments'], 2)
+        self.assertEqual(response.data['monthly_revenue'], 0)
+
+    def test_changes_move_the_counters(self):
+        appointment = Appointment.objects.filter(therapist=self.physios[1]).get()
+        appointment.start_time += timedelta(days=2)
+        appointment.end_time += timedelta(days=2)
+        appointment.therapist = self.physios[0]
+        appointment.save()
+        self.assertEqual(read_dashboard(self.today)['today_appointments'], 2)
+        self.assertEqual(read_dashboard(self.today + timedelta(days=2), self.physios[0].pk)['today_appointments'], 2)
+
+        Appointment.objects.filter(therapist=self.physios[0]).first().delete()
+        self.invoice.status = Invoice.Status.PAID
+        self.invoice.save()
+        self.patient.is_active = False
+        self.patient.save()
+
+        stats = read_dashboard(self.today)
+        self.assertEqual(stats['pending_invoices'], 0)
+        self.assertEqual(stats['total_patients'], 0)
+
+    def test_incremental_counters_match_a_rebuild(self):
+        appointment = Appointment.objects.filter(therapist=self.physios[1]).get()
+        appointment.start_time += timedelta(days=1)
+        appointment.end_time += timedelta(days=1)
+        appointment.save()
+        Payment.objects.filter(amount=Decimal('40.00')).get().delete()
+
+        incremental = {c for c in self.counters() if c[3]}
+        rebuild_counters(apps.get_model)
+        self.assertEqual(incremental, self.counters())
+
+
+class AnalyticsCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        self.patient = Patient.objects.create(first_name="Jane", last_name="Roe", tax_id="CACHE12345")
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+
+    def book(self):
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=self.patient, therapist=self.physio, service=self.service,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+    def test_repeated_requests_are_served_from_cache(self):
+        self.client.force_authenticate(user=self.admin)
+        self.client.get('/api/analytics/dashboard/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/analytics/dashboard/')
+
+        self.assertEqual(response.data['total_patients'], 1)
+        self.assertEqual(analytics_cache.cache_stats()['dashboard'], {'hit': 1, 'miss': 1})
+
+    def test_roles_get_their_own_entries(self):
+        self.book()
+        self.client.force_authenticate(user=self.admin)
+        self.client.get('/api/analytics/dashboard/')
+
+        self.client.force_authenticate(user=self.physio)
+        response = self.client.get('/api/analytics/dashboard/')
+
+        self.assertEqual(response.data['role'], 'PHYSIO')
+        self.assertEqual(response.data['monthly_revenue'], 0)
+        self.assertEqual(analytics_cache.cache_stats()['dashboard']['miss'], 2)
+
+    def test_shared_entries_report_the_callers_role(self):
+        receptionist = User.objects.create_user(email='desk@test.com', password='password123', role='RECEPTIONIST')
+        patient_user = User.objects.create_user(email='jane@test.com', password='password123', role='PATIENT')
+
+        self.client.force_authenticate(user=receptionist)
+        self.assertEqual(self.client.get('/api/analytics/dashboard/').data['role'], 'RECEPTIONIST')
+
+        self.client.force_authenticate(user=patient_user)
+        response = self.client.get('/api/analytics/dashboard/')
+
+        self.assertEqual(response.data['role'], 'PATIENT')
+        self.assertEqual(analytics_cache.cache_stats()['dashboard'], {'hit': 1, 'miss': 1})
+
+    def test_saves_invalidate_cached_responses(self):
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.get('/api/analytics/dashboard/').data['today_appointments'], 0)
+
+        self.book()
+
+        self.assertEqual(self.client.get('/api/analytics/dashboard/').data['today_appointments'], 1)
+
+    def test_waits_for_the_worker_already_computing(self):
+        entry = analytics_cache.ENTRY_KEY.format(name='dashboard', version=analytics_cache.current_version(), scope='admin')
+        cache.add(analytics_cache.LOCK_KEY.format(entry=entry), 1)
+
+        def other_worker_finishes(seconds):
+            cache.set(entry, {'from': 'other worker'})
+
+        with mock.patch.object(analytics_cache.time, 'sleep', side_effect=other_worker_finishes):
+            value = analytics_cache.cached('dashboard', 'admin', compute=mock.Mock())
+
+        self.assertEqual(value, {'from': 'other worker'})
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.force_authenticate(user=self.physio)
+        self.assertEqual(self.client.get('/api/analytics/cache-stats/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        self.assertIn('forecast', self.client.get('/api/analytics/cache-stats/').data)
+
+
+@override_settings(NO_SHOW_MODEL_DIR=Path(tempfile.gettempdir()) / 'no-show-models-untrained')
+class BatchRiskTests(APITestCase):
+    def setUp(self):
+        reset_model()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        today = date.today()
+        profiles = [
+            (0, 5.0, None),
+            (1, 12.0, date(today.year - 20, 1, 1)),
+            (5, 50.0, date(1990, 5, 5)),
+            (2, 25.0, date(today.year - 25, today.month, today.day)),
+        ]
+        self.patients = [
+            Patient.objects.create(
+                first_name=f"P{n}", last_name="Risk", tax_id=f"RISK{n:06d}",
+                no_show_history=history, distance_from_clinic=distance, date_of_birth=born
+            )
+            for n, (history, distance, born) in enumerate(profiles)
+        ]
+
+    def expected(self, patient):
+        score = 15 + patient.no_show_history * 15
+        score += 15 if patient.distance_from_clinic > 20 else 5 if patient.distance_from_clinic > 10 else 0
+        score += 10 if 18 <= patient.age <= 25 else 0
+        return min(score, 98)
+
+    def test_batch_matches_per_patient_rules_with_one_query(self):
+        with self.assertNumQueries(1):
+            risks = NoShowPredictor().predict_many([p.id for p in self.patients])
+
+        for patient in self.patients:
+            self.assertEqual(risks[patient.id]['risk_score'], self.expected(patient))
+            self.assertEqual(NoShowPredictor().predict_risk(patient.id)['risk_score'], self.expected(patient))
+
+    def test_ages_handle_birthdays_and_missing_dates(self):
+        today = date(2024, 3, 1)
+        born = [date(2000, 2, 29), date(2000, 3, 1), date(2000, 3, 2), None]
+        self.assertEqual(ages(born, today).tolist(), [24, 24, 23, 30])
+
+    def test_batch_endpoint(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post('/api/analytics/risk/', {
+            'patient_ids': [str(p.id) for p in self.patients[:2]] + ['9f1c2f1e-0000-4000-8000-000000000000']
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.post('/api/analytics/risk/', {'patient_ids': ['not-an-id']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_appointment_list_includes_risk(self):
+        physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        start = timezone.now() + timedelta(days=1)
+        for n, patient in enumerate(self.patients):
+            Appointment.objects.create(
+                patient=patient, therapist=physio, service=service,
+                start_time=start + timedelta(hours=n), end_time=start + timedelta(hours=n, minutes=30)
+            )
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/scheduling/appointments/', {'include_risk': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = {p.id: self.expected(p) for p in self.patients}
+        for row in response.data:
+            self.assertEqual(row['risk_score'], expected[row['patient']])
+
+        self.assertNotIn('risk_score', self.client.get('/api/scheduling/appointments/').data[0])
+
+
+class NoShowTrainingTests(APITestCase):
+    def setUp(self):
+        self.model_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(NO_SHOW_MODEL_DIR=self.model_dir.name, NO_SHOW_MIN_TRAINING_ROWS=20)
+        self.settings.enable()
+        reset_model()
+        self.addCleanup(self.model_dir.cleanup)
+        self.addCleanup(self.settings.disable)
+        self.addCleanup(reset_model)
+
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.patients = [
+            Patient.objects.create(first_name=f"P{n}", last_name="History", tax_id=f"HIST{n:06d}")
+            for n in range(4)
+        ]
+
+    def monday(self, weeks_ago, hour):
+        today = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+        return today - timedelta(days=today.weekday(), weeks=weeks_ago) + timedelta(hours=hour - today.hour)
+
+    def make_history(self):
+        # Early Monday sessions are missed, afternoon ones on Wednesday are kept
+        appointments = []
+        for week in range(1, 21):
+            for n, patient in enumerate(self.patients):
+                for start, status_ in (
+                    (self.monday(week, 8), Appointment.Status.NO_SHOW),
+                    (self.monday(week, 14) + timedelta(days=2), Appointment.Status.COMPLETED),
+                ):
+                    start += timedelta(minutes=30 * n)
+                    appointments.append(Appointment(
+                        patient=patient, therapist=self.physio, service=self.service,
+                        start_time=start, end_time=start + timedelta(minutes=30), status=status_
+                    ))
+        Appointment.objects.bulk_create(appointments)
+
+    def test_command_trains_and_saves_a_model(self):
+        self.make_history()
+        out = StringIO()
+
+        call_command('train_no_show_model', stdout=out)
+
+        self.assertIn('holdout', out.getvalue())
+        self.assertIn('Trained in', out.getvalue())
+        self.assertEqual(len(list(Path(self.model_dir.name).glob('no_show_v*.json'))), 1)
+
+        reset_model()
+        model = load_model()
+        self.assertGreater(model.metrics['holdout']['roc_auc'], 0.9)
+
+        risky, safe = model.predict_proba([
+            (self.monday(-1, 8), timezone.now(), self.service.pk, 10, 5),
+            (self.monday(-1, 14) + timedelta(days=2), timezone.now(), self.service.pk, 10, 5),
+        ])
+        self.assertGreater(risky, safe)
+
+    def test_appointment_list_uses_trained_model(self):
+        self.make_history()
+        call_command('train_no_show_model', stdout=StringIO())
+        for hour in (8, 14):
+            start = self.monday(-1, hour)
+            Appointment.objects.create(
+                patient=self.patients[0], therapist=self.physio, service=self.service,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/scheduling/appointments/', {
+            'include_risk': 'true', 'start_time__gte': self.monday(-1, 0).isoformat()
+        })
+
+        early, late = response.data
+        self.assertGreater(early['risk_score'], late['risk_score'])
+
+    def test_history_stops_at_each_appointment(self):
+        self.make_history()
+        rows = with_patient_history(
+            Appointment.objects.filter(patient=self.patients[0]).order_by('start_time')
+        ).values_list('prior_visits', 'prior_no_shows')
+
+        # Alternating no-show / completed sessions, each counted only by the later ones
+        self.assertEqual(list(rows[:4]), [(0, 0), (1, 1), (2, 1), (3, 2)])
+
+    def test_model_trained_elsewhere_is_picked_up(self):
+        self.make_history()
+        self.assertIsNone(load_model())
+
+        # As written by another process, e.g. the weekly training task
+        artifact, _ = train()
+        path = Path(self.model_dir.name) / ARTIFACT_NAME.format(version=artifact['version'])
+        path.write_text(json.dumps(artifact))
+
+        self.assertIsNone(load_model())
+        with override_settings(NO_SHOW_MODEL_RELOAD_SECONDS=0):
+            self.assertEqual(load_model().version, artifact['version'])
+
+    def test_unreadable_artifact_keeps_the_previous_model(self):
+        self.make_history()
+        artifact, _ = train()
+        save_artifact(artifact)
+
+        # A newer artifact that is still being copied in
+        newer = Path(self.model_dir.name) / ARTIFACT_NAME.format(version='99991231000000')
+        newer.write_text(json.dumps(artifact)[:100])
+
+        with override_settings(NO_SHOW_MODEL_RELOAD_SECONDS=0), self.assertLogs('apps.analytics.training', 'WARNING'):
+            self.assertEqual(load_model().version, artifact['version'])
+        self.assertEqual([p.name for p in Path(self.model_dir.name).glob('*.tmp')], [])
+
+    def test_refuses_to_train_on_too_little_history(self):
+        with self.assertRaises(CommandError):
+            call_command('train_no_show_model', stdout=StringIO())
+        self.assertIsNone(load_model())
+
+
+class DemandForecastTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.physios = [
+            User.objects.create_user(email=f'physio{n}@test.com', password='password123', role='PHYSIO')
+            for n in range(3)
+        ]
+        self.patient = Patient.objects.create(first_name="Jane", last_name="Roe", tax_id="FORECAST01")
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+
+        # Every week: physio 0 on Monday 10:00 and physio 1 on Tuesday 15:00, for four weeks
+        now = timezone.localtime()
+        monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        appointments = []
+        for week in range(1, 5):
+            for physio, start in (
+                (self.physios[0], monday - timedelta(weeks=week) + timedelta(hours=10)),
+                (self.physios[1], monday - timedelta(weeks=week, hours=-24 - 15)),
+            ):
+                appointments.append(Appointment(
+                    patient=self.patient, therapist=physio, service=self.service,
+                    start_time=start, end_time=start + timedelta(minutes=30)
+                ))
+        cancelled = monday - timedelta(weeks=1) + timedelta(hours=11)
+        appointments.append(Appointment(
+            patient=self.patient, therapist=self.physios[0], service=self.service,
+            start_time=cancelled, end_time=cancelled + timedelta(minutes=30), status=Appointment.Status.CANCELLED
+        ))
+        Appointment.objects.bulk_create(appointments)
+
+    def test_forecast_follows_the_weekly_pattern(self):
+        self.assertEqual(DemandForecaster().precompute(), 3)
+
+        clinic = DemandForecaster().predict_next_week()
+        self.assertEqual([day['predicted_count'] for day in clinic], [1, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(clinic[0]['hourly'][10], 1.0)
+        self.assertEqual(clinic[0]['hourly'][11], 0.0)
+
+        personal = DemandForecaster().predict_next_week(therapist=self.physios[0])
+        self.assertEqual([day['predicted_count'] for day in personal], [1, 0, 0, 0, 0, 0, 0])
+
+    def test_recent_weeks_weigh_more(self):
+        level = DemandForecaster().smooth(np.array([[0.0, 0.0, 0.0, 4.0]]), alpha=0.3)
+        self.assertGreater(level[0], 1.0)
+        self.assertAlmostEqual(DemandForecaster().smooth(np.full((1, 6), 3.0), alpha=0.3)[0], 3.0)
+
+    def test_view_reads_precomputed_rows_in_one_query(self):
+        DemandForecaster().precompute()
+        self.client.force_authenticate(user=self.physios[2])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/forecast/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['clinic_forecast'][1]['predicted_count'], 1)
+        # No history yet
+        self.assertEqual(sum(day['predicted_count'] for day in response.data['my_forecast']), 0)
+
+    def test_first_request_computes_missing_forecasts(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/analytics/forecast/')
+
+        self.assertEqual(response.data['clinic_forecast'][0]['predicted_count'], 1)
+        self.assertIsNone(response.data['my_forecast'])
+
+    def test_cold_requests_do_not_precompute_concurrently(self):
+        # Another process holds the precompute lock and never finishes
+        cache.add(analytics_cache.LOCK_KEY.format(entry='demand-forecast'), 1)
+        self.assertIsNone(DemandForecaster().precompute())
+
+        with mock.patch('apps.analytics.ai.WAIT_INTERVAL', 0):
+            clinic, _ = DemandForecaster().stored()
+
+        # Served from an unstored forecast, leaving the table to the lock holder
+        self.assertEqual(clinic[0]['predicted_count'], 1)
+        self.assertFalse(DemandForecast.objects.exists())
+
+    def test_single_clinic_row(self):
+        DemandForecaster().precompute()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DemandForecast.objects.create(therapist=None, forecast=[])
+
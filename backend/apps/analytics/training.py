@@ -0,0 +1,287 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.scheduling.models import Appointment
+
+logger = logging.getLogger(__name__)
+
+# Only finished appointments have a known outcome
+OUTCOME_STATUSES = [Appointment.Status.COMPLETED, Appointment.Status.NO_SHOW]
+
+ARTIFACT_NAME = 'no_show_v{version}.json'
+
+BASE_FEATURES = ['lead_days', 'prior_visits', 'prior_no_show_rate']
+
+
+def feature_names(service_ids):
+    return (
+        BASE_FEATURES
+        + [f'weekday_{day}' for day in range(7)]
+        + [f'hour_{hour}' for hour in range(24)]
+        + [f'service_{service_id}' for service_id in service_ids]
+    )
+
+
+def history_features(visits, no_shows):
+    # Smoothed, so a first-time patient isn't scored like one who never misses
+    return math.log1p(visits), no_shows / (visits + 1)
+
+
+def encode(rows, service_index, width):
+    """
+    Feature matrix for rows of (start_time, created_at, service_id, visits,
+    no_shows), visits and no_shows being the patient's finished
+    appointments before this one.
+    """
+    tz = timezone.get_current_timezone()
+    features = np.zeros((len(rows), width), dtype=np.float64)
+    offset = len(BASE_FEATURES)
+
+    for i, (start, created, service_id, visits, no_shows) in enumerate(rows):
+        local = start.astimezone(tz)
+        lead_days = max((start - created).total_seconds(), 0) / 86400 if created else 0
+        features[i, 0] = math.log1p(lead_days)
+        features[i, 1], features[i, 2] = history_features(visits, no_shows)
+        features[i, offset + local.weekday()] = 1
+        features[i, offset + 7 + local.hour] = 1
+        column = service_index.get(str(service_id))
+        if column is not None:
+            features[i, column] = 1
+    return features
+
+
+def training_data(chunk_size=None):
+    """
+    Streams the finished appointments in start order, in chunks, and returns
+    (features, labels, feature names, service ids). The patient history of
+    each row only counts appointments before it, like at prediction time.
+    """
+    chunk_size = chunk_size or settings.NO_SHOW_TRAINING_CHUNK_SIZE
+    service_ids = [
+        str(pk) for pk in
+        Appointment.objects.filter(status__in=OUTCOME_STATUSES).values_list('service_id', flat=True).distinct()
+    ]
+    names = feature_names(service_ids)
+    service_index = {service_id: names.index(f'service_{service_id}') for service_id in service_ids}
+
+    rows = Appointment.objects.filter(status__in=OUTCOME_STATUSES).order_by('start_time', 'id').values_list(
+        'patient_id', 'start_time', 'created_at', 'service_id', 'status'
+    ).iterator(chunk_size=chunk_size)
+
+    history = {}
+    chunks, labels, chunk = [], [], []
+    for patient_id, start, created, service_id, status in rows:
+        visits, no_shows = history.get(patient_id, (0, 0))
+        chunk.append((start, created, service_id, visits, no_shows))
+        missed = status == Appointment.Status.NO_SHOW
+        labels.append(missed)
+        history[patient_id] = (visits + 1, no_shows + missed)
+
+        if len(chunk) == chunk_size:
+            chunks.append(encode(chunk, service_index, len(names)))
+            chunk = []
+    if chunk:
+        chunks.append(encode(chunk, service_index, len(names)))
+
+    features = np.vstack(chunks) if chunks else np.zeros((0, len(names)))
+    return features, np.array(labels, dtype=np.float64), names, service_ids
+
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+def fit_logistic_regression(features, labels, iterations=500, learning_rate=0.5, l2=1e-3):
+    """
+    L2-regularized logistic regression fitted by full-batch gradient descent
+    on standardized features. Returns (weights, bias, mean, scale).
+    """
+    mean = features.mean(axis=0)
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    x = (features - mean) / scale
+
+    weights = np.zeros(x.shape[1])
+    bias = 0.0
+    count = len(labels)
+    for _ in range(iterations):
+        error = sigmoid(x @ weights + bias) - labels
+        weights -= learning_rate * (x.T @ error / count + l2 * weights)
+        bias -= learning_rate * error.mean()
+
+    return weights, bias, mean, scale
+
+
+def roc_auc(labels, scores):
+    """Area under the ROC curve from score ranks (ties averaged)."""
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    if not positives or not negatives:
+        return None
+
+    # Average rank of each distinct score, so ties count half
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def evaluate(labels, probabilities):
+    eps = 1e-12
+    log_loss = -np.mean(labels * np.log(probabilities + eps) + (1 - labels) * np.log(1 - probabilities + eps))
+    return {
+        'rows': int(len(labels)),
+        'no_show_rate': float(labels.mean()) if len(labels) else 0.0,
+        'accuracy': float(((probabilities > 0.5) == labels).mean()) if len(labels) else 0.0,
+        'log_loss': float(log_loss) if len(labels) else 0.0,
+        'roc_auc': roc_auc(labels, probabilities),
+    }
+
+
+class NoShowModel:
+    """
+    A trained no-show model: per-appointment probability of a no-show.
+    """
+
+    def __init__(self, artifact):
+        self.version = artifact['version']
+        self.features = artifact['features']
+        self.service_ids = artifact['service_ids']
+        self.metrics = artifact.get('metrics', {})
+        self.weights = np.array(artifact['weights'])
+        self.bias = artifact['bias']
+        self.mean = np.array(artifact['mean'])
+        self.scale = np.array(artifact['scale'])
+        self.service_index = {
+            service_id: self.features.index(f'service_{service_id}') for service_id in self.service_ids
+        }
+
+    def predict_proba(self, rows):
+        """
+        No-show probabilities for rows of (start_time, created_at,
+        service_id, visits, no_shows), see encode().
+        """
+        features = encode(rows, self.service_index, len(self.features))
+        return sigmoid((features - self.mean) / self.scale @ self.weights + self.bias)
+
+
+def train(test_fraction=0.2, chunk_size=None):
+    """
+    Fits the model on the appointment history and holds out the most recent
+    `test_fraction` of appointments to measure it. Returns (artifact, seconds).
+    """
+    started = time.perf_counter()
+    features, labels, names, service_ids = training_data(chunk_size)
+    if len(labels) < settings.NO_SHOW_MIN_TRAINING_ROWS:
+        raise ValueError(
+            f"Only {len(labels)} finished appointments, at least {settings.NO_SHOW_MIN_TRAINING_ROWS} are needed."
+        )
+
+    # Rows are in time order: test on the most recent ones, as in production
+    split = int(len(labels) * (1 - test_fraction))
+    weights, bias, mean, scale = fit_logistic_regression(features[:split], labels[:split])
+    probabilities = sigmoid((features[split:] - mean) / scale @ weights + bias)
+
+    artifact = {
+        'version': timezone.now().strftime('%Y%m%d%H%M%S'),
+        'features': names,
+        'service_ids': service_ids,
+        'weights': weights.tolist(),
+        'bias': float(bias),
+        'mean': mean.tolist(),
+        'scale': scale.tolist(),
+        'metrics': {
+            'train': evaluate(labels[:split], sigmoid((features[:split] - mean) / scale @ weights + bias)),
+            'holdout': evaluate(labels[split:], probabilities),
+        },
+    }
+    return artifact, time.perf_counter() - started
+
+
+def save_artifact(artifact):
+    """
+    Writes the artifact next to the previous versions and makes it the
+    model of this process. Other processes pick it up on their next look
+    at NO_SHOW_MODEL_DIR (see load_model).
+    """
+    directory = Path(settings.NO_SHOW_MODEL_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / ARTIFACT_NAME.format(version=artifact['version'])
+    # Written aside and renamed, so load_model never reads a half-written file
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+        f.write(json.dumps(artifact))
+    os.replace(f.name, path)
+
+    global _model, _model_path, _model_checked
+    with _model_lock:
+        _model, _model_path, _model_checked = NoShowModel(artifact), path, time.monotonic()
+    return path
+
+
+_model = None
+_model_path = None
+# time.monotonic() of the last look at NO_SHOW_MODEL_DIR, None before the first one
+_model_checked = None
+_model_lock = Lock()
+
+
+def _model_is_fresh():
+    return _model_checked is not None and time.monotonic() - _model_checked < settings.NO_SHOW_MODEL_RELOAD_SECONDS
+
+
+def load_model():
+    """
+    The latest trained model, or None if no model was trained yet. It is
+    kept in memory, and NO_SHOW_MODEL_DIR is looked at again every
+    NO_SHOW_MODEL_RELOAD_SECONDS, so a process picks up models trained
+    elsewhere (e.g. by the weekly task) without a restart.
+    """
+    global _model, _model_path, _model_checked
+    if _model_is_fresh():
+        return _model
+
+    with _model_lock:
+        if not _model_is_fresh():
+            paths = sorted(Path(settings.NO_SHOW_MODEL_DIR).glob(ARTIFACT_NAME.format(version='*')))
+            if paths and paths[-1] != _model_path:
+                try:
+                    _model, _model_path = NoShowModel(json.loads(paths[-1].read_text())), paths[-1]
+                except (OSError, json.JSONDecodeError):
+                    # Tried again on the next look; meanwhile the previous model keeps serving
+                    logger.warning("Could not load the no-show model %s.", paths[-1], exc_info=True)
+            _model_checked = time.monotonic()
+    return _model
+
+
+def reset_model():
+    global _model, _model_path, _model_checked
+    with _model_lock:
+        _model, _model_path, _model_checked = None, None, None
+
+
+def with_patient_history(queryset):
+    """
+    Annotates appointments with prior_visits and prior_no_shows: the
+    patient's finished appointments that started before each one, as
+    counted by training_data. Two subqueries, no extra round trip.
+    """
+    prior = Appointment.objects.filter(
+        patient_id=OuterRef('patient_id'), start_time__lt=OuterRef('start_time'), status__in=OUTCOME_STATUSES
+    ).order_by().values('patient_id')
+    return queryset.annotate(
+        prior_visits=Coalesce(Subquery(prior.annotate(n=Count('id')).values('n')), 0),
+        prior_no_shows=Coalesce(Subquery(
+            prior.annotate(n=Count('id', filter=Q(status=Appointment.Status.NO_SHOW))).values('n')
+        ), 0),
+    )
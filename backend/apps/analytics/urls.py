@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import DashboardStatsView, PatientRiskView, DemandForecastView, ChatbotView
+from .views import DashboardStatsView, PatientRiskView, BatchRiskView, DemandForecastView, ChatbotView, CacheStatsView
 
 urlpatterns = [
     path('dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
 
+    path('risk/', BatchRiskView.as_view(), name='batch-risk'),
     path('risk/<uuid:patient_id>/', PatientRiskView.as_view(), name='patient-risk'),
     path('forecast/', DemandForecastView.as_view(), name='demand-forecast'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
     path('chat/', ChatbotView.as_view(), name='chatbot'),
 ]
\ No newline at end of file
@@ -1,14 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
-from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 
-from apps.scheduling.models import Appointment
-from apps.billing.models import Invoice, Payment
-from apps.patients.models import Patient
-
+from apps.users.permissions import IsAdminUser
 from .ai import NoShowPredictor, DemandForecaster
+from .cache import cache_stats, cached, user_scope
+from .stats import read_dashboard
 
 
 class DashboardStatsView(APIView):
@@ -16,41 +16,35 @@ class DashboardStatsView(APIView):
     Returns statistics based on the User's Role.
     - Admin: Sees Revenue, All Patients, All Appointments.
     - Physio: Sees My Appointments, My Patients, No Revenue.
+
+    Everything comes from the pre-aggregated DashboardCounter table in one query,
+    and is cached per role (see apps.analytics.cache).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        today = timezone.now().date()
-        start_of_month = today.replace(day=1)
+        today = timezone.localdate()
+        data = cached('dashboard', user_scope(request.user, today), lambda: self.compute(request.user, today))
+        # Scopes are shared across roles (e.g. superusers, receptionists and patients)
+        return Response({**data, "role": request.user.role})
 
+    def compute(self, user, today):
         data = {
             "total_patients": 0,
             "today_appointments": 0,
             "monthly_revenue": 0,
             "pending_invoices": 0,
-            "role": user.role
         }
 
         if user.role == 'ADMIN' or user.is_superuser:
-            data["total_patients"] = Patient.objects.filter(is_active=True).count()
-            data["today_appointments"] = Appointment.objects.filter(start_time__date=today).count()
-
-            revenue = Payment.objects.filter(payment_date__gte=start_of_month).aggregate(Sum('amount'))['amount__sum']
-            data["monthly_revenue"] = revenue if revenue else 0.00
-
-            data["pending_invoices"] = Invoice.objects.filter(status__in=['DRAFT', 'ISSUED']).count()
+            data.update(read_dashboard(today))
 
         elif user.role == 'PHYSIO':
-            data["total_patients"] = Patient.objects.filter(is_active=True).count()
-            data["today_appointments"] = Appointment.objects.filter(
-                start_time__date=today,
-                therapist=user
-            ).count()
-            data["monthly_revenue"] = 0
-            data["pending_invoices"] = 0
+            counters = read_dashboard(today, therapist_id=user.pk)
+            data["total_patients"] = counters["total_patients"]
+            data["today_appointments"] = counters["today_appointments"]
 
-        return Response(data)
+        return data
 
 
 class PatientRiskView(APIView):
@@ -62,27 +56,59 @@ class PatientRiskView(APIView):
         return Response(result)
 
 
+class BatchRiskView(APIView):
+    """
+    Scores many patients in one request.
+    POST: /api/analytics/risk/ {"patient_ids": ["<id>", ...]}
+    Unknown ids are left out of the response.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_patients = 1000
+
+    def post(self, request):
+        patient_ids = request.data.get('patient_ids')
+        if not isinstance(patient_ids, list) or not patient_ids:
+            raise ValidationError({'patient_ids': "Send a non-empty list of patient ids."})
+        if len(patient_ids) > self.max_patients:
+            raise ValidationError({'patient_ids': f"At most {self.max_patients} patients per request."})
+
+        try:
+            results = NoShowPredictor().predict_many(patient_ids)
+        except DjangoValidationError:
+            raise ValidationError({'patient_ids': "Not a valid list of ids."})
+
+        return Response(list(results.values()))
+
+
 class DemandForecastView(APIView):
     """
-    Returns predicted appointment counts for the next 7 days.
+    Returns predicted appointment counts for the next 7 days, cached per role.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        forecaster = DemandForecaster()
+        scope = user_scope(request.user, timezone.localdate())
+        return Response(cached('forecast', scope, lambda: self.compute(request)))
 
-        general_data = forecaster.predict_next_week(therapist=None)
+    def compute(self, request):
+        # Served from the nightly precomputed DemandForecast rows, with one query
+        therapist_id = request.user.pk if request.user.role == 'PHYSIO' else None
+        general_data, personal_data = DemandForecaster().stored(therapist_id)
 
-        response_data = {
+        return {
             "clinic_forecast": general_data,
-            "my_forecast": None
+            "my_forecast": personal_data
         }
 
-        if request.user.role == 'PHYSIO':
-            personal_data = forecaster.predict_next_week(therapist=request.user)
-            response_data["my_forecast"] = personal_data
 
-        return Response(response_data)
+class CacheStatsView(APIView):
+    """
+    Hit/miss counters of the analytics cache, for monitoring.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
 
 
 class ChatbotView(APIView):
@@ -1,11 +1,42 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.apps import apps
 from apps.core.models import TimeStampedModel
 from apps.patients.models import Patient
 from apps.scheduling.models import Appointment, Service
 
 
+class InvoiceQuerySet(models.QuerySet):
+    def with_payment_totals(self):
+        """
+        Annotates amount_paid and balance in SQL, so listing invoices
+        doesn't need to load every payment row into Python.
+        """
+        money = DecimalField(max_digits=10, decimal_places=2)
+        paid = (
+            Payment.objects.filter(invoice=OuterRef('pk'))
+            .values('invoice')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        return self.annotate(
+            amount_paid=Coalesce(Subquery(paid, output_field=money), Value(0), output_field=money)
+        ).annotate(
+            balance=ExpressionWrapper(F('total_amount') - F('amount_paid'), output_field=money)
+        )
+
+    def add_to_total(self, delta):
+        """
+        Shifts total_amount by delta in a single UPDATE. Bypasses save(),
+        so no signals fire and concurrent writers can't lose updates.
+        """
+        if not delta:
+            return 0
+        return self.update(total_amount=F('total_amount') + delta)
+
+
 class Invoice(TimeStampedModel):
     class Status(models.TextChoices):
         ISSUED = 'ISSUED', 'Issued (Unpaid)'
@@ -28,14 +59,36 @@ class Invoice(TimeStampedModel):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     notes = models.TextField(blank=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
     def __str__(self):
         return f"INV-{str(self.pk)[:8]} ({self.patient.last_name})"
 
     def update_total(self):
-        if self.items.exists():
-            total = sum(item.total_price for item in self.items.all())
+        """
+        Full recompute of total_amount from the line items, done in SQL.
+        Day-to-day changes go through InvoiceItem's incremental updates;
+        this is kept for repairing totals that drifted.
+        """
+        total = self.items.aggregate(total=Sum('total_price'))['total']
+        if total is not None:
+            Invoice.objects.filter(pk=self.pk).update(total_amount=total)
             self.total_amount = total
-            self.save()
+
+    @transaction.atomic
+    def add_items(self, items_data):
+        """
+        Creates several line items with one INSERT and one total update.
+        items_data is a list of dicts with InvoiceItem field values.
+        """
+        items = [InvoiceItem(invoice=self, **data) for data in items_data]
+        for item in items:
+            item.apply_service_defaults()
+
+        InvoiceItem.objects.bulk_create(items)
+        Invoice.objects.filter(pk=self.pk).add_to_total(sum(item.total_price for item in items))
+        self.refresh_from_db(fields=['total_amount'])
+        return items
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
@@ -54,6 +107,7 @@ class Invoice(TimeStampedModel):
                     quantity=1,
                     unit_price=service_price
                 )
+                self.refresh_from_db(fields=['total_amount'])
 
     def clean(self):
         super().clean()
@@ -76,16 +130,56 @@ class InvoiceItem(TimeStampedModel):
     description = models.CharField(max_length=255, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the invoice total currently includes for this row.
+        instance._loaded_total = (instance.__dict__.get('invoice_id'), instance.__dict__.get('total_price'))
+        return instance
+
+    def _previous_total(self):
+        """
+        Returns (invoice_id, total_price) as currently counted in the stored
+        invoice total, or (None, 0) for a row that isn't in the DB yet.
+        """
+        if self._state.adding:
+            return None, 0
+
+        invoice_id, total = getattr(self, '_loaded_total', (None, None))
+        if total is None:
+            row = InvoiceItem.objects.filter(pk=self.pk).values_list('invoice_id', 'total_price').first()
+            invoice_id, total = row or (None, 0)
+        return invoice_id, total
+
+    def apply_service_defaults(self):
         if self.service and not self.description:
             self.description = self.service.name
-        if self.service and not self.unit_price:
+        # A zero price is a deliberate free line, not a missing one
+        if self.service and self.unit_price is None:
             self.unit_price = self.service.price
 
         self.total_price = self.quantity * self.unit_price
-        super().save(*args, **kwargs)
 
-        self.invoice.update_total()
+    def save(self, *args, **kwargs):
+        self.apply_service_defaults()
+
+        with transaction.atomic():
+            old_invoice_id, old_total = self._previous_total()
+            super().save(*args, **kwargs)
+
+            if old_invoice_id is not None and old_invoice_id != self.invoice_id:
+                Invoice.objects.filter(pk=old_invoice_id).add_to_total(-old_total)
+                old_total = 0
+
+            Invoice.objects.filter(pk=self.invoice_id).add_to_total(self.total_price - old_total)
+
+        self._loaded_total = (self.invoice_id, self.total_price)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Invoice.objects.filter(pk=self.invoice_id).add_to_total(-self.total_price)
+        return result
 
     def __str__(self):
         return f"{self.description} x{self.quantity}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Invoice, InvoiceItem, Payment
 from apps.patients.serializers import PatientSerializer
+from apps.core.mixins import EagerLoadingMixin
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -13,6 +14,26 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
             'description': {'required': False},
         }
 
+    def validate(self, data):
+        # Partial updates: what the request leaves out keeps its stored value
+        def value(field):
+            if field in data or self.instance is None:
+                return data.get(field)
+            return getattr(self.instance, field)
+
+        if value('unit_price') is None and value('service') is None:
+            raise serializers.ValidationError("Either a unit price or a service is required.")
+        return data
+
+
+class InvoiceItemCreateSerializer(InvoiceItemSerializer):
+    """
+    Line item payload for the bulk add-items endpoint, where the invoice
+    comes from the URL.
+    """
+    class Meta(InvoiceItemSerializer.Meta):
+        fields = ['id', 'service', 'description', 'quantity', 'unit_price', 'total_price']
+
 
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,7 +42,10 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('patient',)
+    prefetch_related_fields = ('items', 'payments')
+
     items = InvoiceItemSerializer(many=True, read_only=True)
     payments = PaymentSerializer(many=True, read_only=True)
 
@@ -35,10 +59,44 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'total_amount', 'notes',
             'items', 'payments', 'created_at'
         ]
-        read_only_fields = ['created_at', 'payments']
+        # The total follows the items (see InvoiceItem.save)
+        read_only_fields = ['created_at', 'payments', 'total_amount']
 
     def validate(self, data):
         if data.get('due_date') and data.get('issue_date'):
             if data['due_date'] < data['issue_date']:
                 raise serializers.ValidationError("Due date cannot be before issue date.")
-        return data
\ No newline at end of file
+        return data
+
+
+class InvoiceListSerializer(InvoiceSerializer):
+    """
+    Compact representation used by the invoice list: the patient is
+    reduced to a name read from the joined row, and amount_paid / balance
+    come from SQL annotations instead of per-invoice follow-up requests.
+    """
+    only_fields = (
+        'id', 'patient', 'appointment', 'status', 'issue_date', 'due_date',
+        'total_amount', 'notes', 'created_at',
+        'patient__first_name', 'patient__last_name',
+    )
+
+    patient_name = serializers.SerializerMethodField()
+    amount_paid = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta(InvoiceSerializer.Meta):
+        fields = [
+            'id', 'patient', 'patient_name', 'appointment',
+            'status', 'issue_date', 'due_date',
+            'total_amount', 'amount_paid', 'balance', 'notes',
+            'items', 'payments', 'created_at'
+        ]
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, restrict_columns=False):
+        queryset = super().setup_eager_loading(queryset, restrict_columns)
+        return queryset.with_payment_totals()
+
+    def get_patient_name(self, obj):
+        return f"{obj.patient.last_name} {obj.patient.first_name}"
@@ -1,3 +1,226 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import date
 
-# Create your tests here.
+import pyarrow.parquet as pq
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.patients.models import Patient
+from apps.billing.models import Invoice, InvoiceItem, Payment
+from apps.core.models import AuditLog
+from apps.scheduling.models import Service
+
+User = get_user_model()
+
+
+class InvoiceQueryCountTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.list_url = '/api/billing/invoices/'
+
+    def create_invoices(self, count):
+        for i in range(count):
+            patient = Patient.objects.create(
+                first_name=f"Patient{i}", last_name="Test", gender="F", tax_id=f"INV{i:08d}"
+            )
+            invoice = Invoice.objects.create(patient=patient, issue_date=date(2025, 1, 1))
+            InvoiceItem.objects.create(invoice=invoice, description="Session", quantity=2, unit_price=40)
+            Payment.objects.create(invoice=invoice, amount=30, payment_date=date(2025, 1, 2))
+
+    def test_list_query_count(self):
+        self.create_invoices(5)
+
+        # Invoices with their patient, then one prefetch each for items and payments
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_list_includes_payment_totals(self):
+        self.create_invoices(1)
+        response = self.client.get(self.list_url)
+
+        invoice = response.data[0]
+        self.assertEqual(invoice['patient_name'], "Test Patient0")
+        self.assertEqual(invoice['total_amount'], '80.00')
+        self.assertEqual(invoice['amount_paid'], '30.00')
+        self.assertEqual(invoice['balance'], '50.00')
+        self.assertEqual(len(invoice['items']), 1)
+        self.assertEqual(len(invoice['payments']), 1)
+
+
+class InvoiceTotalTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.patient = Patient.objects.create(
+            first_name="Anna", last_name="Bianchi", gender="F", tax_id="TOTAL0001"
+        )
+        self.invoice = Invoice.objects.create(patient=self.patient, issue_date=date(2025, 1, 1))
+
+    def total(self):
+        self.invoice.refresh_from_db()
+        return self.invoice.total_amount
+
+    def test_total_follows_item_create_update_delete(self):
+        item = InvoiceItem.objects.create(invoice=self.invoice, description="Session", quantity=2, unit_price=40)
+        InvoiceItem.objects.create(invoice=self.invoice, description="Tape", quantity=1, unit_price=10)
+        self.assertEqual(self.total(), 90)
+
+        item = InvoiceItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self.total(), 130)
+
+        item.delete()
+        self.assertEqual(self.total(), 10)
+
+    def test_moving_item_between_invoices(self):
+        other = Invoice.objects.create(patient=self.patient, issue_date=date(2025, 1, 1))
+        item = InvoiceItem.objects.create(invoice=self.invoice, description="Session", quantity=1, unit_price=50)
+
+        item.invoice = other
+        item.save()
+
+        self.assertEqual(self.total(), 0)
+        other.refresh_from_db()
+        self.assertEqual(other.total_amount, 50)
+
+    def test_item_save_does_not_audit_invoice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            InvoiceItem.objects.create(invoice=self.invoice, description="Session", quantity=1, unit_price=50)
+        self.assertFalse(AuditLog.objects.filter(action="UPDATE", object_id=str(self.invoice.pk)).exists())
+
+    def test_add_items_endpoint(self):
+        url = f'/api/billing/invoices/{self.invoice.pk}/add-items/'
+        payload = {'items': [
+            {'description': f"Session {i}", 'quantity': 1, 'unit_price': '25.00'} for i in range(10)
+        ]}
+
+        response = self.client.post(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['items']), 10)
+        self.assertEqual(self.total(), 250)
+        self.assertEqual(self.invoice.items.count(), 10)
+
+    def test_add_items_rejects_item_without_price(self):
+        url = f'/api/billing/invoices/{self.invoice.pk}/add-items/'
+        response = self.client.post(url, {'items': [{'description': "Mystery"}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.invoice.items.count(), 0)
+
+    def test_quantity_only_patch_keeps_stored_price(self):
+        item = InvoiceItem.objects.create(invoice=self.invoice, description="Session", quantity=1, unit_price=40)
+
+        response = self.client.patch(f'/api/billing/items/{item.pk}/', {'quantity': 2}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.total(), 80)
+
+    def test_zero_price_line_is_accepted(self):
+        url = f'/api/billing/invoices/{self.invoice.pk}/add-items/'
+        response = self.client.post(url, {'items': [{'description': "Free check-up", 'unit_price': '0.00'}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.invoice.items.get().total_price, 0)
+        self.assertEqual(self.total(), 0)
+
+    def test_zero_price_overrides_the_service_price(self):
+        service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        item = InvoiceItem.objects.create(invoice=self.invoice, service=service, quantity=1, unit_price=0)
+
+        self.assertEqual(item.unit_price, 0)
+        self.assertEqual(item.description, "Physio")
+        self.assertEqual(self.total(), 0)
+
+    def test_total_cannot_be_written(self):
+        InvoiceItem.objects.create(invoice=self.invoice, description="Session", quantity=1, unit_price=40)
+
+        response = self.client.patch(f'/api/billing/invoices/{self.invoice.pk}/', {'total_amount': '1.00'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.total(), 40)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class BillingExportTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        for i in range(5):
+            patient = Patient.objects.create(
+                first_name=f"Patient{i}", last_name="Export", gender="F", tax_id=f"EXP{i:08d}"
+            )
+            invoice = Invoice.objects.create(patient=patient, issue_date=date(2025, 1, i + 1))
+            InvoiceItem.objects.create(invoice=invoice, description="Session", quantity=1, unit_price=50)
+            Payment.objects.create(invoice=invoice, amount=20, payment_date=date(2025, 2, i + 1))
+
+    def download(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        return chunks, b''.join(chunks)
+
+    def test_invoice_csv_export_streams_filtered_rows(self):
+        chunks, content = self.download('/api/billing/invoices/export/?issue_date=2025-01-02')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['patient_first_name'], "Patient1")
+        self.assertEqual(rows[0]['amount_paid'], "20.00")
+        self.assertEqual(rows[0]['balance'], "30.00")
+
+        chunks, content = self.download('/api/billing/invoices/export/')
+        # One piece per chunk of two rows
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(content.decode())))), 5)
+
+    def test_payment_parquet_export_has_one_row_group_per_chunk(self):
+        _, content = self.download('/api/billing/payments/export/?file_format=parquet')
+        parquet = pq.ParquetFile(io.BytesIO(content))
+
+        self.assertEqual(parquet.metadata.num_rows, 5)
+        self.assertEqual(parquet.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual([str(amount) for amount in table.column('amount').to_pylist()], ["20.00"] * 5)
+        self.assertEqual(table.column('payment_date').to_pylist()[0], date(2025, 2, 1))
+
+    def test_export_query_count_is_independent_of_size(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.download('/api/billing/invoices/export/')
+        # One per chunk of two rows, on SQLite (PostgreSQL uses one server-side cursor)
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+    def test_empty_export_has_header_only(self):
+        _, content = self.download('/api/billing/payments/export/?payment_date__gte=2030-01-01')
+        self.assertEqual(content.decode().splitlines(), [
+            'id,invoice_id,patient_id,amount,payment_date,method,transaction_id,created_at'
+        ])
+
+        _, content = self.download('/api/billing/payments/export/?payment_date__gte=2030-01-01&file_format=parquet')
+        self.assertEqual(pq.read_table(io.BytesIO(content)).num_rows, 0)
+
+    def test_export_rejects_unknown_format_and_non_staff(self):
+        response = self.client.get('/api/billing/invoices/export/?file_format=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        self.client.force_authenticate(user=physio)
+        response = self.client.get('/api/billing/payments/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
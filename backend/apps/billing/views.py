@@ -1,20 +1,74 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum
+from apps.core.exports import ExportMixin
+from apps.core.mixins import OptimizedQuerySetMixin, TokenClaimsReadMixin
+from apps.users.permissions import IsAdminOrReceptionist
 from .models import Invoice, InvoiceItem, Payment
-from .serializers import InvoiceSerializer, InvoiceItemSerializer, PaymentSerializer
+from .serializers import (
+    InvoiceSerializer, InvoiceListSerializer, InvoiceItemSerializer,
+    InvoiceItemCreateSerializer, PaymentSerializer
+)
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ExportMixin, TokenClaimsReadMixin, OptimizedQuerySetMixin, viewsets.ModelViewSet):
+    """
+    GET /api/billing/invoices/export/?file_format=csv|parquet streams every
+    invoice matching the list filters, with its payment totals.
+    """
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    export_permission_classes = [IsAdminOrReceptionist]
+    export_filename = 'invoices'
+    export_columns = [
+        ('id', 'id', 'string'),
+        ('patient_id', 'patient_id', 'string'),
+        ('patient_first_name', 'patient__first_name', 'string'),
+        ('patient_last_name', 'patient__last_name', 'string'),
+        ('patient_tax_id', 'patient__tax_id', 'string'),
+        ('appointment_id', 'appointment_id', 'string'),
+        ('status', 'status', 'string'),
+        ('issue_date', 'issue_date', 'date'),
+        ('due_date', 'due_date', 'date'),
+        ('total_amount', 'total_amount', 'money'),
+        ('amount_paid', 'amount_paid', 'money'),
+        ('balance', 'balance', 'money'),
+        ('created_at', 'created_at', 'datetime'),
+    ]
 
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status', 'patient', 'issue_date']
     ordering_fields = ['issue_date', 'total_amount']
     ordering = ['-issue_date']
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return InvoiceListSerializer
+        return InvoiceSerializer
+
+    def get_export_queryset(self):
+        return super().get_export_queryset().with_payment_totals()
+
+    @action(detail=True, methods=['post'], url_path='add-items')
+    def add_items(self, request, pk=None):
+        """
+        Adds several line items in one transaction.
+        POST: /api/billing/invoices/{id}/add-items/  {"items": [{...}, ...]}
+        """
+        invoice = self.get_object()
+
+        serializer = InvoiceItemCreateSerializer(data=request.data.get('items', []), many=True)
+        serializer.is_valid(raise_exception=True)
+        items = invoice.add_items(serializer.validated_data)
+
+        return Response({
+            'total_amount': invoice.total_amount,
+            'items': InvoiceItemCreateSerializer(items, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
 
 class InvoiceItemViewSet(viewsets.ModelViewSet):
     queryset = InvoiceItem.objects.all()
@@ -22,11 +76,35 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
-
+class PaymentViewSet(ExportMixin, viewsets.ModelViewSet):
+    """
+    GET /api/billing/payments/export/?file_format=csv|parquet[&payment_date__gte=...&payment_date__lt=...]
+    streams the payments, oldest first.
+    """
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'invoice': ['exact'],
+        'method': ['exact'],
+        'payment_date': ['exact', 'gte', 'lt'],
+    }
+    export_permission_classes = [IsAdminOrReceptionist]
+    export_filename = 'payments'
+    export_columns = [
+        ('id', 'id', 'string'),
+        ('invoice_id', 'invoice_id', 'string'),
+        ('patient_id', 'invoice__patient_id', 'string'),
+        ('amount', 'amount', 'money'),
+        ('payment_date', 'payment_date', 'date'),
+        ('method', 'method', 'string'),
+        ('transaction_id', 'transaction_id', 'string'),
+        ('created_at', 'created_at', 'datetime'),
+    ]
+
+    def get_export_queryset(self):
+        return super().get_export_queryset().order_by('payment_date', 'created_at')
 
     def perform_create(self, serializer):
         payment = serializer.save()
@@ -0,0 +1,185 @@
+import logging
+from contextlib import contextmanager
+from functools import partial
+from threading import local
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Thread-local buffer of audit entries waiting to be written
+_state = local()
+
+# Summary entries: one entry for many objects created together, stored on
+# the first of them, listing all of them under this key as [{"id": ...}, ...]
+SUMMARY_ACTIONS = {
+    'CREATE_SERIES': 'occurrences',
+    'IMPORT': 'patients',
+}
+
+
+def _get_state():
+    if not hasattr(_state, 'entries'):
+        _state.entries = []
+        _state.depth = 0
+        _state.dropped = 0
+    return _state
+
+
+def record(action, content_type, object_id, user=None, changes=None):
+    """
+    Queues one audit entry. The entry only enters the buffer once the
+    surrounding transaction commits, so rolled back writes are never logged.
+    Outside of an audit_batch() scope it is written straight away.
+    """
+    entry = {
+        'user_id': user.pk if user else None,
+        'action': action,
+        'content_type_id': content_type.pk,
+        'object_id': str(object_id),
+        'changes': changes or {},
+        'timestamp': timezone.now().isoformat(),
+    }
+    transaction.on_commit(partial(_append, entry))
+
+
+def _append(entry):
+    state = _get_state()
+
+    if len(state.entries) >= getattr(settings, 'AUDIT_LOG_BUFFER_SIZE', 500):
+        if getattr(settings, 'AUDIT_LOG_BACKPRESSURE', 'flush') == 'drop':
+            state.dropped += 1
+            logger.warning("Audit buffer full, dropped %s entry for object %s.", entry['action'], entry['object_id'])
+            return
+        flush()
+
+    state.entries.append(entry)
+
+    if state.depth == 0:
+        flush()
+
+
+def flush():
+    """
+    Writes every buffered entry, either with one bulk_create or by
+    handing the batch to the Celery worker when AUDIT_LOG_ASYNC is set.
+    """
+    state = _get_state()
+    entries, state.entries = state.entries, []
+    if not entries:
+        return
+
+    if getattr(settings, 'AUDIT_LOG_ASYNC', False):
+        from .tasks import write_audit_entries
+        write_audit_entries.delay(entries)
+    else:
+        write_entries(entries)
+
+
+def write_entries(entries):
+    from django.contrib.auth import get_user_model
+
+    # The acting user may have been deleted in the same request (e.g. a user removing themselves).
+    user_ids = {e['user_id'] for e in entries if e['user_id'] is not None}
+    if user_ids:
+        user_ids = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            user_id=e['user_id'] if e['user_id'] in user_ids else None,
+            action=e['action'],
+            content_type_id=e['content_type_id'],
+            object_id=e['object_id'],
+            changes=e['changes'],
+            timestamp=parse_datetime(e['timestamp']),
+        )
+        for e in entries
+    ])
+
+
+@contextmanager
+def audit_batch():
+    """
+    Collects audit entries and writes them in one go when the outermost
+    scope exits. Used per request by AuditLogMiddleware; tasks and
+    management commands doing bulk work can wrap themselves in it too.
+    """
+    state = _get_state()
+    state.depth += 1
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        if state.depth == 0:
+            flush()
+
+
+def covering(object_id):
+    """
+    Filter for the entries about one object: its own entries and the
+    summary entries that list it. On PostgreSQL the lists are served by
+    the GIN indexes of migrations 0008 and 0009.
+    """
+    object_id = str(object_id)
+    condition = Q(object_id=object_id)
+
+    for action, key in SUMMARY_ACTIONS.items():
+        if connection.vendor == 'postgresql':
+            listed = Q(**{f'changes__{key}__contains': [{'id': object_id}]})
+        else:
+            listed = Q(RawSQL(
+                'EXISTS (SELECT 1 FROM json_each("core_auditlog"."changes", %s) '
+                'WHERE json_extract(value, \'$.id\') = %s)',
+                (f'$.{key}', object_id), output_field=BooleanField()
+            ))
+        condition |= Q(action=action) & listed
+
+    return condition
+
+
+def reconstruct(model, object_id, at):
+    """
+    Rebuilds the audited fields of an object as they were at the given
+    time by replaying its diffs in order. Returns None if the object did
+    not exist at that point.
+    """
+    logs = AuditLog.objects.filter(
+        covering(object_id),
+        content_type=ContentType.objects.get_for_model(model),
+        timestamp__lte=at
+    ).order_by('timestamp', 'id').values_list('action', 'changes')
+
+    state = None
+    for action, changes in logs.iterator():
+        if action == "DELETE":
+            state = None
+            continue
+        if action == "CREATE_SERIES":
+            # Summary of a recurring booking (apps.scheduling.recurrence), listing every session
+            occurrences = {o['id']: o for o in changes['occurrences']}
+            occurrence = occurrences.get(str(object_id), {})
+            state = {field: value for field, value in changes.items() if field != 'occurrences'}
+            state.update({field: value for field, value in occurrence.items() if field != 'id'})
+            continue
+        if action == "IMPORT":
+            # One entry per imported chunk (apps.patients.importer), listing every patient
+            state = {
+                field: value
+                for row in changes['patients'] if row['id'] == str(object_id)
+                for field, value in row.items() if field != 'id'
+            }
+            continue
+        if state is None:
+            state = {}
+        for field, (old, new) in changes.items():
+            state[field] = new
+
+    return state
@@ -1,43 +1,56 @@
+import logging
 from threading import local
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
-# Thread-local storage to hold the user for the duration of the request
+from apps.users.authentication import resolve_jwt_user
+from .audit import audit_batch
+
+logger = logging.getLogger(__name__)
+
+# Thread-local storage to hold the request (and its user once resolved) for the duration of the request
 _user = local()
 
+_UNRESOLVED = object()
+
 
 class AuditLogMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
+        # The user is only looked up when something gets audited, so read-only requests skip it.
+        _user.request = request
+        _user.value = _UNRESOLVED
+        response = None
+
+        try:
+            # Audit entries produced by this request are written together at the end
+            with audit_batch():
+                response = self.get_response(request)
+        except Exception:
+            if response is None:
+                raise
+            # The request's changes are already committed, so its response still stands
+            logger.exception("Could not write the audit entries of %s %s.", request.method, request.path)
+        finally:
+            _user.request = None
+            _user.value = None
 
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            _user.value = request.user
-
-        else:
-            header = request.META.get('HTTP_AUTHORIZATION', None)
-
-            if header:
-                try:
-                    jwt_auth = JWTAuthentication()
-                    auth_result = jwt_auth.authenticate(request)
+        return response
 
-                    if auth_result:
-                        user, token = auth_result
-                        _user.value = user
-                    else:
-                        _user.value = None
-                except Exception as e:
-                    _user.value = None
-            else:
-                _user.value = None
 
-        response = self.get_response(request)
+def _resolve_user(request):
+    if hasattr(request, 'user') and request.user.is_authenticated:
+        return request.user
 
-        _user.value = None
+    if request.META.get('HTTP_AUTHORIZATION'):
+        # Shares the result of DRF's SharedJWTAuthentication in the view
+        return resolve_jwt_user(request)
 
-        return response
+    return None
 
 
 def get_current_user():
-    return getattr(_user, 'value', None)
\ No newline at end of file
+    value = getattr(_user, 'value', None)
+    if value is _UNRESOLVED:
+        value = _user.value = _resolve_user(_user.request)
+    return value
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:31
+
+import json
+
+from django.db import migrations
+
+
+def convert_legacy_changes(apps, schema_editor):
+    """
+    Old rows hold a full model_to_dict dump (or a plain message such as
+    "Object Deleted"). Rewrite them in the {"field": [old, new]} shape so
+    the column can be cast to JSON and replayed like new diffs.
+    """
+    AuditLog = apps.get_model('core', 'AuditLog')
+    batch = []
+
+    for log in AuditLog.objects.only('id', 'changes').iterator(chunk_size=2000):
+        try:
+            dump = json.loads(log.changes)
+        except (TypeError, ValueError):
+            dump = None
+
+        if isinstance(dump, dict):
+            log.changes = json.dumps({field: [None, value] for field, value in dump.items()})
+        else:
+            log.changes = '{}'
+
+        batch.append(log)
+        if len(batch) >= 2000:
+            AuditLog.objects.bulk_update(batch, ['changes'])
+            batch = []
+
+    if batch:
+        AuditLog.objects.bulk_update(batch, ['changes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_auditlog(apps, schema_editor):
+    """
+    Rebuilds core_auditlog as a table range-partitioned by month on
+    "timestamp" and copies the existing rows over. PostgreSQL only;
+    other backends keep the plain table.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    execute = schema_editor.execute
+
+    execute('ALTER TABLE "core_auditlog" RENAME TO "core_auditlog_legacy"')
+    execute('ALTER INDEX "core_auditlog_pkey" RENAME TO "core_auditlog_legacy_pkey"')
+
+    # The partition key has to be part of the primary key. A plain sequence is used
+    # because identity columns aren't allowed on partitioned tables before PostgreSQL 17.
+    execute('CREATE SEQUENCE "core_auditlog_part_id_seq"')
+    execute('''
+        CREATE TABLE "core_auditlog" (
+            "id" bigint NOT NULL DEFAULT nextval('core_auditlog_part_id_seq'),
+            "action" varchar(50) NOT NULL,
+            "object_id" varchar(255) NOT NULL,
+            "timestamp" timestamp with time zone NOT NULL,
+            "ip_address" inet NULL,
+            "changes" jsonb NOT NULL,
+            "content_type_id" integer NOT NULL
+                REFERENCES "django_content_type" ("id") DEFERRABLE INITIALLY DEFERRED,
+            "user_id" uuid NULL
+                REFERENCES "users_user" ("id") DEFERRABLE INITIALLY DEFERRED,
+            CONSTRAINT "core_auditlog_pkey" PRIMARY KEY ("id", "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    ''')
+    execute('ALTER SEQUENCE "core_auditlog_part_id_seq" OWNED BY "core_auditlog"."id"')
+    execute('CREATE TABLE "core_auditlog_default" PARTITION OF "core_auditlog" DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN("timestamp") FROM "core_auditlog_legacy"')
+        oldest = cursor.fetchone()[0]
+
+    current = month_start(oldest or timezone.now())
+    last = add_months(month_start(timezone.now()), 3)
+    while current <= last:
+        upper = add_months(current, 1)
+        execute(
+            f'CREATE TABLE "core_auditlog_p{current:%Y%m}" PARTITION OF "core_auditlog" '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [current, upper]
+        )
+        current = upper
+
+    # Check the foreign keys right away so no trigger events stay pending for the DDL below.
+    execute('SET CONSTRAINTS ALL IMMEDIATE')
+    execute('''
+        INSERT INTO "core_auditlog"
+            ("id", "action", "object_id", "timestamp", "ip_address", "changes", "content_type_id", "user_id")
+        SELECT "id", "action", "object_id", "timestamp", "ip_address", "changes", "content_type_id", "user_id"
+        FROM "core_auditlog_legacy"
+    ''')
+    execute('''SELECT setval('core_auditlog_part_id_seq', COALESCE((SELECT MAX("id") FROM "core_auditlog"), 0) + 1, false)''')
+    execute('DROP TABLE "core_auditlog_legacy"')
+
+    execute('CREATE INDEX "core_auditlog_content_type_id_idx" ON "core_auditlog" ("content_type_id")')
+    execute('CREATE INDEX "core_auditlog_user_id_idx" ON "core_auditlog" ("user_id")')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_auditlog_changes_json'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('users', '0002_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
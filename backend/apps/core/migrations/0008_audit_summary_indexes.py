@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Lists of covered objects in summary entries (see apps.core.audit.SUMMARY_ACTIONS)
+KEYS = ['occurrences']
+
+
+def add_summary_indexes(apps, schema_editor):
+    """
+    PostgreSQL: GIN indexes on the object lists of summary entries, which
+    serve the jsonb @> lookups of apps.core.audit.covering(). Other
+    backends (SQLite in tests) scan the few summary entries instead.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for key in KEYS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "audit_{key}_idx" ON "core_auditlog" '
+            f'USING gin (("changes" -> \'{key}\') jsonb_path_ops)'
+        )
+
+
+def remove_summary_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for key in KEYS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "audit_{key}_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_auditlog_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_summary_indexes, remove_summary_indexes),
+    ]
@@ -0,0 +1,68 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.users.authentication import TokenClaimsAuthentication
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin that declares which relations the serializer reads,
+    so viewsets can load them up front instead of one query per row.
+
+    - select_related_fields: forward FKs / one-to-ones read by the serializer.
+    - prefetch_related_fields: reverse / many relations (strings or Prefetch objects).
+    - only_fields: optional column whitelist applied to list responses.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    only_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, restrict_columns=False):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        if restrict_columns and cls.only_fields:
+            queryset = queryset.only(*cls.only_fields)
+        return queryset
+
+
+class OptimizedQuerySetMixin:
+    """
+    ViewSet mixin that applies the serializer's eager-loading declarations
+    to the queryset. Column restriction (only()) is limited to the list
+    action, so objects that get saved are always fully loaded.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(
+                queryset,
+                restrict_columns=getattr(self, 'action', None) == 'list'
+            )
+
+        return queryset
+
+
+class TokenClaimsReadMixin:
+    """
+    ViewSet mixin that authenticates the read-only actions from the JWT
+    claims alone, skipping the user lookup. request.user is then a
+    TokenClaimsUser, so those actions must only rely on its pk, role and
+    staff flags. Writes and custom actions keep the regular authentication.
+    """
+    token_claims_actions = ('list', 'retrieve')
+
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+
+        if getattr(self, 'action', None) in self.token_claims_actions:
+            request.authenticators = [
+                TokenClaimsAuthentication() if isinstance(authenticator, JWTAuthentication) else authenticator
+                for authenticator in request.authenticators
+            ]
+
+        return request
@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -37,13 +39,21 @@ class AuditLog(models.Model):
     object_id = models.CharField(max_length=255)
     content_object = GenericForeignKey('content_type', 'object_id')
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered batch gets written
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
-    changes = models.TextField(blank=True)
+    # Only the fields that changed, as {"field": [old, new]}. A CREATE lists every field.
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.content_type} ({self.timestamp})"
 
     class Meta:
-        ordering = ['-timestamp']
\ No newline at end of file
+        ordering = ['-timestamp']
+        # On PostgreSQL the table is partitioned by month on timestamp (see migration 0006).
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-timestamp'], name='audit_object_history_idx'),
+            models.Index(fields=['user', '-timestamp'], name='audit_user_history_idx'),
+            models.Index(fields=['timestamp'], name='audit_timestamp_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,132 @@
+import gzip
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'core_auditlog'
+
+
+def is_partitioned():
+    """
+    The audit table is range-partitioned by month on PostgreSQL only.
+    Other backends (SQLite in tests) keep the plain indexed table.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(start):
+    return f"{PARENT_TABLE}_p{start:%Y%m}"
+
+
+def ensure_partitions(start=None, months_ahead=3):
+    """
+    Creates the monthly partitions from `start` (default: this month) up to
+    `months_ahead` months in the future. They must exist before rows arrive,
+    otherwise rows land in the default partition.
+    """
+    if not is_partitioned():
+        return []
+
+    current = month_start(start or timezone.now())
+    last = add_months(month_start(timezone.now()), months_ahead)
+    created = []
+
+    with connection.cursor() as cursor:
+        while current <= last:
+            upper = add_months(current, 1)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(current)}" '
+                f'PARTITION OF "{PARENT_TABLE}" FOR VALUES FROM (%s) TO (%s)',
+                [current, upper]
+            )
+            created.append(partition_name(current))
+            current = upper
+
+    return created
+
+
+def archive_month(start, archive_dir):
+    """
+    Writes every audit entry of the month starting at `start` to a
+    gzip-compressed JSON Lines file, streaming rows from the database.
+    """
+    end = add_months(start, 1)
+    path = Path(archive_dir) / f"auditlog-{start:%Y-%m}.jsonl.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    rows = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by('timestamp', 'id').values(
+        'id', 'user_id', 'action', 'content_type_id', 'object_id', 'timestamp', 'ip_address', 'changes'
+    )
+
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        for row in rows.iterator(chunk_size=2000):
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder))
+            archive.write('\n')
+            count += 1
+
+    if not count:
+        path.unlink()
+        return None, 0
+    return path, count
+
+
+def drop_month(start):
+    """
+    Removes an archived month. On PostgreSQL the whole partition is
+    detached and dropped, which is instant and leaves no dead tuples.
+    """
+    if is_partitioned():
+        name = partition_name(start)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+
+    # Anything left for that month (e.g. rows that fell into the default partition)
+    AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=add_months(start, 1)).delete()
+
+
+def archive_before(cutoff, archive_dir=None):
+    """
+    Archives and removes every full month of audit entries older than
+    `cutoff`. Returns a list of (month, archive path, row count).
+    """
+    archive_dir = archive_dir or settings.AUDIT_LOG_ARCHIVE_DIR
+    cutoff = month_start(cutoff)
+
+    oldest = AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+
+    archived = []
+    current = month_start(oldest)
+    while current < cutoff:
+        path, count = archive_month(current, archive_dir)
+        drop_month(current)
+        if count:
+            logger.info("Archived %s audit entries for %s to %s.", count, f"{current:%Y-%m}", path)
+            archived.append((current, path, count))
+        current = add_months(current, 1)
+
+    return archived
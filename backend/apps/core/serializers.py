@@ -0,0 +1,22 @@
+from django.contrib.contenttypes.models import ContentType
+from rest_framework import serializers
+
+from .mixins import EagerLoadingMixin
+from .models import AuditLog
+
+
+class AuditLogSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
+
+    user_email = serializers.EmailField(source='user.email', read_only=True, default=None)
+    model = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuditLog
+        fields = ['id', 'timestamp', 'action', 'user', 'user_email', 'model', 'object_id', 'changes']
+        read_only_fields = fields
+
+    def get_model(self, obj):
+        # get_for_id is served from the ContentType cache, so this costs no query per row
+        content_type = ContentType.objects.get_for_id(obj.content_type_id)
+        return f"{content_type.app_label}.{content_type.model}"
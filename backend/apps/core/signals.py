@@ -1,26 +1,54 @@
 import json
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
 from django.contrib.contenttypes.models import ContentType
 from django.core.serializers.json import DjangoJSONEncoder
-from django.forms.models import model_to_dict
 
 from apps.billing.models import Invoice
 from apps.inventory.models import InventoryItem
 from apps.patients.models import Patient
 from apps.scheduling.models import Appointment, Service
 from apps.users.models import User
-from .models import AuditLog
+from .audit import record
 from .middleware import get_current_user
 
 TRACKED_MODELS = [Patient, Appointment, Service, User, InventoryItem, Invoice]
 
+_audited_fields = {}
 
-@receiver(post_save)
-def log_save(sender, instance, created, **kwargs):
-    if sender not in TRACKED_MODELS:
-        return
 
+def get_audited_fields(model):
+    """
+    Concrete, editable fields of a tracked model (the same set model_to_dict
+    used to dump, minus many-to-many relations which would cost extra queries).
+    """
+    if model not in _audited_fields:
+        _audited_fields[model] = [f for f in model._meta.concrete_fields if f.editable]
+    return _audited_fields[model]
+
+
+def take_snapshot(instance):
+    """
+    Raw values of the audited fields currently loaded on the instance.
+    Deferred fields are left out, so they never show up as changed.
+    """
+    loaded = instance.__dict__
+    return {
+        f.name: loaded[f.attname]
+        for f in get_audited_fields(type(instance))
+        if f.attname in loaded
+    }
+
+
+def remember_loaded_state(sender, instance, **kwargs):
+    instance._audit_snapshot = take_snapshot(instance)
+
+
+def check_snapshot_source(sender, instance, **kwargs):
+    # Only a snapshot of a row loaded from the DB can be diffed against.
+    instance._audit_snapshot_from_db = not instance._state.adding
+
+
+def log_save(sender, instance, created, **kwargs):
     user = get_current_user()
 
     if not user and isinstance(instance, User):
@@ -28,31 +56,46 @@ def log_save(sender, instance, created, **kwargs):
 
     action = "CREATE" if created else "UPDATE"
 
-    try:
-        changes = json.dumps(model_to_dict(instance), cls=DjangoJSONEncoder)
-    except Exception:
-        changes = "Could not serialize data"
+    current = take_snapshot(instance)
+    previous = getattr(instance, '_audit_snapshot', {})
+    instance._audit_snapshot = current
 
-    AuditLog.objects.create(
+    if created or not getattr(instance, '_audit_snapshot_from_db', False):
+        diff = {name: [None, value] for name, value in current.items()}
+    else:
+        diff = {
+            name: [previous[name], value]
+            for name, value in current.items()
+            if name in previous and previous[name] != value
+        }
+        if not diff:
+            return
+
+    record(
         user=user,
         action=action,
         content_type=ContentType.objects.get_for_model(sender),
-        object_id=str(instance.pk),
-        changes=changes
+        object_id=instance.pk,
+        # Round-trip through the encoder so dates, decimals and UUIDs become plain JSON.
+        changes=json.loads(json.dumps(diff, cls=DjangoJSONEncoder))
     )
 
 
-@receiver(post_delete)
 def log_delete(sender, instance, **kwargs):
-    if sender not in TRACKED_MODELS:
-        return
-
     user = get_current_user()
 
-    AuditLog.objects.create(
+    record(
         user=user,
         action="DELETE",
         content_type=ContentType.objects.get_for_model(sender),
-        object_id=str(instance.pk),
-        changes="Object Deleted"
-    )
\ No newline at end of file
+        object_id=instance.pk,
+        changes={}
+    )
+
+
+# Connected per model, so saves and loads of other models don't go through these receivers
+for model in TRACKED_MODELS:
+    post_init.connect(remember_loaded_state, sender=model)
+    pre_save.connect(check_snapshot_source, sender=model)
+    post_save.connect(log_save, sender=model)
+    post_delete.connect(log_delete, sender=model)
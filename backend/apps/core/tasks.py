@@ -0,0 +1,31 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .audit import write_entries
+from .partitions import add_months, archive_before, ensure_partitions
+
+
+@shared_task
+def write_audit_entries(entries):
+    """
+    Persists a batch of audit entries off the request path.
+    Queued by apps.core.audit.flush when AUDIT_LOG_ASYNC is enabled.
+    """
+    write_entries(entries)
+    return f"Wrote {len(entries)} audit entries."
+
+
+@shared_task
+def maintain_audit_log():
+    """
+    Daily housekeeping for the audit table: makes sure the upcoming monthly
+    partitions exist and archives months past the retention window into
+    compressed files before dropping them.
+    """
+    ensure_partitions()
+
+    cutoff = add_months(timezone.now(), -settings.AUDIT_LOG_RETENTION_MONTHS)
+    archived = archive_before(cutoff)
+
+    return f"Archived {sum(count for _, _, count in archived)} audit entries from {len(archived)} months."
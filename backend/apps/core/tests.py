@@ -1,3 +1,195 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from apps.patients.models import Patient
+from apps.scheduling.models import Service
+from apps.core.audit import audit_batch, reconstruct
+from apps.core.middleware import AuditLogMiddleware
+from apps.core.partitions import archive_before
+from apps.core.models import AuditLog
+
+User = get_user_model()
+
+
+class AuditBufferTests(TestCase):
+    def create_services(self, count):
+        for i in range(count):
+            Service.objects.create(name=f"Service {i}", duration_minutes=30, price=40)
+
+    def test_batch_is_written_with_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with audit_batch():
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.create_services(5)
+
+        audit_inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "core_auditlog"')]
+        self.assertEqual(len(audit_inserts), 1)
+        self.assertEqual(AuditLog.objects.filter(action="CREATE").count(), 5)
+
+    def test_rolled_back_writes_are_not_logged(self):
+        with audit_batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_services(1)
+                try:
+                    with transaction.atomic():
+                        Service.objects.create(name="Rolled back", duration_minutes=30, price=40)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_entries_outside_a_batch_are_written_immediately(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_services(2)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    @override_settings(AUDIT_LOG_BUFFER_SIZE=2, AUDIT_LOG_BACKPRESSURE='drop')
+    def test_full_buffer_drops_entries(self):
+        with audit_batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_services(3)
+
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+    @override_settings(AUDIT_LOG_BUFFER_SIZE=2, AUDIT_LOG_BACKPRESSURE='flush')
+    def test_full_buffer_flushes_early(self):
+        with audit_batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_services(3)
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_flush_keeps_the_response(self):
+        middleware = AuditLogMiddleware(lambda request: HttpResponse(status=201))
+
+        with mock.patch('apps.core.audit.flush', side_effect=DatabaseError), \
+                self.assertLogs('apps.core.middleware', 'ERROR'):
+            response = middleware(RequestFactory().post('/api/scheduling/services/'))
+
+        self.assertEqual(response.status_code, 201)
+
+
+class AuditDiffTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_update_stores_only_changed_fields(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            patient = Patient.objects.create(
+                first_name="Mario", last_name="Rossi", gender="M", tax_id="DIFF0001",
+                medical_history="Long history " * 200
+            )
+            patient = Patient.objects.get(pk=patient.pk)
+            patient.is_active = False
+            patient.save()
+
+        update = AuditLog.objects.get(action="UPDATE", object_id=str(patient.pk))
+        self.assertEqual(update.changes, {"is_active": [True, False]})
+
+    def test_noop_save_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(name="Massage", duration_minutes=30, price=40)
+            Service.objects.get(pk=service.pk).save()
+
+        self.assertEqual(AuditLog.objects.filter(object_id=str(service.pk)).count(), 1)
+
+    def test_reconstruct_object_at_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(name="Massage", duration_minutes=30, price=Decimal('40.00'))
+        service_id = service.pk
+        created_at = timezone.now()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.get(pk=service_id)
+            service.price = Decimal('55.00')
+            service.save()
+        updated_at = timezone.now()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.delete()
+
+        self.assertEqual(reconstruct(Service, service_id, created_at)['price'], '40.00')
+        self.assertEqual(reconstruct(Service, service_id, updated_at)['price'], '55.00')
+        self.assertIsNone(reconstruct(Service, service_id, timezone.now()))
+
+        url = f'/api/audit/scheduling.service/{service_id}/state/'
+        response = self.client.get(url, {'at': updated_at.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['state']['name'], "Massage")
+
+
+class AuditHistoryTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.content_type = ContentType.objects.get_for_model(Service)
+
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(action="UPDATE", content_type=self.content_type, object_id="svc-1",
+                     user=self.admin_user, timestamp=now - timedelta(minutes=i))
+            for i in range(7)
+        ] + [
+            AuditLog(action="UPDATE", content_type=self.content_type, object_id="svc-2",
+                     timestamp=now - timedelta(days=400))
+        ])
+
+    def test_object_history_is_paginated_newest_first(self):
+        url = '/api/audit/history/?model=scheduling.service&object_id=svc-1&page_size=3'
+        timestamps = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            timestamps.extend(entry['timestamp'] for entry in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(timestamps), 7)
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+    def test_filters_by_user_and_time_range(self):
+        response = self.client.get('/api/audit/history/', {
+            'user': str(self.admin_user.pk),
+            'since': (timezone.now() - timedelta(minutes=3, seconds=30)).isoformat(),
+        })
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['results'][0]['model'], 'scheduling.service')
+
+    def test_invalid_user_and_removed_model(self):
+        response = self.client.get('/api/audit/history/', {'user': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        ContentType.objects.create(app_label='legacy', model='removedmodel')
+        response = self.client.get('/api/audit/legacy.removedmodel/1/state/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retention_archives_old_months(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archived = archive_before(timezone.now() - timedelta(days=300), archive_dir)
+
+            self.assertEqual(len(archived), 1)
+            month, path, count = archived[0]
+            self.assertEqual(count, 1)
+            with gzip.open(path, 'rt') as archive:
+                self.assertEqual(json.loads(archive.readline())['object_id'], 'svc-2')
+
+        self.assertFalse(AuditLog.objects.filter(object_id='svc-2').exists())
+        self.assertEqual(AuditLog.objects.filter(object_id='svc-1').count(), 7)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import AuditHistoryView, AuditObjectStateView
+
+urlpatterns = [
+    path('history/', AuditHistoryView.as_view(), name='audit-history'),
+    path('<str:model_label>/<str:object_id>/state/', AuditObjectStateView.as_view(), name='audit-object-state'),
+]
@@ -1,3 +1,106 @@
-from django.shortcuts import render
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from apps.users.permissions import IsAdminUser
+from .audit import covering, reconstruct
+from .models import AuditLog
+from .serializers import AuditLogSerializer
+
+
+def get_content_type(model_label):
+    try:
+        app_label, model_name = model_label.split('.', 1)
+        return ContentType.objects.get_by_natural_key(app_label, model_name.lower())
+    except (ValueError, ContentType.DoesNotExist):
+        raise NotFound(f"Unknown model '{model_label}'.")
+
+
+def parse_time_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: "Expected an ISO 8601 datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class AuditHistoryPagination(CursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class AuditHistoryView(generics.ListAPIView):
+    """
+    Paginated audit history, newest first.
+    GET: /api/audit/history/?model=patients.patient&object_id=<id>
+         /api/audit/history/?user=<user id>&since=<iso>&until=<iso>
+    Each filter combination is served by one of the AuditLog indexes.
+    An object's history includes the summary entries listing it (e.g. the
+    CREATE_SERIES entry of a recurring booking).
+    """
+    serializer_class = AuditLogSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = AuditHistoryPagination
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = AuditLogSerializer.setup_eager_loading(AuditLog.objects.all())
+
+        if params.get('model'):
+            queryset = queryset.filter(content_type=get_content_type(params['model']))
+        if params.get('object_id'):
+            queryset = queryset.filter(covering(params['object_id']))
+        if params.get('user'):
+            try:
+                user_id = AuditLog._meta.get_field('user').target_field.to_python(params['user'])
+            except DjangoValidationError:
+                raise ValidationError({'user': "Not a valid id."})
+            queryset = queryset.filter(user_id=user_id)
+
+        since = parse_time_param(self.request, 'since')
+        until = parse_time_param(self.request, 'until')
+        if since:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until:
+            queryset = queryset.filter(timestamp__lt=until)
+
+        return queryset
+
+
+class AuditObjectStateView(APIView):
+    """
+    Returns an audited object as it was at a given moment, rebuilt from its audit diffs.
+    GET: /api/audit/<app_label>.<model>/<object_id>/state/?at=2025-01-31T12:00:00Z
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, model_label, object_id):
+        content_type = get_content_type(model_label)
+        at = parse_time_param(request, 'at') or timezone.now()
+
+        # Entries of a model that was since removed can't be rebuilt
+        model = content_type.model_class()
+        if model is None:
+            raise NotFound(f"Unknown model '{model_label}'.")
+
+        state = reconstruct(model, object_id, at)
+
+        return Response({
+            "model": model_label,
+            "object_id": object_id,
+            "at": at,
+            "exists": state is not None,
+            "state": state,
+        })
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from apps.users.serializers import UserSerializer
+from apps.core.mixins import EagerLoadingMixin
 from .models import InventoryItem, InventoryTransaction
 
 class InventoryItemSerializer(serializers.ModelSerializer):
@@ -10,7 +11,15 @@ class InventoryItemSerializer(serializers.ModelSerializer):
                   'unit_price', 'supplier']
         read_only_fields = ['updated_at']
 
-class InventoryTransactionSerializer(serializers.ModelSerializer):
+class InventoryTransactionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('item', 'created_by')
+    only_fields = (
+        'id', 'item', 'transaction_type', 'quantity', 'created_by', 'notes', 'created_at',
+        'item__name',
+        'created_by__email', 'created_by__first_name', 'created_by__last_name',
+        'created_by__role', 'created_by__is_active',
+    )
+
     created_by_detail = UserSerializer(source='created_by', read_only=True)
     item_name = serializers.CharField(source='item.name', read_only=True)
 
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from apps.inventory.models import InventoryItem, InventoryTransaction
+
+User = get_user_model()
+
+
+class InventoryTransactionQueryCountTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.list_url = '/api/inventory/transactions/'
+
+    def test_list_query_count(self):
+        # Every row gets its own item and staff member, so lazy loading would show up
+        for i in range(5):
+            staff = User.objects.create_user(
+                email=f'staff{i}@test.com', password='password123', role='RECEPTIONIST'
+            )
+            item = InventoryItem.objects.create(name=f"Item {i}", unit="box")
+            InventoryTransaction.objects.create(
+                item=item, transaction_type=InventoryTransaction.Type.INBOUND,
+                quantity=10, created_by=staff
+            )
+
+        # Transactions joined with their item and staff member
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
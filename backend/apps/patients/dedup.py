@@ -0,0 +1,40 @@
+from .models import Patient
+
+
+def dedup_key(first_name, last_name, email):
+    """
+    Normalized "first|last|email" identifying a patient for duplicate
+    checks, or None without an email (such patients aren't deduplicated).
+    """
+    if not email or not first_name or not last_name:
+        return None
+    return '|'.join(part.strip().casefold() for part in (first_name, last_name, email))
+
+
+def find_duplicates(candidates, exclude_pk=None):
+    """
+    Checks a batch of candidate patients (dicts with first_name, last_name
+    and email) against the stored ones with a single indexed query.
+
+    Returns {candidate index: conflict}, the conflict being
+    {'patient': <id of the existing patient>} or {'row': <index of an
+    earlier candidate with the same key>}.
+    """
+    keys = [dedup_key(c.get('first_name'), c.get('last_name'), c.get('email')) for c in candidates]
+
+    existing = Patient.objects.filter(dedup_key__in={key for key in keys if key})
+    if exclude_pk is not None:
+        existing = existing.exclude(pk=exclude_pk)
+    existing = dict(existing.values_list('dedup_key', 'pk')) if any(keys) else {}
+
+    conflicts, seen = {}, {}
+    for index, key in enumerate(keys):
+        if not key:
+            continue
+        if key in existing:
+            conflicts[index] = {'patient': existing[key]}
+        elif key in seen:
+            conflicts[index] = {'row': seen[key]}
+        else:
+            seen[key] = index
+    return conflicts
@@ -0,0 +1,231 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from apps.core.audit import audit_batch, record
+from .dedup import dedup_key, find_duplicates
+from .models import Patient
+from .serializers import PatientSerializer
+from .signals import patients_bulk_created
+
+# Column headers accepted besides the serializer's field names
+HEADER_ALIASES = {
+    'tax_id': 'fiscal_code',
+    'phone': 'phone_number',
+    'dob': 'date_of_birth',
+}
+
+IMPORTED_FIELDS = [
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'fiscal_code', 'email', 'phone_number',
+    'address', 'insurance_provider', 'insurance_policy_number', 'medical_history', 'allergies',
+    'distance_from_clinic',
+]
+
+
+class PatientImportSerializer(PatientSerializer):
+    """
+    Field validation of one imported row, without queries: uniqueness and
+    duplicates are checked for a whole chunk at once by import_patients.
+    """
+    email = serializers.EmailField(required=False, allow_null=True, allow_blank=True, max_length=254)
+
+    class Meta(PatientSerializer.Meta):
+        fields = IMPORTED_FIELDS
+
+    def validate(self, data):
+        return data
+
+
+def read_rows(file, filename):
+    """
+    Yields the rows of an uploaded CSV or XLSX file as dicts keyed by the
+    (lowercased) header, reading the file incrementally.
+    """
+    if filename.lower().endswith('.xlsx'):
+        # Optional: only needed for spreadsheets
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+            for values in rows:
+                if any(value not in (None, '') for value in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+        return
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text):
+            yield {(key or '').strip().lower(): value for key, value in row.items()}
+    finally:
+        text.detach()
+
+
+def clean_row(row):
+    data = {HEADER_ALIASES.get(key, key): value for key, value in row.items()}
+    data = {key: value for key, value in data.items() if key in IMPORTED_FIELDS}
+    for key, value in data.items():
+        if isinstance(value, str):
+            data[key] = value.strip()
+        # Spreadsheet cells come typed
+        elif isinstance(value, datetime):
+            data[key] = value.date()
+        elif isinstance(value, float) and value.is_integer() and key != 'distance_from_clinic':
+            data[key] = str(int(value))
+    # Several patients without an email must not clash on the unique column
+    if not data.get('email'):
+        data['email'] = None
+    if data.get('date_of_birth') in ('', None):
+        data.pop('date_of_birth', None)
+    return data
+
+
+def check_chunk(chunk, seen_tax_ids, seen_emails):
+    """
+    Validates a chunk of (line, row) pairs. Returns the valid Patient
+    instances and the errors as {line: errors}. Uniqueness of tax_id and
+    email, against the table and the earlier rows of the file, and name +
+    email duplicates cost two queries for the whole chunk.
+    """
+    errors, valid = {}, []
+    # One serializer for every row, as ListSerializer does: building its fields is the costly part
+    serializer = PatientImportSerializer()
+    for line, row in chunk:
+        try:
+            valid.append((line, serializer.run_validation(clean_row(row))))
+        except serializers.ValidationError as exc:
+            # Plain strings, for the command output and the JSON summary alike
+            errors[line] = json.loads(json.dumps(exc.detail))
+
+    tax_ids = {data['tax_id'] for _, data in valid}
+    emails = {data['email'].lower() for _, data in valid if data.get('email')}
+    taken_tax_ids, taken_emails = set(), set()
+    if valid:
+        for tax_id, email in Patient.objects.alias(email_lower=Lower('email')).filter(
+            Q(tax_id__in=tax_ids) | Q(email_lower__in=emails)
+        ).values_list('tax_id', 'email'):
+            taken_tax_ids.add(tax_id)
+            taken_emails.add((email or '').lower())
+
+    duplicates = find_duplicates([data for _, data in valid])
+
+    patients = []
+    for index, (line, data) in enumerate(valid):
+        email = (data.get('email') or '').lower()
+        row_errors = {}
+        if data['tax_id'] in taken_tax_ids or data['tax_id'] in seen_tax_ids:
+            row_errors['fiscal_code'] = ["A patient with this fiscal code already exists."]
+        if email and (email in taken_emails or email in seen_emails):
+            row_errors['email'] = ["A patient with this email already exists."]
+        if index in duplicates and not row_errors:
+            row_errors['non_field_errors'] = ["A patient with the same name and email already exists."]
+
+        if row_errors:
+            errors[line] = row_errors
+            continue
+
+        seen_tax_ids.add(data['tax_id'])
+        if email:
+            seen_emails.add(email)
+        patient = Patient(**data)
+        # bulk_create skips save(), which normally sets the key
+        patient.dedup_key = dedup_key(patient.first_name, patient.last_name, patient.email)
+        patients.append((line, patient))
+
+    return patients, errors
+
+
+def insert_chunk(patients, user, source):
+    """
+    Inserts the valid patients of a chunk with one bulk_create and one
+    aggregated audit entry. If a concurrent write makes the batch fail,
+    the rows are retried one by one so only the clashing ones are lost.
+    Returns (created patients, {line: errors}).
+    """
+    errors = {}
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                created = Patient.objects.bulk_create([patient for _, patient in patients])
+        except IntegrityError:
+            created = []
+            for line, patient in patients:
+                try:
+                    with transaction.atomic():
+                        Patient.objects.bulk_create([patient])
+                    created.append(patient)
+                except IntegrityError:
+                    errors[line] = {'non_field_errors': ["Conflicts with a patient saved meanwhile."]}
+
+        if created:
+            patients_bulk_created.send(sender=Patient, patients=created)
+            record(
+                user=user,
+                action="IMPORT",
+                content_type=ContentType.objects.get_for_model(Patient),
+                object_id=created[0].pk,
+                changes=json.loads(json.dumps({
+                    'source': source,
+                    'patients': [
+                        {'id': p.pk, **{field: getattr(p, field) for field in ('first_name', 'last_name', 'tax_id', 'email')}}
+                        for p in created
+                    ],
+                }, cls=DjangoJSONEncoder))
+            )
+    return created, errors
+
+
+def import_patients(rows, user=None, source='', chunk_size=None, on_chunk=None):
+    """
+    Imports an iterable of row dicts (see read_rows) chunk by chunk. Invalid
+    rows are reported and skipped, the others are inserted.
+
+    Returns a summary: rows read, patients created, the per-row errors as
+    [{"row": <line in the file>, "errors": {...}}] (at most
+    PATIENT_IMPORT_MAX_ERRORS of them), elapsed seconds and rows per second.
+    `on_chunk(summary)` is called after each chunk, e.g. for progress output.
+    """
+    chunk_size = chunk_size or settings.PATIENT_IMPORT_CHUNK_SIZE
+    started = time.perf_counter()
+    summary = {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+    seen_tax_ids, seen_emails = set(), set()
+
+    # Line 1 is the header
+    numbered = enumerate(rows, start=2)
+    with audit_batch():
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+
+            patients, errors = check_chunk(chunk, seen_tax_ids, seen_emails)
+            created, insert_errors = insert_chunk(patients, user, source)
+            errors.update(insert_errors)
+
+            summary['rows'] += len(chunk)
+            summary['created'] += len(created)
+            summary['failed'] += len(errors)
+            room = settings.PATIENT_IMPORT_MAX_ERRORS - len(summary['errors'])
+            summary['errors'].extend(
+                {'row': line, 'errors': errors[line]} for line in sorted(errors)[:max(room, 0)]
+            )
+            if on_chunk:
+                on_chunk(summary)
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    summary['rows_per_second'] = round(summary['rows'] / summary['seconds']) if summary['seconds'] else summary['rows']
+    return summary
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.patients.importer import import_patients, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Imports patients from a CSV or XLSX file, reporting the rows that could not be imported.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row of patient fields.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows validated and inserted per batch.')
+        parser.add_argument('--user', help='Email of the user the audit entries are attributed to.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist.')
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}.")
+
+        def progress(summary):
+            self.stdout.write(f"{summary['rows']} rows read, {summary['created']} created, {summary['failed']} failed")
+
+        with path.open('rb') as file:
+            summary = import_patients(
+                read_rows(file, path.name), user=user, source=path.name,
+                chunk_size=options['chunk_size'], on_chunk=progress
+            )
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['created']} of {summary['rows']} rows in {summary['seconds']:.2f}s "
+            f"({summary['rows_per_second']} rows/s)."
+        ))
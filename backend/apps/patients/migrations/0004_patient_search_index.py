@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Must stay identical to apps.patients.search.DOCUMENT (minus the table prefix)
+DOCUMENT = (
+    "(\"first_name\" || ' ' || \"last_name\" || ' ' || \"tax_id\" || ' ' || "
+    "\"phone_number\" || ' ' || COALESCE(\"email\", ''))"
+)
+SQLITE_DOCUMENT = (
+    "{row}.first_name || ' ' || {row}.last_name || ' ' || {row}.tax_id || ' ' || "
+    "{row}.phone_number || ' ' || COALESCE({row}.email, '')"
+)
+
+
+def add_search_index(apps, schema_editor):
+    """
+    PostgreSQL: a pg_trgm GIN index over the searched columns, which serves
+    ILIKE '%term%' and similarity ranking. SQLite (tests): an FTS5 table
+    with the trigram tokenizer, kept in sync by triggers.
+    """
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "patient_search_trgm_idx" ON "patients_patient" '
+            f'USING gin ({DOCUMENT} gin_trgm_ops)'
+        )
+
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE patients_patient_fts USING fts5(document, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO patients_patient_fts (rowid, document) "
+            f"SELECT rowid, {SQLITE_DOCUMENT.format(row='patients_patient')} FROM patients_patient"
+        )
+        schema_editor.execute(f'''
+            CREATE TRIGGER patients_patient_fts_insert AFTER INSERT ON patients_patient BEGIN
+                INSERT INTO patients_patient_fts (rowid, document) VALUES (new.rowid, {SQLITE_DOCUMENT.format(row='new')});
+            END
+        ''')
+        schema_editor.execute(f'''
+            CREATE TRIGGER patients_patient_fts_update AFTER UPDATE ON patients_patient BEGIN
+                DELETE FROM patients_patient_fts WHERE rowid = old.rowid;
+                INSERT INTO patients_patient_fts (rowid, document) VALUES (new.rowid, {SQLITE_DOCUMENT.format(row='new')});
+            END
+        ''')
+        schema_editor.execute('''
+            CREATE TRIGGER patients_patient_fts_delete AFTER DELETE ON patients_patient BEGIN
+                DELETE FROM patients_patient_fts WHERE rowid = old.rowid;
+            END
+        ''')
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS "patient_search_trgm_idx"')
+
+    elif vendor == 'sqlite':
+        for trigger in ('insert', 'update', 'delete'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS patients_patient_fts_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS patients_patient_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_patient_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+def dedup_key(first_name, last_name, email):
+    # Frozen copy of apps.patients.dedup.dedup_key as of this migration
+    if not email or not first_name or not last_name:
+        return None
+    return '|'.join(part.strip().casefold() for part in (first_name, last_name, email))
+
+
+def fill_dedup_keys(apps, schema_editor):
+    Patient = apps.get_model('patients', 'Patient')
+
+    batch = []
+    for patient in Patient.objects.only('id', 'first_name', 'last_name', 'email').iterator(chunk_size=2000):
+        patient.dedup_key = dedup_key(patient.first_name, patient.last_name, patient.email)
+        batch.append(patient)
+        if len(batch) == 2000:
+            Patient.objects.bulk_update(batch, ['dedup_key'])
+            batch = []
+    Patient.objects.bulk_update(batch, ['dedup_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_patient_search_index'),
+    ]
+
+    operations = [
+        # Nullable without a default: SQLite adds the column in place, keeping the search triggers
+        migrations.AddField(
+            model_name='patient',
+            name='dedup_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=460, null=True),
+        ),
+        migrations.RunPython(fill_dedup_keys, migrations.RunPython.noop),
+    ]
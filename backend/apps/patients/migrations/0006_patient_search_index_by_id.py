@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# Same document as migration 0004
+SQLITE_DOCUMENT = (
+    "{row}.first_name || ' ' || {row}.last_name || ' ' || {row}.tax_id || ' ' || "
+    "{row}.phone_number || ' ' || COALESCE({row}.email, '')"
+)
+SEARCHED_COLUMNS = 'first_name, last_name, tax_id, phone_number, email'
+
+
+def drop_sqlite_index(schema_editor):
+    for trigger in ('insert', 'update', 'delete'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS patients_patient_fts_{trigger}')
+    schema_editor.execute('DROP TABLE IF EXISTS patients_patient_fts')
+
+
+def key_search_index_by_id(apps, schema_editor):
+    """
+    SQLite: rebuilds the FTS5 table of migration 0004 keyed by the patient
+    id (an UNINDEXED column) instead of the implicit rowid of
+    patients_patient, which VACUUM may renumber on a table without an
+    integer primary key. PostgreSQL's trigram index is unaffected.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    drop_sqlite_index(schema_editor)
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE patients_patient_fts USING fts5(patient_id UNINDEXED, document, tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO patients_patient_fts (patient_id, document) "
+        f"SELECT id, {SQLITE_DOCUMENT.format(row='patients_patient')} FROM patients_patient"
+    )
+    schema_editor.execute(f'''
+        CREATE TRIGGER patients_patient_fts_insert AFTER INSERT ON patients_patient BEGIN
+            INSERT INTO patients_patient_fts (patient_id, document) VALUES (new.id, {SQLITE_DOCUMENT.format(row='new')});
+        END
+    ''')
+    # Only for the searched columns: other updates (e.g. is_active) skip the rewrite
+    schema_editor.execute(f'''
+        CREATE TRIGGER patients_patient_fts_update AFTER UPDATE OF {SEARCHED_COLUMNS} ON patients_patient BEGIN
+            UPDATE patients_patient_fts SET document = {SQLITE_DOCUMENT.format(row='new')} WHERE patient_id = old.id;
+        END
+    ''')
+    schema_editor.execute('''
+        CREATE TRIGGER patients_patient_fts_delete AFTER DELETE ON patients_patient BEGIN
+            DELETE FROM patients_patient_fts WHERE patient_id = old.id;
+        END
+    ''')
+
+
+def key_search_index_by_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    drop_sqlite_index(schema_editor)
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE patients_patient_fts USING fts5(document, tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO patients_patient_fts (rowid, document) "
+        f"SELECT rowid, {SQLITE_DOCUMENT.format(row='patients_patient')} FROM patients_patient"
+    )
+    schema_editor.execute(f'''
+        CREATE TRIGGER patients_patient_fts_insert AFTER INSERT ON patients_patient BEGIN
+            INSERT INTO patients_patient_fts (rowid, document) VALUES (new.rowid, {SQLITE_DOCUMENT.format(row='new')});
+        END
+    ''')
+    schema_editor.execute(f'''
+        CREATE TRIGGER patients_patient_fts_update AFTER UPDATE ON patients_patient BEGIN
+            DELETE FROM patients_patient_fts WHERE rowid = old.rowid;
+            INSERT INTO patients_patient_fts (rowid, document) VALUES (new.rowid, {SQLITE_DOCUMENT.format(row='new')});
+        END
+    ''')
+    schema_editor.execute('''
+        CREATE TRIGGER patients_patient_fts_delete AFTER DELETE ON patients_patient BEGIN
+            DELETE FROM patients_patient_fts WHERE rowid = old.rowid;
+        END
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_patient_dedup_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_index_by_id, key_search_index_by_rowid),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from apps.core.models import TimeStampedModel
 from datetime import date
@@ -46,6 +47,9 @@ class Patient(TimeStampedModel):
     distance_from_clinic = models.FloatField(default=5.0, help_text="Distance in KM")
     no_show_history = models.IntegerField(default=0, help_text="Number of past missed appointments")
 
+    # Normalized name + email, set on save; see apps.patients.dedup
+    dedup_key = models.CharField(max_length=460, null=True, blank=True, editable=False, db_index=True)
+
     @property
     def age(self):
         if not self.date_of_birth:
@@ -55,8 +59,21 @@ class Patient(TimeStampedModel):
                 (today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day)
         )
 
+    def save(self, *args, **kwargs):
+        from .dedup import dedup_key
+
+        self.dedup_key = dedup_key(self.first_name, self.last_name, self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'first_name', 'last_name', 'email'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'dedup_key'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.last_name}, {self.first_name}"
 
     class Meta:
-        ordering = ['last_name', 'first_name']
\ No newline at end of file
+        ordering = ['last_name', 'first_name']
+        indexes = [
+            # Case-insensitive exact email lookups (apps.patients.search)
+            models.Index(Lower('email'), name='patient_email_lower_idx'),
+        ]
\ No newline at end of file
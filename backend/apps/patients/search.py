@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+# Text searched by the index: the same expression is used by the trigram
+# index of migration 0004, so PostgreSQL can match the index to the query.
+DOCUMENT = (
+    "(\"patients_patient\".\"first_name\" || ' ' || \"patients_patient\".\"last_name\" || ' ' || "
+    "\"patients_patient\".\"tax_id\" || ' ' || \"patients_patient\".\"phone_number\" || ' ' || "
+    "COALESCE(\"patients_patient\".\"email\", ''))"
+)
+
+# SQLite stand-in (tests): an FTS5 trigram table keyed by patient id, kept
+# in sync by triggers (migrations 0004 and 0006)
+FTS_TABLE = 'patients_patient_fts'
+
+# The trigram index can't help with shorter terms
+MIN_TERM_LENGTH = 3
+
+
+def exact_matches(queryset, term):
+    """
+    Patients whose email or tax id is exactly `term`, each found with one
+    probe of a unique/expression index. Returns None when `term` can't be one.
+    """
+    if ' ' in term:
+        return None
+    if '@' in term:
+        return queryset.alias(email_lower=Lower('email')).filter(email_lower=term.lower())
+    return queryset.filter(Q(tax_id=term) | Q(tax_id=term.upper()))
+
+
+def ranked_matches(queryset, term):
+    """
+    Patients whose name, tax id, phone or email contains `term`, best
+    matches first.
+    """
+    if len(term) < MIN_TERM_LENGTH:
+        return queryset.filter(Q(last_name__istartswith=term) | Q(first_name__istartswith=term))
+
+    if connection.vendor == 'postgresql':
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return queryset.filter(
+            RawSQL(f'{DOCUMENT} ILIKE %s', (pattern,), output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'word_similarity(%s, {DOCUMENT})', (term,), output_field=FloatField())
+        ).order_by('-search_rank', 'last_name', 'first_name')
+
+    # A quoted FTS5 phrase; with the trigram tokenizer it matches substrings.
+    # FTS5's bm25 rank means little on trigrams, so name prefixes rank first.
+    phrase = '"' + term.replace('"', '""') + '"'
+    return queryset.filter(
+        RawSQL(
+            f'"patients_patient"."id" IN (SELECT patient_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            (phrase,), output_field=BooleanField()
+        )
+    ).annotate(
+        search_rank=Case(
+            When(last_name__istartswith=term, then=Value(0)),
+            When(first_name__istartswith=term, then=Value(1)),
+            default=Value(2),
+        )
+    ).order_by('search_rank', 'last_name', 'first_name')
+
+
+class PatientSearchFilter(BaseFilterBackend):
+    """
+    Indexed replacement for SearchFilter on patients, same `search` parameter.
+
+    Exact emails and tax ids are answered from their indexes first; other
+    terms go through the trigram index (pg_trgm GIN on PostgreSQL, FTS5 on
+    SQLite) and are ranked by similarity. At most `limit` results
+    (PATIENT_SEARCH_LIMIT by default) are returned, so typeahead stays fast
+    on large tables. Must be the last filter backend, as it slices.
+
+    Matches come best first, unless the request also has an ?ordering=
+    (see OrderingFilter): then that ordering applies, the rank only
+    breaking ties.
+    """
+    search_param = 'search'
+    limit_param = 'limit'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return settings.PATIENT_SEARCH_LIMIT
+        return min(max(limit, 1), settings.PATIENT_SEARCH_MAX_LIMIT)
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        # Detail routes look the patient up in the filtered queryset, which can't be sliced
+        if not term or getattr(view, 'action', None) != 'list':
+            return queryset
+
+        limit = self.get_limit(request)
+        ordering = self.get_explicit_ordering(request, queryset, view)
+        exact = exact_matches(queryset, term)
+        if exact is not None:
+            if ordering:
+                exact = exact.order_by(*ordering)
+            found = exact[:limit]
+            if found:
+                return found
+
+        ranked = ranked_matches(queryset, term)
+        if ordering:
+            ranked = ranked.order_by(*ordering, *ranked.query.order_by)
+        return ranked[:limit]
+
+    def get_explicit_ordering(self, request, queryset, view):
+        ordering_filter = OrderingFilter()
+        if not request.query_params.get(ordering_filter.ordering_param):
+            return None
+        return ordering_filter.get_ordering(request, queryset, view)
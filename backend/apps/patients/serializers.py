@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .dedup import find_duplicates
 from .models import Patient
 
 
@@ -24,24 +25,20 @@ class PatientSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """
         Check if a patient with the same First Name, Last Name, and Email already exists.
+        One probe of the dedup_key index (see apps.patients.dedup).
         """
-        email = data.get('email')
-        first_name = data.get('first_name')
-        last_name = data.get('last_name')
-
-        if email and first_name and last_name:
-            exists_query = Patient.objects.filter(
-                email=email,
-                first_name__iexact=first_name,
-                last_name__iexact=last_name
-            )
-
-            if self.instance:
-                exists_query = exists_query.exclude(pk=self.instance.pk)
-
-            if exists_query.exists():
-                raise serializers.ValidationError({
-                    "non_field_errors": [f"A patient named {first_name} {last_name} with email {email} already exists."]
-                })
-
-        return data
\ No newline at end of file
+        # Partial updates are checked against the stored values of the missing fields
+        values = {
+            field: data.get(field, getattr(self.instance, field, None))
+            for field in ('first_name', 'last_name', 'email')
+        }
+
+        if find_duplicates([values], exclude_pk=self.instance.pk if self.instance else None):
+            raise serializers.ValidationError({
+                "non_field_errors": [
+                    f"A patient named {values['first_name']} {values['last_name']} "
+                    f"with email {values['email']} already exists."
+                ]
+            })
+
+        return data
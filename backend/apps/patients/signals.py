@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent with `patients` after a bulk_create, which skips post_save (see apps.patients.importer)
+patients_bulk_created = Signal()
@@ -0,0 +1,311 @@
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from openpyxl import Workbook
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from apps.analytics.stats import read_dashboard
+from apps.core.audit import reconstruct
+from apps.core.models import AuditLog
+from apps.patients.dedup import find_duplicates
+from apps.patients.models import Patient
+from apps.patients.serializers import PatientSerializer
+from apps.scheduling.models import Appointment, Service
+from apps.scheduling.tasks import send_appointment_confirmation_email
+from apps.users.serializers import MyTokenObtainPairSerializer
+
+User = get_user_model()
+
+
+class PatientSearchTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+
+        people = [
+            ('Mario', 'Rossi', 'RSSMRA80A01H501U', 'mario.rossi@example.com', '3331112222'),
+            ('Maria', 'Rossini', 'RSSMRA85B41H501X', 'maria@example.com', '3334445555'),
+            ('Luca', 'Bianchi', 'BNCLCU90C01F205Y', None, '3336667777'),
+        ]
+        self.patients = {
+            last_name: Patient.objects.create(
+                first_name=first_name, last_name=last_name, tax_id=tax_id, email=email, phone_number=phone
+            )
+            for first_name, last_name, tax_id, email, phone in people
+        }
+
+    def search(self, term, **params):
+        response = self.client.get('/api/patients/', {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['last_name'] for row in response.data]
+
+    def test_substring_search_over_all_fields(self):
+        self.assertCountEqual(self.search('ross'), ['Rossi', 'Rossini'])
+        self.assertEqual(self.search('bianc'), ['Bianchi'])
+        self.assertEqual(self.search('6667'), ['Bianchi'])
+        self.assertEqual(self.search('nope'), [])
+
+    def test_exact_email_and_tax_id_fast_paths(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search('Mario.Rossi@example.com'), ['Rossi'])
+
+        self.assertEqual(self.search('rssmra85b41h501x'), ['Rossini'])
+        # Partial emails fall back to the ranked search
+        self.assertEqual(self.search('maria@'), ['Rossini'])
+
+    def test_results_are_limited(self):
+        self.assertEqual(len(self.search('ross', limit=1)), 1)
+        self.assertEqual(len(self.search('ro')), 2)
+
+    def test_index_follows_updates_and_deletes(self):
+        rossi = self.patients['Rossi']
+        rossi.last_name = 'Verdi'
+        rossi.save()
+        self.patients['Rossini'].delete()
+
+        self.assertEqual(self.search('rossini'), [])
+        self.assertEqual(self.search('verd'), ['Verdi'])
+        # Still found by email
+        self.assertEqual(self.search('ross'), ['Verdi'])
+
+    def test_explicit_ordering_is_kept(self):
+        # By rank, the last-name prefix comes first
+        self.assertEqual(self.search('ross'), ['Rossi', 'Rossini'])
+        self.assertEqual(self.search('ross', ordering='-last_name'), ['Rossini', 'Rossi'])
+        self.assertEqual(self.search('ross', ordering='-last_name', limit=1), ['Rossini'])
+        self.assertEqual(self.search('RSSMRA80A01H501U', ordering='-last_name'), ['Rossi'])
+
+    def test_detail_routes_ignore_the_search(self):
+        # e.g. a detail link built from the list URL
+        url = f"/api/patients/{self.patients['Bianchi'].pk}/"
+        response = self.client.get(url, {'search': 'ross'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['last_name'], 'Bianchi')
+
+
+class MyPatientProfileTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='jane@test.com', password='password123', role='PATIENT')
+        self.physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        self.patient = Patient.objects.create(
+            user=self.user, first_name='Jane', last_name='Roe', tax_id='JANEROE123', email='jane@test.com'
+        )
+        other = Patient.objects.create(first_name='John', last_name='Doe', tax_id='JOHNDOE123')
+        self.service = Service.objects.create(name='Physio', duration_minutes=30, price=50)
+
+        # Booking for a patient with an email also queues the confirmation
+        mock.patch.object(send_appointment_confirmation_email, 'delay').start()
+        self.addCleanup(mock.patch.stopall)
+
+        now = timezone.now()
+        for patient, days in ((self.patient, -10), (self.patient, -3), (self.patient, 2), (self.patient, 5), (other, 1)):
+            start = now + timedelta(days=days)
+            Appointment.objects.create(
+                patient=patient, therapist=self.physio, service=self.service,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+        token = MyTokenObtainPairSerializer.get_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    def test_profile_and_appointments_in_one_call(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/patients/me/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['profile']['fiscal_code'], 'JANEROE123')
+        upcoming = [row['start_time'] for row in response.data['upcoming']]
+        recent = [row['start_time'] for row in response.data['recent']]
+        self.assertEqual(len(upcoming), 2)
+        self.assertEqual(upcoming, sorted(upcoming))
+        self.assertEqual(len(recent), 2)
+        self.assertEqual(recent, sorted(recent, reverse=True))
+
+    @override_settings(PATIENT_PORTAL_APPOINTMENTS=1)
+    def test_appointments_are_bounded(self):
+        response = self.client.get('/api/patients/me/')
+
+        self.assertEqual(len(response.data['upcoming']), 1)
+        self.assertEqual(len(response.data['recent']), 1)
+
+    def test_etag(self):
+        etag = self.client.get('/api/patients/me/')['ETag']
+
+        response = self.client.get('/api/patients/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.patient.phone_number = '555'
+        self.patient.save()
+        response = self.client.get('/api/patients/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_users_without_profile_get_404(self):
+        token = MyTokenObtainPairSerializer.get_token(self.physio)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+        self.assertEqual(self.client.get('/api/patients/me/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PatientDedupTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+        self.patient = Patient.objects.create(
+            first_name='Mario', last_name='Rossi', tax_id='RSSMRA80A01H501U', email='mario@example.com'
+        )
+
+    def test_key_is_kept_up_to_date(self):
+        self.assertEqual(self.patient.dedup_key, 'mario|rossi|mario@example.com')
+
+        self.patient.last_name = 'Verdi'
+        self.patient.save(update_fields=['last_name'])
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.dedup_key, 'mario|verdi|mario@example.com')
+
+    def test_duplicates_are_rejected_with_one_query(self):
+        serializer = PatientSerializer(data={
+            'first_name': ' MARIO', 'last_name': 'rossi', 'fiscal_code': 'OTHER12345',
+            'email': 'Mario@Example.com', 'gender': 'M', 'phone_number': '1'
+        })
+        with self.assertNumQueries(1), self.assertRaises(ValidationError):
+            serializer.validate(serializer.initial_data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('already exists', str(serializer.errors['non_field_errors']))
+
+    def test_partial_update_is_checked_against_stored_values(self):
+        other = Patient.objects.create(first_name='Mario', last_name='Rossi', tax_id='OTHER12345', email='other@example.com')
+
+        response = self.client.patch(f'/api/patients/{other.id}/', {'email': 'mario@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(f'/api/patients/{self.patient.id}/', {'phone_number': '123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_batch_check(self):
+        candidates = [
+            {'first_name': 'Anna', 'last_name': 'Bianchi', 'email': 'anna@example.com'},
+            {'first_name': 'mario', 'last_name': 'ROSSI', 'email': 'mario@example.com'},
+            {'first_name': 'Anna', 'last_name': 'Bianchi', 'email': 'ANNA@example.com'},
+            {'first_name': 'Luca', 'last_name': 'Verdi', 'email': None},
+        ]
+
+        with self.assertNumQueries(1):
+            conflicts = find_duplicates(candidates)
+
+        self.assertEqual(conflicts, {1: {'patient': self.patient.pk}, 2: {'row': 0}})
+
+
+class PatientImportTests(APITestCase):
+    HEADER = 'first_name,last_name,fiscal_code,email,phone_number,gender,date_of_birth\n'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+        Patient.objects.create(first_name='Mario', last_name='Rossi', tax_id='EXISTING01', email='mario@example.com')
+
+    def upload(self, content, name='patients.csv'):
+        return self.client.post(
+            '/api/patients/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+
+    def test_valid_rows_are_imported_and_bad_ones_reported(self):
+        content = self.HEADER + (
+            'Anna,Bianchi,NEW0000001,anna@example.com,333,F,1990-01-02\n'
+            'Luca,Verdi,NEW0000002,,334,M,\n'
+            'Bad,Gender,NEW0000003,bad@example.com,335,X,\n'
+            'Dup,Tax,EXISTING01,dup@example.com,336,M,\n'
+            'Dup,Email,NEW0000004,ANNA@example.com,337,F,\n'
+            'Dup,InFile,NEW0000001,other@example.com,338,F,\n'
+            'Paolo,Neri,NEW0000005,,339,M,\n'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(content.encode())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['failed']), (7, 3, 4))
+        self.assertEqual({e['row']: list(e['errors']) for e in response.data['errors']}, {
+            4: ['gender'], 5: ['fiscal_code'], 6: ['email'], 7: ['fiscal_code'],
+        })
+        self.assertIn('rows_per_second', response.data)
+
+        anna = Patient.objects.get(tax_id='NEW0000001')
+        self.assertEqual(anna.dedup_key, 'anna|bianchi|anna@example.com')
+        self.assertEqual(read_dashboard(timezone.localdate())['total_patients'], 4)
+
+    @override_settings(PATIENT_IMPORT_CHUNK_SIZE=2)
+    def test_one_audit_entry_per_chunk(self):
+        content = self.HEADER + ''.join(f'P{n},Chunk,CHUNK{n:05d},,33{n},O,\n' for n in range(5))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(content.encode())
+
+        entries = AuditLog.objects.filter(action='IMPORT')
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(sum(len(e.changes['patients']) for e in entries), 5)
+        self.assertFalse(AuditLog.objects.filter(action='CREATE', object_id__in=[
+            str(pk) for pk in Patient.objects.filter(last_name='Chunk').values_list('pk', flat=True)
+        ]).exists())
+
+    def test_every_imported_patient_has_audit_history(self):
+        content = self.HEADER + (
+            'Anna,Bianchi,NEW0000001,anna@example.com,333,F,1990-01-02\n'
+            'Luca,Verdi,NEW0000002,luca@example.com,334,M,\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(content.encode())
+
+        luca = Patient.objects.get(tax_id='NEW0000002')
+        self.assertNotEqual(AuditLog.objects.get(action='IMPORT').object_id, str(luca.pk))
+
+        state = reconstruct(Patient, luca.pk, timezone.now())
+        self.assertEqual(state, {
+            'first_name': 'Luca', 'last_name': 'Verdi', 'tax_id': 'NEW0000002', 'email': 'luca@example.com',
+        })
+
+        response = self.client.get('/api/audit/history/', {'model': 'patients.patient', 'object_id': str(luca.pk)})
+        self.assertEqual([entry['action'] for entry in response.data['results']], ['IMPORT'])
+
+    def test_xlsx_upload(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['First_Name', 'Last_Name', 'Tax_ID', 'Email', 'Phone', 'Gender', 'DOB'])
+        sheet.append(['Giulia', 'Romano', 'XLSX000001', 'giulia@example.com', 3331234567, 'F', datetime(1985, 5, 6)])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        response = self.upload(buffer.getvalue(), name='patients.xlsx')
+
+        self.assertEqual(response.data['created'], 1, response.data)
+        giulia = Patient.objects.get(tax_id='XLSX000001')
+        self.assertEqual((giulia.phone_number, giulia.date_of_birth), ('3331234567', date(1985, 5, 6)))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(self.HEADER + 'Anna,Bianchi,CMD0000001,,333,F,\nNo,Phone,CMD0000002,,,F,\n')
+        self.addCleanup(os.remove, file.name)
+        out = StringIO()
+
+        call_command('import_patients', file.name, stdout=out)
+
+        self.assertIn('Row 3', out.getvalue())
+        self.assertIn('Imported 1 of 2 rows', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+
+    def test_only_staff_can_import(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='p@test.com', password='password123', role='PATIENT'))
+        response = self.upload((self.HEADER + 'A,B,C0000001,,1,F,\n').encode())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
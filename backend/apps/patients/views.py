@@ -1,19 +1,42 @@
+import csv
+import hashlib
+import json
+from zipfile import BadZipFile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from rest_framework import viewsets, permissions, filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.core.mixins import TokenClaimsReadMixin
+from apps.scheduling.models import Appointment
+from apps.scheduling.serializers import AppointmentSerializer
+from apps.users.permissions import IsAdminOrReceptionist
+from .importer import import_patients, read_rows
 from .models import Patient
+from .search import PatientSearchFilter
 from .serializers import PatientSerializer
 
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(TokenClaimsReadMixin, viewsets.ModelViewSet):
     """
     API for managing Patient records.
-    Supports searching by name and fiscal code.
+    Supports searching by name, fiscal code, phone and email
+    (?search=, ranked and limited, see apps.patients.search). With
+    ?ordering= as well, the matches follow that ordering instead of the rank.
     """
     serializer_class = PatientSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # `me` only needs the user's pk, so it can skip the user lookup too
+    token_claims_actions = ('list', 'retrieve', 'me')
 
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
-    search_fields = ['first_name', 'last_name', 'tax_id', 'phone_number', 'email']
+    # PatientSearchFilter slices the queryset, so it must come last
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PatientSearchFilter]
     filterset_fields = ['gender', 'is_active']
     ordering_fields = ['last_name', 'created_at']
 
@@ -23,7 +46,64 @@ class PatientViewSet(viewsets.ModelViewSet):
         if user.is_staff or user.role in ['ADMIN', 'PHYSIO', 'RECEPTION']:
             return Patient.objects.all()
 
-        if hasattr(user, 'patient_profile'):
-            return Patient.objects.filter(user=user)
+        # Empty for users without a patient profile
+        return Patient.objects.filter(user_id=user.pk)
+
+
+    @action(detail=False, methods=['get'])
+    def me(self, request):
+        """
+        The patient portal page in one call: the logged-in user's patient
+        profile with their next and most recent appointments (bounded by
+        PATIENT_PORTAL_APPOINTMENTS each).
+        GET: /api/patients/me/ (answers 304 when If-None-Match has the current ETag)
+        """
+        patient = Patient.objects.filter(user_id=request.user.pk).first()
+        if patient is None:
+            raise NotFound("No patient profile is linked to this account.")
+
+        now = timezone.now()
+        limit = settings.PATIENT_PORTAL_APPOINTMENTS
+        appointments = AppointmentSerializer.setup_eager_loading(
+            Appointment.objects.filter(patient=patient), restrict_columns=True
+        )
+        data = {
+            'profile': PatientSerializer(patient).data,
+            'upcoming': AppointmentSerializer(
+                appointments.filter(end_time__gte=now).order_by('start_time')[:limit], many=True
+            ).data,
+            'recent': AppointmentSerializer(
+                appointments.filter(end_time__lt=now).order_by('-start_time')[:limit], many=True
+            ).data,
+        }
+
+        etag = '"%s"' % hashlib.md5(
+            json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode(), usedforsecurity=False
+        ).hexdigest()
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        return Response(data, headers={'ETag': etag})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            permission_classes=[IsAdminOrReceptionist])
+    def import_file(self, request):
+        """
+        Bulk import of patients from a CSV or XLSX upload (header row with the
+        patient field names). Valid rows are inserted, the others reported.
+        POST: /api/patients/import/ (multipart, "file")
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': "Upload a CSV or XLSX file."})
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise ValidationError({'file': "Only .csv and .xlsx files are supported."})
+
+        try:
+            summary = import_patients(read_rows(upload, upload.name), user=request.user, source=upload.name)
+        except (UnicodeDecodeError, csv.Error, BadZipFile) as exc:
+            raise ValidationError({'file': f"Could not read the file: {exc}"})
+
+        return Response(summary)
 
-        return Patient.objects.none()
@@ -0,0 +1,239 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, Room
+
+VERSION_KEY = 'availability:version:{day}'
+# Bumped when therapists or rooms change, which affects every day
+GENERATION_KEY = 'availability:generation'
+DAY_KEY = 'availability:{day}:g{generation}:v{version}:{hours}:{duration}'
+
+
+def opening_hours(day):
+    """
+    Returns the (open, close) datetimes of the clinic on `day`, or None
+    if it is closed that day.
+    """
+    if day.weekday() not in settings.CLINIC_OPEN_WEEKDAYS:
+        return None
+
+    opens = datetime.combine(day, datetime.strptime(settings.CLINIC_OPENING_TIME, '%H:%M').time())
+    closes = datetime.combine(day, datetime.strptime(settings.CLINIC_CLOSING_TIME, '%H:%M').time())
+    return timezone.make_aware(opens), timezone.make_aware(closes)
+
+
+def opening_tag():
+    """
+    Opening hours as part of the cache keys: the cache outlives the
+    processes, so changed settings mustn't hit slots computed with old ones.
+    """
+    weekdays = ''.join(str(day) for day in sorted(settings.CLINIC_OPEN_WEEKDAYS))
+    return f'{weekdays}-{settings.CLINIC_OPENING_TIME}-{settings.CLINIC_CLOSING_TIME}'
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock, so an evicted generation never reuses an old number
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_all():
+    """
+    Makes every cached day stale. Called when a therapist or room is
+    added, removed, activated or deactivated.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_days(*days):
+    """
+    Bumps the version of each day, so cached slots of those days are
+    ignored. Called when an appointment on that day changes.
+    """
+    for day in set(days):
+        key = VERSION_KEY.format(day=day.isoformat())
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def merge_intervals(intervals):
+    """
+    Sorts the intervals and merges the ones that overlap or touch.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_intervals(opens, closes, busy):
+    """
+    The gaps between the merged busy intervals, within opening hours.
+    """
+    free = []
+    cursor = opens
+    for start, end in merge_intervals(busy):
+        if start > cursor:
+            free.append((cursor, min(start, closes)))
+        cursor = max(cursor, end)
+        if cursor >= closes:
+            break
+    if cursor < closes:
+        free.append((cursor, closes))
+    return free
+
+
+def fitting_slots(slots, free):
+    """
+    Indexes of the slots, (start, end) sorted by start, that lie inside
+    one of the free intervals (sorted), in a single pass over both.
+    """
+    fitting = []
+    i, count = 0, len(free)
+    for index, (start, end) in enumerate(slots):
+        while i < count and free[i][1] < end:
+            i += 1
+        if i == count:
+            break
+        if free[i][0] <= start:
+            fitting.append(index)
+    return fitting
+
+
+def compute_days(days, duration, therapist_ids, room_ids):
+    """
+    Bookable slots of each day, computed from the busy intervals of the
+    whole range, loaded with one query. Each slot lists the therapists and
+    rooms free for its full duration.
+    """
+    hours = {day: opening_hours(day) for day in days}
+    open_days = {day: h for day, h in hours.items() if h}
+    if not open_days:
+        return {day: [] for day in days}
+
+    range_start = min(h[0] for h in open_days.values())
+    range_end = max(h[1] for h in open_days.values())
+
+    busy = {}
+    rows = Appointment.objects.filter(
+        Q(therapist_id__in=therapist_ids) | Q(room_id__in=room_ids),
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).exclude(
+        status=Appointment.Status.CANCELLED
+    ).values_list('therapist_id', 'room_id', 'start_time', 'end_time')
+
+    # Bucketed per resource and day, so each day only sweeps its own bookings
+    tz = timezone.get_current_timezone()
+    for therapist_id, room_id, start, end in rows:
+        day, last_day = start.astimezone(tz).date(), end.astimezone(tz).date()
+        while day <= last_day:
+            if therapist_id is not None:
+                busy.setdefault(('therapist', therapist_id, day), []).append((start, end))
+            if room_id is not None:
+                busy.setdefault(('room', room_id, day), []).append((start, end))
+            day += timedelta(days=1)
+
+    step = timedelta(minutes=settings.AVAILABILITY_SLOT_STEP_MINUTES)
+    resources = [
+        ('therapist', [(pk, str(pk)) for pk in therapist_ids], 1),
+        ('room', [(pk, str(pk)) for pk in room_ids], 2),
+    ]
+    results = {day: [] for day in days}
+
+    for day, (opens, closes) in open_days.items():
+        slots = []
+        start = opens
+        while start + duration <= closes:
+            slots.append((start, start + duration))
+            start += step
+
+        free_at = [(start, [], []) for start, _ in slots]
+        for kind, ids, position in resources:
+            for resource_id, label in ids:
+                free = free_intervals(opens, closes, busy.get((kind, resource_id, day), []))
+                for index in fitting_slots(slots, free):
+                    free_at[index][position].append(label)
+
+        results[day] = [
+            slot for slot in free_at
+            # Appointments don't need a room if the clinic has none
+            if slot[1] and (slot[2] or not room_ids)
+        ]
+
+    return results
+
+
+def find_slots(service, start_date, end_date, therapist=None, room=None):
+    """
+    Bookable slots for `service` from `start_date` to `end_date`
+    (inclusive), optionally limited to one therapist and/or room.
+
+    Days are cached for every active therapist and room; the filters are
+    applied afterwards, so all searches share the same cache entries.
+    """
+    duration = timedelta(minutes=service.duration_minutes)
+    days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+
+    versions = cache.get_many([VERSION_KEY.format(day=day.isoformat()) for day in days])
+    generation, hours = current_generation(), opening_tag()
+    keys = {
+        day: DAY_KEY.format(
+            day=day.isoformat(),
+            generation=generation,
+            version=versions.get(VERSION_KEY.format(day=day.isoformat()), 0),
+            hours=hours,
+            duration=service.duration_minutes
+        )
+        for day in days
+    }
+    cached = cache.get_many(keys.values())
+    per_day = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    missing = [day for day in days if day not in per_day]
+    if missing:
+        therapist_ids = list(get_user_model().objects.filter(role='PHYSIO', is_active=True).values_list('pk', flat=True))
+        room_ids = list(Room.objects.filter(is_active=True).values_list('pk', flat=True))
+
+        computed = compute_days(missing, duration, therapist_ids, room_ids)
+        cache.set_many({keys[day]: slots for day, slots in computed.items()}, settings.AVAILABILITY_CACHE_TIMEOUT)
+        per_day.update(computed)
+
+    now = timezone.now()
+    slots = []
+    for day in days:
+        for start, therapists, rooms in per_day[day]:
+            if start < now:
+                continue
+            if therapist is not None:
+                therapists = [t for t in therapists if t == str(therapist)]
+            if room is not None:
+                rooms = [r for r in rooms if r == str(room)]
+                if not rooms:
+                    continue
+            if therapists:
+                slots.append({
+                    'start_time': start,
+                    'end_time': start + duration,
+                    'therapists': therapists,
+                    'rooms': rooms,
+                })
+    return slots
+
@@ -0,0 +1,27 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class AppointmentConflict(APIException):
+    """
+    409 raised when an appointment would double-book a room or therapist.
+    The body lists every clashing booking.
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The appointment overlaps an existing booking."
+    default_code = 'appointment_conflict'
+
+    def __init__(self, conflicts):
+        super().__init__({
+            'detail': self.default_detail,
+            'code': self.default_code,
+            'conflicts': [
+                {
+                    'resource': conflict['resource'],
+                    'appointment': str(conflict['conflicts_with'].pk),
+                    'start_time': conflict['conflicts_with'].start_time.isoformat(),
+                    'end_time': conflict['conflicts_with'].end_time.isoformat(),
+                }
+                for conflict in conflicts
+            ],
+        })
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.scheduling.models import Appointment
+from apps.scheduling.serializers import AppointmentSerializer
+from apps.scheduling.tasks import pending_reminders
+
+
+class Command(BaseCommand):
+    help = 'Prints the query plans of the reminder, dashboard and calendar appointment queries.'
+
+    def handle(self, *args, **kwargs):
+        now = timezone.now()
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        queries = {
+            'Reminder sweep': pending_reminders(now),
+            'Dashboard (today)': Appointment.objects.on_day(now.date()).values('pk'),
+            'Calendar (this week)': AppointmentSerializer.setup_eager_loading(
+                Appointment.objects.filter(start_time__gte=week_start, start_time__lt=week_start + timedelta(days=7)),
+                restrict_columns=True
+            ).order_by('start_time'),
+        }
+
+        # EXPLAIN ANALYZE runs the query; other backends only print the plan.
+        options = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(f'--- {name} ---'))
+            self.stdout.write(queryset.explain(**options))
+            self.stdout.write('')
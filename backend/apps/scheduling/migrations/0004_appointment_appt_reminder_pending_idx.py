@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_initial'),
+        ('scheduling', '0003_appointment_appt_start_time_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['start_time'], name='appt_reminder_pending_idx'),
+        ),
+    ]
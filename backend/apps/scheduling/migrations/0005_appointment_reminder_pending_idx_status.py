@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_initial'),
+        ('scheduling', '0004_appointment_appt_reminder_pending_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_reminder_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('reminder_sent', False), ('status__in', ['SCHEDULED', 'CONFIRMED'])), fields=['start_time'], name='appt_reminder_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# (constraint, column) pairs; the names are matched in apps.scheduling.overlaps
+CONSTRAINTS = [
+    ('appt_room_no_overlap', 'room_id'),
+    ('appt_therapist_no_overlap', 'therapist_id'),
+]
+
+
+def add_overlap_constraints(apps, schema_editor):
+    """
+    Rejects overlapping, non-cancelled appointments for the same room or
+    therapist with GiST exclusion constraints. PostgreSQL only; other
+    backends check in Python (see apps.scheduling.overlaps). Fails if the
+    table already holds double bookings, which must be resolved first.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Needed for the uuid equality operator in a GiST index
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for name, column in CONSTRAINTS:
+        schema_editor.execute(f'''
+            ALTER TABLE "scheduling_appointment" ADD CONSTRAINT "{name}"
+            EXCLUDE USING gist ("{column}" WITH =, tstzrange("start_time", "end_time", '[)') WITH &&)
+            WHERE ("status" <> 'CANCELLED')
+        ''')
+
+
+def remove_overlap_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name, _ in CONSTRAINTS:
+        schema_editor.execute(f'ALTER TABLE "scheduling_appointment" DROP CONSTRAINT IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0005_appointment_reminder_pending_idx_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraints, remove_overlap_constraints),
+    ]
@@ -1,5 +1,8 @@
+from datetime import datetime, time, timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from apps.core.models import TimeStampedModel
 from apps.patients.models import Patient
 from django.core.exceptions import ValidationError
@@ -33,6 +36,26 @@ class Service(TimeStampedModel):
         return f"{self.name} ({self.duration_minutes} min) - €{self.price}"
 
 
+class AppointmentQuerySet(models.QuerySet):
+    def on_day(self, day):
+        """
+        Appointments starting on the given date (current time zone).
+        Filters on a start_time range rather than start_time__date, so the
+        start_time indexes can be used.
+        """
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        return self.filter(start_time__gte=start, start_time__lt=start + timedelta(days=1))
+
+    def awaiting_reminder(self, after, until):
+        # Same predicate as the appt_reminder_pending_idx partial index
+        return self.filter(
+            start_time__gt=after,
+            start_time__lte=until,
+            reminder_sent=False,
+            status__in=Appointment.REMINDER_STATUSES,
+        )
+
+
 class Appointment(TimeStampedModel):
     """
     The core appointment record linking Patient, Staff, Service, and Room.
@@ -45,6 +68,9 @@ class Appointment(TimeStampedModel):
         CANCELLED = 'CANCELLED', 'Cancelled'
         NO_SHOW = 'NO_SHOW', 'No Show'
 
+    # Statuses that still get the 24h reminder
+    REMINDER_STATUSES = [Status.SCHEDULED, Status.CONFIRMED]
+
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments')
     therapist = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -69,6 +95,8 @@ class Appointment(TimeStampedModel):
 
     reminder_sent = models.BooleanField(default=False, help_text="Has the 24h reminder been sent?")
 
+    objects = AppointmentQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.patient} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
@@ -81,9 +109,42 @@ class Appointment(TimeStampedModel):
                     'end_time': "End time must be after the start time."
                 })
 
+            self.check_overlaps()
+
+    def check_overlaps(self):
+        """
+        Double bookings are rejected by exclusion constraints on PostgreSQL;
+        other backends run the same check here.
+        """
+        from .overlaps import enforced_by_database, find_conflicts
+
+        if enforced_by_database():
+            return
+
+        conflicts = find_conflicts([self])
+        if conflicts:
+            raise ValidationError({
+                c['resource']: ValidationError(
+                    "This %(resource)s is already booked at that time.",
+                    code='overlap',
+                    params={'resource': c['resource']}
+                )
+                for c in conflicts
+            })
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
 
     class Meta:
-        ordering = ['-start_time']
\ No newline at end of file
+        ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['start_time', 'id'], name='appt_start_time_id_idx'),
+            # Reminder queries: only appointments still waiting for their reminder.
+            # Backends without partial indexes (MySQL) skip it.
+            models.Index(
+                fields=['start_time'],
+                condition=models.Q(reminder_sent=False, status__in=['SCHEDULED', 'CONFIRMED']),
+                name='appt_reminder_pending_idx'
+            ),
+        ]
\ No newline at end of file
@@ -0,0 +1,79 @@
+from django.db import connection
+from django.db.models import Q
+
+from .models import Appointment
+
+# Exclusion constraints created by migration 0006 (PostgreSQL only)
+CONSTRAINTS = {
+    'appt_room_no_overlap': 'room',
+    'appt_therapist_no_overlap': 'therapist',
+}
+
+RESOURCES = ('room', 'therapist')
+
+
+def enforced_by_database():
+    """
+    On PostgreSQL overlapping bookings are rejected by exclusion
+    constraints. Other backends (SQLite in tests) rely on find_conflicts().
+    """
+    return connection.vendor == 'postgresql'
+
+
+def find_conflicts(appointments):
+    """
+    Returns the double bookings involving the given (saved or unsaved)
+    appointments, as a list of dicts with the clashing resource, the
+    appointment and the one it overlaps.
+
+    The existing bookings of the rooms and therapists involved are loaded
+    with one query, then each resource's intervals are sorted by start and
+    swept once, so checking many appointments (e.g. a recurring series)
+    costs the same single query. Intervals are half-open: back-to-back
+    appointments don't clash.
+    """
+    candidates = [a for a in appointments if a.status != Appointment.Status.CANCELLED and a.start_time and a.end_time]
+    if not candidates:
+        return []
+
+    resource_filter = Q()
+    for resource in RESOURCES:
+        ids = {getattr(a, f'{resource}_id') for a in candidates} - {None}
+        if ids:
+            resource_filter |= Q(**{f'{resource}_id__in': ids})
+    if not resource_filter:
+        return []
+
+    existing = Appointment.objects.filter(
+        resource_filter,
+        start_time__lt=max(a.end_time for a in candidates),
+        end_time__gt=min(a.start_time for a in candidates),
+    ).exclude(
+        status=Appointment.Status.CANCELLED
+    ).exclude(
+        pk__in=[a.pk for a in candidates if a.pk and not a._state.adding]
+    ).only('id', 'room_id', 'therapist_id', 'start_time', 'end_time')
+
+    # (resource, id) -> [(start, end, is_candidate, appointment)]
+    intervals = {}
+    for appointment, is_candidate in [(a, False) for a in existing] + [(a, True) for a in candidates]:
+        for resource in RESOURCES:
+            resource_id = getattr(appointment, f'{resource}_id')
+            if resource_id is not None:
+                intervals.setdefault((resource, resource_id), []).append(
+                    (appointment.start_time, appointment.end_time, is_candidate, appointment)
+                )
+
+    conflicts = []
+    for (resource, _), items in intervals.items():
+        items.sort(key=lambda item: item[0])
+        active = []
+        for start, end, is_candidate, appointment in items:
+            # Drop the intervals that ended before this one starts
+            active = [item for item in active if item[1] > start]
+            for other in active:
+                if is_candidate or other[2]:
+                    conflicts.append({'resource': resource, 'appointment': appointment, 'conflicts_with': other[3]})
+            active.append((start, end, is_candidate, appointment))
+
+    return conflicts
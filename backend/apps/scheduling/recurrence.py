@@ -0,0 +1,95 @@
+import json
+from datetime import timedelta
+from functools import partial
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.audit import record
+from apps.core.middleware import get_current_user
+from .availability import invalidate_days
+from .models import Appointment
+from .signals import appointments_bulk_created
+from .tasks import schedule_reminder, send_series_confirmation_email
+
+FREQUENCIES = {
+    'WEEKLY': timedelta(weeks=1),
+    'BIWEEKLY': timedelta(weeks=2),
+}
+
+MAX_OCCURRENCES = 52
+
+
+def occurrence_times(start, end, frequency, count=None, until=None):
+    """
+    (start, end) of every session of the series: `count` sessions, or
+    every session starting on or before the `until` date. Callers must
+    keep either within MAX_OCCURRENCES (see RecurringAppointmentSerializer).
+    """
+    interval = FREQUENCIES[frequency]
+    times = []
+    while len(times) < (count or MAX_OCCURRENCES):
+        if until and start.date() > until:
+            break
+        times.append((start, end))
+        start, end = start + interval, end + interval
+    return times
+
+
+def create_series(data, times):
+    """
+    Inserts every session of a recurring booking with one bulk_create.
+
+    bulk_create skips save() and the post_save signals, so the side effects
+    are done here once for the whole series: one summarized audit entry,
+    one confirmation email listing all dates, the per-session reminders and
+    the availability cache. Conflicts must have been checked by the caller.
+    """
+    # The fields were validated once by the serializer; full_clean() per row would re-query every FK.
+    appointments = [Appointment(**data, start_time=start, end_time=end) for start, end in times]
+
+    with transaction.atomic():
+        Appointment.objects.bulk_create(appointments)
+        appointments_bulk_created.send(sender=Appointment, appointments=appointments)
+
+        first = appointments[0]
+        record(
+            user=get_current_user(),
+            action="CREATE_SERIES",
+            content_type=ContentType.objects.get_for_model(Appointment),
+            object_id=first.pk,
+            changes=json.loads(json.dumps({
+                'patient': first.patient_id,
+                'therapist': first.therapist_id,
+                'service': first.service_id,
+                'room': first.room_id,
+                'status': first.status,
+                'occurrences': [
+                    {'id': a.pk, 'start_time': a.start_time, 'end_time': a.end_time}
+                    for a in appointments
+                ],
+            }, cls=DjangoJSONEncoder))
+        )
+
+        transaction.on_commit(partial(_after_commit, appointments))
+
+    return appointments
+
+
+def _after_commit(appointments):
+    invalidate_days(*{timezone.localdate(a.start_time) for a in appointments})
+
+    for appointment in appointments:
+        if appointment.status in Appointment.REMINDER_STATUSES:
+            schedule_reminder(appointment)
+
+    first = appointments[0]
+    if first.patient.email:
+        send_series_confirmation_email.delay(
+            patient_email=first.patient.email,
+            patient_name=first.patient.first_name,
+            date_times=[a.start_time.strftime("%Y-%m-%d %H:%M") for a in appointments],
+            room_name=first.room.name if first.room else "TBD"
+        )
@@ -1,7 +1,15 @@
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from apps.users.serializers import UserSerializer
 from apps.patients.models import Patient
+from apps.core.mixins import EagerLoadingMixin
+from .exceptions import AppointmentConflict
 from .models import Room, Service, Appointment
+from .overlaps import CONSTRAINTS, find_conflicts
+from .recurrence import FREQUENCIES, MAX_OCCURRENCES, create_series, occurrence_times
 
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -16,7 +24,19 @@ class ServiceSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'duration_minutes', 'price', 'is_active']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('patient', 'therapist', 'service', 'room')
+    only_fields = (
+        'id', 'patient', 'therapist', 'service', 'room',
+        'start_time', 'end_time', 'status', 'notes', 'created_at', 'updated_at',
+        'patient__first_name', 'patient__last_name',
+        'therapist__email', 'therapist__first_name', 'therapist__last_name',
+        'therapist__role', 'therapist__is_active',
+        'service__name', 'service__description', 'service__duration_minutes',
+        'service__price', 'service__is_active',
+        'room__name', 'room__description', 'room__is_active',
+    )
+
     therapist_detail = UserSerializer(source='therapist', read_only=True)
     service_detail = ServiceSerializer(source='service', read_only=True)
     room_detail = RoomSerializer(source='room', read_only=True)
@@ -50,4 +70,80 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if start and end and start >= end:
             raise serializers.ValidationError("End time must be after start time.")
 
-        return data
\ No newline at end of file
+        return data
+
+    def create(self, validated_data):
+        with self.rejecting_double_bookings(Appointment(**validated_data)):
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with self.rejecting_double_bookings(instance):
+            return super().update(instance, validated_data)
+
+    @contextmanager
+    def rejecting_double_bookings(self, *appointments):
+        """
+        Turns a double booking, reported by the exclusion constraints
+        (PostgreSQL) or by Appointment.clean() (other backends), into a
+        409 listing the clashing appointments.
+        """
+        try:
+            # Savepoint, so the conflicts can still be looked up after a constraint violation
+            with transaction.atomic():
+                yield
+        except IntegrityError as exc:
+            if not any(name in str(exc) for name in CONSTRAINTS):
+                raise
+            raise AppointmentConflict(find_conflicts(appointments))
+        except DjangoValidationError as exc:
+            codes = [e.code for errors in getattr(exc, 'error_dict', {}).values() for e in errors]
+            if not codes or any(code != 'overlap' for code in codes):
+                raise
+            raise AppointmentConflict(find_conflicts(appointments))
+
+class RecurringAppointmentSerializer(AppointmentSerializer):
+    """
+    Books a weekly or biweekly series: the fields of the first session
+    plus the rule, with either a session count or an end date.
+    """
+    frequency = serializers.ChoiceField(choices=list(FREQUENCIES), write_only=True)
+    count = serializers.IntegerField(min_value=1, max_value=MAX_OCCURRENCES, required=False, write_only=True)
+    until = serializers.DateField(required=False, write_only=True)
+
+    class Meta(AppointmentSerializer.Meta):
+        fields = AppointmentSerializer.Meta.fields + ['frequency', 'count', 'until']
+
+    def validate(self, data):
+        data = super().validate(data)
+
+        if ('count' in data) == ('until' in data):
+            raise serializers.ValidationError("Provide either count or until.")
+        if 'until' in data and data['until'] < data['start_time'].date():
+            raise serializers.ValidationError({'until': "Must not be before the first session."})
+        if 'until' in data:
+            # Same cut-off as occurrence_times(): sessions starting on or before `until`
+            days = (data['until'] - data['start_time'].date()).days
+            if days // FREQUENCIES[data['frequency']].days + 1 > MAX_OCCURRENCES:
+                raise serializers.ValidationError(
+                    {'until': f"The series would have more than {MAX_OCCURRENCES} sessions."}
+                )
+
+        return data
+
+    def create(self, validated_data):
+        times = occurrence_times(
+            validated_data.pop('start_time'),
+            validated_data.pop('end_time'),
+            validated_data.pop('frequency'),
+            count=validated_data.pop('count', None),
+            until=validated_data.pop('until', None),
+        )
+
+        # Every session is checked with the same single query
+        sessions = [Appointment(**validated_data, start_time=start, end_time=end) for start, end in times]
+        conflicts = find_conflicts(sessions)
+        if conflicts:
+            raise AppointmentConflict(conflicts)
+
+        with self.rejecting_double_bookings(*sessions):
+            return create_series(validated_data, times)
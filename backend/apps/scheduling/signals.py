@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from .models import Appointment
-from .tasks import send_appointment_confirmation_email
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from .availability import invalidate_all, invalidate_days
+from .models import Appointment, Room
+from .tasks import REMINDER_STATUSES, revoke_reminder, schedule_reminder, send_appointment_confirmation_email
+
+# Sent with `appointments` after a bulk_create, which skips post_save (see apps.scheduling.recurrence)
+appointments_bulk_created = Signal()
 
 @receiver(post_save, sender=Appointment)
 def trigger_appointment_confirmation(sender, instance, created, **kwargs):
@@ -16,4 +25,99 @@ def trigger_appointment_confirmation(sender, instance, created, **kwargs):
             date_time=instance.start_time.strftime("%Y-%m-%d %H:%M"),
             room_name=instance.room.name if instance.room else "TBD"
         )
-        print(f"--- Signal: Email task queued for {instance.patient.email} ---")
\ No newline at end of file
+        print(f"--- Signal: Email task queued for {instance.patient.email} ---")
+
+
+@receiver(post_init, sender=Appointment)
+def remember_saved_slot(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields aren't loaded
+    instance._saved_slot = (
+        instance.__dict__.get('start_time'), instance.__dict__.get('end_time'), instance.__dict__.get('status')
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def schedule_appointment_reminder(sender, instance, created, raw=False, **kwargs):
+    """
+    Queues the 24h reminder when an appointment is booked or rescheduled,
+    and revokes the previous one when it is moved or cancelled. Runs after
+    commit, so rolled back changes queue nothing.
+    """
+    if raw:
+        return
+
+    old_start, _, old_status = instance._saved_slot
+
+    moved = created or old_start != instance.start_time
+    active = instance.status in REMINDER_STATUSES
+    was_active = not created and old_status in REMINDER_STATUSES
+
+    if was_active and old_start and (moved or not active):
+        transaction.on_commit(partial(revoke_reminder, instance.pk, old_start))
+
+    if active and not instance.reminder_sent and (moved or not was_active):
+        transaction.on_commit(partial(schedule_reminder, instance))
+
+
+def slot_days(*bounds):
+    return {timezone.localdate(value) for value in bounds if value is not None}
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_availability(sender, instance, **kwargs):
+    """
+    Drops the cached free slots of the days the appointment was and is on,
+    once the change is committed: a request recomputing those days before
+    then would cache the old bookings again.
+    """
+    old_start, old_end, _ = instance._saved_slot
+    days = slot_days(old_start, old_end, instance.start_time, instance.end_time)
+    transaction.on_commit(partial(invalidate_days, *days))
+
+
+@receiver(post_delete, sender=Appointment)
+def invalidate_availability_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_days, *slot_days(instance.start_time, instance.end_time)))
+
+
+@receiver(post_init, sender=Room)
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_availability_state(sender, instance, **kwargs):
+    # What find_slots() selects therapists and rooms by; read from __dict__ so deferred fields aren't loaded
+    instance._saved_availability = (instance.__dict__.get('role'), instance.__dict__.get('is_active'))
+
+
+def offers_slots(sender, role, is_active):
+    return bool(is_active) and (sender is Room or role == 'PHYSIO')
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_availability_on_staff_change(sender, instance, created, raw=False, **kwargs):
+    """
+    Drops every cached day when a therapist or room starts or stops
+    offering slots. Other saves (e.g. a login updating last_login) keep
+    the cache.
+    """
+    if raw:
+        return
+
+    before = not created and offers_slots(sender, *instance._saved_availability)
+    now = offers_slots(sender, instance.__dict__.get('role'), instance.__dict__.get('is_active'))
+    if before != now:
+        transaction.on_commit(invalidate_all)
+
+    instance._saved_availability = (instance.__dict__.get('role'), instance.__dict__.get('is_active'))
+
+
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_availability_on_staff_delete(sender, instance, **kwargs):
+    if offers_slots(sender, instance.__dict__.get('role'), instance.__dict__.get('is_active')):
+        transaction.on_commit(invalidate_all)
+
+
+# Must stay the last post_save receiver: the ones above compare against the previous slot.
+@receiver(post_save, sender=Appointment)
+def update_saved_slot(sender, instance, **kwargs):
+    instance._saved_slot = (instance.start_time, instance.end_time, instance.status)
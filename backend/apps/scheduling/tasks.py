@@ -1,9 +1,20 @@
+import logging
+import time
+from itertools import islice
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 from .models import Appointment
 
+logger = logging.getLogger(__name__)
+
+REMINDER_LEAD_TIME = timedelta(days=1)
+REMINDER_STATUSES = Appointment.REMINDER_STATUSES
+
 
 @shared_task
 def send_appointment_confirmation_email(patient_email, patient_name, date_time, room_name):
@@ -39,48 +50,207 @@ def send_appointment_confirmation_email(patient_email, patient_name, date_time,
 
 
 @shared_task
-def send_appointment_reminders():
+def send_series_confirmation_email(patient_email, patient_name, date_times, room_name):
     """
-    Periodic task: Checks for appointments starting in the next 24 hours
-    that haven't received a reminder yet.
+    One confirmation listing every session of a recurring booking,
+    instead of one email per appointment.
+    """
+    sessions = "\n".join(f"    - {date_time}" for date_time in date_times)
+    message = f"""
+    Dear {patient_name},
+
+    Your {len(date_times)} appointments have been successfully booked.
+
+    When:
+{sessions}
+    Where: {room_name}
+
+    Please arrive 10 minutes early.
+
+    Regards,
+    PhysioFitness Clinic
+    """
+
+    send_mail(
+        subject=f"Appointment Confirmation - {len(date_times)} sessions from {date_times[0]}",
+        message=message,
+        from_email='noreply@physiofitness.com',
+        recipient_list=[patient_email],
+        fail_silently=False,
+    )
+
+    return "Email Sent"
+
+
+def build_reminder_message(appointment, connection=None):
+    subject = "Reminder: Your appointment is tomorrow!"
+    message = f"""
+    Hello {appointment.patient.first_name},
+
+    This is a friendly reminder for your appointment tomorrow.
+
+    When: {appointment.start_time.strftime("%Y-%m-%d %H:%M")}
+    Where: {appointment.room.name if appointment.room else "Clinic"}
+
+    See you soon!
+    PhysioFitness Clinic
+    """
+
+    return EmailMessage(
+        subject=subject,
+        body=message,
+        from_email='noreply@physiofitness.com',
+        to=[appointment.patient.email],
+        connection=connection,
+    )
+
+
+def pending_reminders(now=None):
+    """
+    Appointments the sweep still has to remind, with the columns the
+    message needs. Also used by the explain_queries command.
+    """
+    now = now or timezone.now()
+    time_window = now + REMINDER_LEAD_TIME - timedelta(minutes=getattr(settings, 'REMINDER_SWEEP_GRACE_MINUTES', 15))
+
+    return Appointment.objects.awaiting_reminder(now, time_window).filter(
+        # Skips patients without an email address (NULL or blank)
+        patient__email__gt=''
+    ).select_related('patient', 'room').only(
+        'id', 'start_time', 'patient__first_name', 'patient__email', 'room__name'
+    ).order_by('start_time', 'id')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def reminder_task_id(appointment_id, start_time):
+    # Derived from the start time, so the task of a previous slot can be revoked without storing its id.
+    return f"appointment-reminder-{appointment_id}-{start_time:%Y%m%dT%H%M%S}"
+
+
+def queue_horizon():
+    return timedelta(minutes=getattr(settings, 'REMINDER_QUEUE_HORIZON_MINUTES', 60))
+
+
+def schedule_reminder(appointment):
+    """
+    Queues the reminder of an appointment for 24 hours before it starts,
+    or right away if it is already closer than that. Reminders due after
+    the queue horizon are left to the hourly sweep (see queue_due_reminders),
+    so the broker doesn't hold an ETA task for every booking months ahead.
     """
     now = timezone.now()
-    time_window = now + timedelta(days=1)
+    if appointment.start_time <= now or appointment.start_time - REMINDER_LEAD_TIME > now + queue_horizon():
+        return None
 
-    upcoming_appointments = Appointment.objects.filter(
-        start_time__lte=time_window,
-        start_time__gt=now,
-        reminder_sent=False,
-        status__in=['SCHEDULED', 'CONFIRMED']
+    return send_appointment_reminder.apply_async(
+        args=[str(appointment.pk), appointment.start_time.isoformat()],
+        eta=max(appointment.start_time - REMINDER_LEAD_TIME, now),
+        task_id=reminder_task_id(appointment.pk, appointment.start_time),
     )
 
+
+def revoke_reminder(appointment_id, start_time):
+    """
+    Best effort: a reminder that still runs finds its appointment moved or
+    cancelled and does nothing.
+    """
+    try:
+        send_appointment_reminder.app.control.revoke(reminder_task_id(appointment_id, start_time))
+    except Exception:
+        logger.warning("Could not revoke the reminder of appointment %s.", appointment_id, exc_info=True)
+
+
+@shared_task
+def send_appointment_reminder(appointment_id, start_time):
+    """
+    Sends the reminder of one appointment, queued by schedule_reminder.
+    Skipped if the appointment was rescheduled (a newer task exists for the
+    new slot), cancelled, or already reminded by the sweep.
+    """
+    appointment = Appointment.objects.select_related('patient', 'room').filter(
+        pk=appointment_id,
+        start_time=parse_datetime(start_time),
+        reminder_sent=False,
+        status__in=REMINDER_STATUSES,
+    ).first()
+
+    if appointment is None or not appointment.patient.email:
+        return "Reminder superseded."
+
+    # Claim the reminder first, so the sweep can't send it a second time.
+    if not Appointment.objects.filter(pk=appointment.pk, reminder_sent=False).update(reminder_sent=True):
+        return "Reminder already sent."
+
+    try:
+        build_reminder_message(appointment).send()
+    except Exception:
+        Appointment.objects.filter(pk=appointment.pk).update(reminder_sent=False)
+        raise
+
+    return "Reminder sent."
+
+
+def queue_due_reminders(now=None):
+    """
+    Queues the reminders coming due before the next sweep, for the
+    appointments booked too far ahead for schedule_reminder to queue them.
+    """
+    now = now or timezone.now()
+    upcoming = Appointment.objects.awaiting_reminder(
+        now + REMINDER_LEAD_TIME, now + REMINDER_LEAD_TIME + queue_horizon()
+    ).filter(patient__email__gt='').only('id', 'start_time')
+
     count = 0
-    for appointment in upcoming_appointments:
-        if appointment.patient.email:
-            # 1. Send the email
-            subject = "Reminder: Your appointment is tomorrow!"
-            message = f"""
-            Hello {appointment.patient.first_name},
-
-            This is a friendly reminder for your appointment tomorrow.
-
-            When: {appointment.start_time.strftime("%Y-%m-%d %H:%M")}
-            Where: {appointment.room.name if appointment.room else "Clinic"}
-
-            See you soon!
-            PhysioFitness Clinic
-            """
-
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email='noreply@physiofitness.com',
-                recipient_list=[appointment.patient.email],
-                fail_silently=False,
-            )
+    for appointment in upcoming.iterator():
+        schedule_reminder(appointment)
+        count += 1
+    return count
+
+
+@shared_task
+def send_appointment_reminders():
+    """
+    Periodic task: Checks for appointments starting in the next 24 hours
+    that haven't received a reminder yet.
+
+    Reminders are normally sent by per-appointment tasks, queued from the
+    post_save signal or, for bookings further ahead, by this sweep once they
+    come within REMINDER_QUEUE_HORIZON_MINUTES (see queue_due_reminders).
+    The sweep is also the safety net for tasks that were lost (e.g. a broker
+    restart). Appointments whose reminder is due less than
+    REMINDER_SWEEP_GRACE_MINUTES ago are left to their own task.
+
+    Appointments are processed in chunks: each chunk is loaded with its
+    patient and room in one query, its emails go out over a single mail
+    connection, and reminder_sent is set with one UPDATE (no save(), so
+    no full_clean() or audit entry per row).
+    """
+    chunk_size = getattr(settings, 'REMINDER_CHUNK_SIZE', 500)
+    upcoming_appointments = pending_reminders()
 
-            appointment.reminder_sent = True
-            appointment.save()
-            count += 1
+    count = 0
+    started = time.monotonic()
+
+    with get_connection() as connection:
+        for number, chunk in enumerate(_chunks(upcoming_appointments.iterator(chunk_size=chunk_size), chunk_size), 1):
+            chunk_started = time.monotonic()
+
+            sent = connection.send_messages([build_reminder_message(a, connection) for a in chunk]) or 0
+            # Only mark the chunk once its messages are out, so a failed batch is retried next run.
+            Appointment.objects.filter(pk__in=[a.pk for a in chunk]).update(reminder_sent=True)
+            count += sent
+
+            elapsed = time.monotonic() - chunk_started
+            logger.info(
+                "Reminder chunk %s: %s appointments, %s emails sent in %.2fs (%.1f/s).",
+                number, len(chunk), sent, elapsed, len(chunk) / elapsed if elapsed else 0
+            )
 
-    return f"Sent {count} reminders."
\ No newline at end of file
+    logger.info("Sent %s reminders in %.2fs.", count, time.monotonic() - started)
+    logger.info("Queued %s reminders coming due.", queue_due_reminders())
+    return f"Sent {count} reminders."
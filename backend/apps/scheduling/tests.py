@@ -5,7 +5,23 @@ from django.contrib.auth import get_user_model
 from apps.patients.models import Patient
 from apps.scheduling.models import Appointment, Room, Service
 from django.utils import timezone
-from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from datetime import datetime, time, timedelta
+import csv
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from apps.core.audit import reconstruct
+from apps.core.models import AuditLog
+from apps.scheduling.overlaps import find_conflicts
+from apps.scheduling.tasks import (
+    reminder_task_id, send_appointment_confirmation_email, send_appointment_reminder, send_appointment_reminders,
+    send_series_confirmation_email,
+)
 
 User = get_user_model()
 
@@ -71,4 +87,657 @@ class AppointmentPermissionTests(APITestCase):
     def test_unauthenticated_user_is_blocked(self):
         self.client.logout()
         response = self.client.get(self.list_url)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class AppointmentKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.physios = [
+            User.objects.create_user(email=f'physio{n}@test.com', password='password123', role='PHYSIO')
+            for n in range(2)
+        ]
+        self.patient = Patient.objects.create(
+            first_name="Jane", last_name="Roe", gender="F", tax_id="PAGE123456"
+        )
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+
+        base = timezone.now().replace(microsecond=0)
+        self.base = base
+        # Two appointments share each start_time so the id tie-breaker is exercised.
+        for i in range(5):
+            for physio in self.physios:
+                Appointment.objects.create(
+                    patient=self.patient, therapist=physio, service=self.service,
+                    start_time=base + timedelta(days=i),
+                    end_time=base + timedelta(days=i, minutes=30),
+                )
+
+        self.client.force_authenticate(user=self.admin_user)
+        self.list_url = '/api/scheduling/appointments/'
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        seen = []
+        url = f"{self.list_url}?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend((a['start_time'], a['id']) for a in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_date_window_filters(self):
+        response = self.client.get(self.list_url, {
+            'start_time__gte': (self.base + timedelta(days=1)).isoformat(),
+            'start_time__lt': (self.base + timedelta(days=3)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AppointmentQueryCountTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.client.force_authenticate(user=self.admin_user)
+        self.list_url = '/api/scheduling/appointments/'
+
+    def test_list_query_count(self):
+        # Every row gets its own patient, therapist and room, so lazy loading would show up.
+        for i in range(5):
+            physio = User.objects.create_user(
+                email=f'physio{i}@test.com', password='password123', role='PHYSIO'
+            )
+            patient = Patient.objects.create(
+                first_name=f"Patient{i}", last_name="Test", gender="M", tax_id=f"QC{i:08d}"
+            )
+            room = Room.objects.create(name=f"Room {i}")
+            start = timezone.now() + timedelta(days=i)
+            Appointment.objects.create(
+                patient=patient, therapist=physio, service=self.service, room=room,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+        # Appointments joined with their patient, therapist, service and room
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+
+class AppointmentExportTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        other = User.objects.create_user(email='other@test.com', password='password123', role='PHYSIO')
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.patient = Patient.objects.create(first_name="Mario", last_name="Rossi", gender="M", tax_id="EXPORT001")
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        for i, therapist in enumerate([self.physio, self.physio, other]):
+            start = self.start + timedelta(hours=i)
+            Appointment.objects.create(
+                patient=self.patient, therapist=therapist, service=self.service,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+    def export(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/scheduling/appointments/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_export_follows_visibility_and_ordering(self):
+        rows = self.export(self.admin_user)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['start_time'], self.start.isoformat())
+        self.assertEqual(rows[0]['price'], "50.00")
+        self.assertEqual(rows[0]['room'], "")
+
+        rows = self.export(self.physio)
+        self.assertEqual({row['therapist_id'] for row in rows}, {str(self.physio.pk)})
+        self.assertEqual(len(rows), 2)
+
+
+@override_settings(REMINDER_CHUNK_SIZE=2)
+class AppointmentReminderTaskTests(TestCase):
+    def setUp(self):
+        self.physio = User.objects.create_user(
+            email='physio@test.com', password='password123', role='PHYSIO'
+        )
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.room = Room.objects.create(name="Room A")
+        self.created = 0
+
+        # Booking for a patient with an email also queues the confirmation
+        mock.patch.object(send_appointment_confirmation_email, 'delay').start()
+        self.addCleanup(mock.patch.stopall)
+
+        self.due = [self.create_appointment(hours=i + 1) for i in range(5)]
+        self.no_email = self.create_appointment(hours=5.5, email=None)
+        self.later = self.create_appointment(hours=48)
+        self.cancelled = self.create_appointment(hours=6.5, status='CANCELLED')
+
+        mail.outbox = []
+
+    def create_appointment(self, hours, email='', status='SCHEDULED'):
+        i = self.created
+        self.created += 1
+        patient = Patient.objects.create(
+            first_name=f"Patient{i}", last_name="Test", gender="M", tax_id=f"RM{i:08d}",
+            email=f"patient{i}@test.com" if email == '' else email
+        )
+        start = timezone.now() + timedelta(hours=hours)
+        return Appointment.objects.create(
+            patient=patient, therapist=self.physio, service=self.service, room=self.room,
+            start_time=start, end_time=start + timedelta(minutes=30), status=status
+        )
+
+    def test_reminders_are_sent_in_batches(self):
+        audit_entries = AuditLog.objects.count()
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = send_appointment_reminders()
+
+        self.assertEqual(result, "Sent 5 reminders.")
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(a.patient.email for a in self.due))
+        self.assertIn("Room A", mail.outbox[0].body)
+
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(AuditLog.objects.count(), audit_entries)
+
+        flagged = set(Appointment.objects.filter(reminder_sent=True).values_list('pk', flat=True))
+        self.assertEqual(flagged, {a.pk for a in self.due})
+
+    def test_reminders_are_not_sent_twice(self):
+        send_appointment_reminders()
+        mail.outbox = []
+
+        self.assertEqual(send_appointment_reminders(), "Sent 0 reminders.")
+        self.assertEqual(mail.outbox, [])
+
+
+class AppointmentReminderSchedulingTests(TestCase):
+    def setUp(self):
+        self.physio = User.objects.create_user(
+            email='physio@test.com', password='password123', role='PHYSIO'
+        )
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.patient = Patient.objects.create(
+            first_name="Mario", last_name="Rossi", gender="M", tax_id="RSSMRA80A01H501U", email="mario@test.com"
+        )
+        # Reminder due within the queue horizon
+        self.start = (timezone.now() + timedelta(days=1, minutes=30)).replace(microsecond=0)
+
+        self.apply_async = mock.patch.object(send_appointment_reminder, 'apply_async').start()
+        self.revoke = mock.patch.object(send_appointment_reminder.app.control, 'revoke').start()
+        # Booking for a patient with an email also queues the confirmation
+        mock.patch.object(send_appointment_confirmation_email, 'delay').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def book(self, start=None):
+        start = start or self.start
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                patient=self.patient, therapist=self.physio, service=self.service,
+                start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+    def test_reminder_is_queued_a_day_before(self):
+        appointment = self.book()
+
+        self.apply_async.assert_called_once()
+        kwargs = self.apply_async.call_args.kwargs
+        self.assertEqual(kwargs['eta'], self.start - timedelta(days=1))
+        self.assertEqual(kwargs['task_id'], reminder_task_id(appointment.pk, self.start))
+
+    def test_reschedule_replaces_the_reminder(self):
+        appointment = self.book()
+        self.apply_async.reset_mock()
+
+        new_start = self.start + timedelta(minutes=15)
+        appointment.start_time = new_start
+        appointment.end_time = new_start + timedelta(minutes=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+
+        self.revoke.assert_called_once_with(reminder_task_id(appointment.pk, self.start))
+        self.assertEqual(self.apply_async.call_args.kwargs['eta'], new_start - timedelta(days=1))
+
+    def test_cancellation_revokes_the_reminder(self):
+        appointment = self.book()
+        self.apply_async.reset_mock()
+
+        appointment.status = Appointment.Status.CANCELLED
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+
+        self.revoke.assert_called_once_with(reminder_task_id(appointment.pk, self.start))
+        self.apply_async.assert_not_called()
+
+    def test_later_reminders_are_queued_by_the_sweep(self):
+        later = self.start + timedelta(days=30)
+        appointment = self.book(later)
+        self.apply_async.assert_not_called()
+
+        send_appointment_reminders()
+        self.apply_async.assert_not_called()
+
+        with mock.patch.object(timezone, 'now', return_value=later - timedelta(days=1, minutes=30)):
+            send_appointment_reminders()
+
+        self.apply_async.assert_called_once()
+        self.assertEqual(self.apply_async.call_args.kwargs['eta'], later - timedelta(days=1))
+        self.assertEqual(self.apply_async.call_args.kwargs['task_id'], reminder_task_id(appointment.pk, later))
+
+    def test_other_updates_queue_nothing(self):
+        appointment = self.book()
+        self.apply_async.reset_mock()
+
+        appointment.notes = "Bring the MRI"
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+
+        self.apply_async.assert_not_called()
+        self.revoke.assert_not_called()
+
+    def test_superseded_reminder_does_nothing(self):
+        appointment = self.book()
+        mail.outbox = []
+
+        result = send_appointment_reminder(str(appointment.pk), (self.start - timedelta(hours=2)).isoformat())
+        self.assertEqual(result, "Reminder superseded.")
+
+        self.assertEqual(send_appointment_reminder(str(appointment.pk), self.start.isoformat()), "Reminder sent.")
+        self.assertEqual(send_appointment_reminder(str(appointment.pk), self.start.isoformat()), "Reminder superseded.")
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AppointmentQueryPlanTests(TestCase):
+    def test_on_day_matches_date_lookup(self):
+        physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        patient = Patient.objects.create(first_name="Mario", last_name="Rossi", gender="M", tax_id="RSSMRA80A01H501U")
+        midnight = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        for start in (midnight - timedelta(minutes=30), midnight, midnight + timedelta(hours=23, minutes=30)):
+            Appointment.objects.create(
+                patient=patient, therapist=physio, service=service,
+                start_time=start, end_time=start + timedelta(minutes=15)
+            )
+
+        today = midnight.date()
+        self.assertEqual(Appointment.objects.on_day(today).count(), 2)
+        self.assertEqual(Appointment.objects.on_day(today).count(), Appointment.objects.filter(start_time__date=today).count())
+
+    def test_explain_queries_prints_every_plan(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+
+        output = out.getvalue()
+        for name in ('Reminder sweep', 'Dashboard (today)', 'Calendar (this week)'):
+            self.assertIn(name, output)
+        self.assertIn('scheduling_appointment', output)
+
+
+class AppointmentOverlapTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            email='admin@test.com', password='password123', role='ADMIN'
+        )
+        self.physios = [
+            User.objects.create_user(email=f'physio{n}@test.com', password='password123', role='PHYSIO')
+            for n in range(2)
+        ]
+        self.rooms = [Room.objects.create(name=f"Room {n}") for n in range(2)]
+        self.patient = Patient.objects.create(
+            first_name="Jane", last_name="Roe", gender="F", tax_id="OVERLAP123"
+        )
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+        self.start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+
+        self.booked = Appointment.objects.create(
+            patient=self.patient, therapist=self.physios[0], service=self.service, room=self.rooms[0],
+            start_time=self.start, end_time=self.start + timedelta(minutes=30)
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.list_url = '/api/scheduling/appointments/'
+
+    def payload(self, minutes=15, therapist=0, room=0):
+        start = self.start + timedelta(minutes=minutes)
+        return {
+            'patient': str(self.patient.id),
+            'therapist': str(self.physios[therapist].id),
+            'service': str(self.service.id),
+            'room': str(self.rooms[room].id),
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(minutes=30)).isoformat(),
+        }
+
+    def test_double_booking_returns_409(self):
+        response = self.client.post(self.list_url, self.payload(therapist=1), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['code'], 'appointment_conflict')
+        self.assertEqual(response.data['conflicts'], [{
+            'resource': 'room',
+            'appointment': str(self.booked.id),
+            'start_time': self.booked.start_time.isoformat(),
+            'end_time': self.booked.end_time.isoformat(),
+        }])
+
+    def test_therapist_and_room_clash_are_both_reported(self):
+        response = self.client.post(self.list_url, self.payload(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(sorted(c['resource'] for c in response.data['conflicts']), ['room', 'therapist'])
+
+    def test_back_to_back_and_other_resources_are_allowed(self):
+        response = self.client.post(self.list_url, self.payload(minutes=30), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(self.list_url, self.payload(therapist=1, room=1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_rescheduling_onto_a_booking_returns_409(self):
+        other = self.client.post(self.list_url, self.payload(minutes=60), format='json').data
+        response = self.client.patch(f"{self.list_url}{other['id']}/", {
+            'start_time': self.start.isoformat(),
+            'end_time': (self.start + timedelta(minutes=30)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        # Moving an appointment within its own slot is not a clash with itself
+        response = self.client.patch(f"{self.list_url}{self.booked.id}/", {
+            'end_time': (self.start + timedelta(minutes=45)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cancelled_appointments_free_the_slot(self):
+        self.booked.status = Appointment.Status.CANCELLED
+        self.booked.save()
+
+        response = self.client.post(self.list_url, self.payload(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_batch_check_uses_one_query(self):
+        candidates = [
+            Appointment(
+                patient=self.patient, therapist=self.physios[1], service=self.service, room=self.rooms[1],
+                start_time=self.start + timedelta(days=d), end_time=self.start + timedelta(days=d, minutes=30)
+            )
+            for d in range(10)
+        ]
+        candidates.append(Appointment(
+            patient=self.patient, therapist=self.physios[1], service=self.service, room=self.rooms[0],
+            start_time=self.start + timedelta(minutes=10), end_time=self.start + timedelta(minutes=20)
+        ))
+
+        with self.assertNumQueries(1):
+            conflicts = find_conflicts(candidates)
+
+        self.assertEqual(len(conflicts), 2)
+        self.assertEqual({c['resource'] for c in conflicts}, {'room', 'therapist'})
+
+
+class AvailabilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='reception@test.com', password='password123', role='RECEPTIONIST')
+        self.physios = [
+            User.objects.create_user(email=f'physio{n}@test.com', password='password123', role='PHYSIO')
+            for n in range(2)
+        ]
+        self.room = Room.objects.create(name="Room A")
+        self.patient = Patient.objects.create(first_name="Jane", last_name="Roe", gender="F", tax_id="AVAIL12345")
+        self.service = Service.objects.create(name="Physio", duration_minutes=30, price=50)
+
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.book(self.physios[0], hour=10)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/scheduling/availability/'
+
+        self.apply_async = mock.patch.object(send_appointment_reminder, 'apply_async').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def book(self, physio, hour, minute=0, room=True):
+        start = timezone.make_aware(datetime.combine(self.monday, time(hour, minute)))
+        return Appointment.objects.create(
+            patient=self.patient, therapist=physio, service=self.service, room=self.room if room else None,
+            start_time=start, end_time=start + timedelta(minutes=30)
+        )
+
+    def slots(self, **params):
+        params = {'service': str(self.service.id), 'start': self.monday.isoformat(), 'end': self.monday.isoformat(), **params}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {s['start_time'].strftime('%H:%M'): s for s in response.data['slots']}
+
+    def test_busy_room_blocks_the_slot(self):
+        slots = self.slots()
+
+        self.assertEqual(len(slots), 32)
+        self.assertIn('09:30', slots)
+        self.assertIn('10:30', slots)
+        for taken in ('09:45', '10:00', '10:15'):
+            self.assertNotIn(taken, slots)
+        self.assertEqual(sorted(slots['09:00']['therapists']), sorted(str(p.id) for p in self.physios))
+        self.assertEqual(slots['17:30']['rooms'], [str(self.room.id)])
+
+    def test_therapist_filter(self):
+        self.book(self.physios[1], hour=15, room=False)
+
+        slots = self.slots(therapist=str(self.physios[1].id))
+        self.assertNotIn('15:00', slots)
+        self.assertEqual(slots['16:00']['therapists'], [str(self.physios[1].id)])
+
+    def test_closed_days_have_no_slots(self):
+        sunday = self.monday - timedelta(days=1)
+        self.assertEqual(self.slots(start=sunday.isoformat(), end=sunday.isoformat()), {})
+
+    def test_days_are_cached_until_an_appointment_changes(self):
+        self.slots()
+
+        with CaptureQueriesContext(connection) as ctx:
+            slots = self.slots()
+        self.assertFalse([q for q in ctx.captured_queries if 'scheduling_appointment' in q['sql']])
+        self.assertIn('14:00', slots)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(self.physios[1], hour=14)
+            # Not dropped before the booking is committed
+            self.assertIn('14:00', self.slots())
+        self.assertNotIn('14:00', self.slots())
+
+    def test_staff_and_room_changes_refresh_cached_days(self):
+        self.assertEqual(len(self.slots()['09:00']['therapists']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_physio = User.objects.create_user(email='physio9@test.com', password='password123', role='PHYSIO')
+        self.assertIn(str(new_physio.id), self.slots()['09:00']['therapists'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_physio.is_active = False
+            new_physio.save()
+        self.assertNotIn(str(new_physio.id), self.slots()['09:00']['therapists'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_room = Room.objects.create(name="Room B")
+        # Room A is taken at 10:00, Room B is free
+        self.assertEqual(self.slots()['10:00']['rooms'], [str(other_room.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_room.delete()
+        self.assertNotIn('10:00', self.slots())
+
+    def test_unrelated_user_saves_keep_the_cache(self):
+        self.slots()
+        self.user.last_login = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            self.physios[0].first_name = "Renamed"
+            self.physios[0].save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.slots()
+        self.assertFalse([q for q in ctx.captured_queries if 'scheduling_appointment' in q['sql']])
+
+    @override_settings(CLINIC_CLOSING_TIME='12:00')
+    def test_changed_opening_hours_are_not_served_from_cache(self):
+        with override_settings(CLINIC_CLOSING_TIME='18:00'):
+            self.assertIn('14:00', self.slots())
+        self.assertNotIn('14:00', self.slots())
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'service': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'service': str(self.service.id), 'start': '2026-02-30'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecurringAppointmentTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='reception@test.com', password='password123', role='RECEPTIONIST')
+        self.physio = User.objects.create_user(email='physio@test.com', password='password123', role='PHYSIO')
+        self.room = Room.objects.create(name="Gym")
+        self.patient = Patient.objects.create(
+            first_name="Jane", last_name="Roe", gender="F", tax_id="SERIES1234", email="jane@test.com"
+        )
+        self.service = Service.objects.create(name="Rehab", duration_minutes=45, price=60)
+        self.start = (timezone.now() + timedelta(days=2)).replace(microsecond=0)
+
+        self.client.force_authenticate(user=self.user)
+        self.url = '/api/scheduling/appointments/recurring/'
+
+        self.apply_async = mock.patch.object(send_appointment_reminder, 'apply_async').start()
+        self.send_confirmation = mock.patch.object(send_series_confirmation_email, 'delay').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def payload(self, **rule):
+        return {
+            'patient': str(self.patient.id),
+            'therapist': str(self.physio.id),
+            'service': str(self.service.id),
+            'room': str(self.room.id),
+            'start_time': self.start.isoformat(),
+            'end_time': (self.start + timedelta(minutes=45)).isoformat(),
+            'frequency': 'WEEKLY',
+            **rule,
+        }
+
+    def test_series_is_created_in_bulk(self):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.payload(count=10), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[9]['start_time'], (self.start + timedelta(weeks=9)).isoformat().replace('+00:00', 'Z'))
+
+        appointment_queries = [q['sql'] for q in ctx.captured_queries if 'scheduling_appointment' in q['sql']]
+        self.assertEqual(len([q for q in appointment_queries if q.startswith('INSERT')]), 1)
+        self.assertEqual(len([q for q in appointment_queries if q.startswith('SELECT')]), 1)
+
+        self.assertEqual(Appointment.objects.count(), 10)
+        entries = AuditLog.objects.filter(action="CREATE_SERIES")
+        self.assertEqual(entries.count(), 1)
+        self.assertEqual(len(entries.get().changes['occurrences']), 10)
+        self.assertFalse(AuditLog.objects.filter(action="CREATE").exists())
+
+        for occurrence in (response.data[0], response.data[6]):
+            state = reconstruct(Appointment, occurrence['id'], timezone.now())
+            self.assertEqual(state['therapist'], str(self.physio.id))
+            self.assertEqual(state['start_time'], occurrence['start_time'])
+
+        self.send_confirmation.assert_called_once_with(
+            patient_email="jane@test.com",
+            patient_name="Jane",
+            date_times=[(self.start + timedelta(weeks=i)).strftime("%Y-%m-%d %H:%M") for i in range(10)],
+            room_name="Gym",
+        )
+        # All sessions are more than a day ahead: their reminders are left to the sweep
+        self.apply_async.assert_not_called()
+
+    def test_later_session_has_audit_history(self):
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='admin@test.com', password='password123', role='ADMIN'
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, self.payload(count=3), format='json')
+        third = Appointment.objects.get(pk=response.data[2]['id'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            third.status = Appointment.Status.CONFIRMED
+            third.save()
+
+        state = reconstruct(Appointment, third.pk, timezone.now())
+        self.assertEqual(state['status'], 'CONFIRMED')
+        self.assertEqual(state['start_time'], response.data[2]['start_time'])
+        self.assertEqual(state['patient'], str(self.patient.id))
+
+        response = self.client.get('/api/audit/history/', {'model': 'scheduling.appointment', 'object_id': str(third.pk)})
+        self.assertEqual([entry['action'] for entry in response.data['results']], ['UPDATE', 'CREATE_SERIES'])
+
+    def test_until_beyond_the_session_limit_is_rejected(self):
+        until = (self.start + timedelta(weeks=52)).date()
+        response = self.client.post(self.url, self.payload(until=until.isoformat()), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('until', response.data)
+        self.assertEqual(Appointment.objects.count(), 0)
+
+        until = (self.start + timedelta(weeks=51)).date()
+        response = self.client.post(self.url, self.payload(until=until.isoformat()), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 52)
+
+    def test_biweekly_until(self):
+        until = (self.start + timedelta(weeks=6)).date()
+        response = self.client.post(self.url, self.payload(frequency='BIWEEKLY', until=until.isoformat()), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 4)
+
+    def test_conflicting_session_rejects_the_whole_series(self):
+        clash = self.start + timedelta(weeks=3)
+        other = Patient.objects.create(first_name="John", last_name="Doe", gender="M", tax_id="SERIES5678")
+        Appointment.objects.create(
+            patient=other, therapist=self.physio, service=self.service,
+            start_time=clash, end_time=clash + timedelta(minutes=30)
+        )
+
+        response = self.client.post(self.url, self.payload(count=5), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'][0]['resource'], 'therapist')
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_rule_needs_count_or_until(self):
+        response = self.client.post(self.url, self.payload(), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, self.payload(count=3, until='2099-01-01'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RoomViewSet, ServiceViewSet, AppointmentViewSet
+from .views import RoomViewSet, ServiceViewSet, AppointmentViewSet, AvailabilityView
 
 router = DefaultRouter()
 router.register(r'rooms', RoomViewSet)
@@ -8,5 +8,6 @@ router.register(r'services', ServiceViewSet)
 router.register(r'appointments', AppointmentViewSet, basename='appointment')
 
 urlpatterns = [
+    path('availability/', AvailabilityView.as_view(), name='availability'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
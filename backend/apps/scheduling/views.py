@@ -1,8 +1,24 @@
-from rest_framework import viewsets, permissions, filters
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
+from apps.analytics.ai import NoShowPredictor
+from apps.core.exports import ExportMixin
+from apps.core.mixins import OptimizedQuerySetMixin, TokenClaimsReadMixin
 from .models import Room, Service, Appointment
-from .serializers import RoomSerializer, ServiceSerializer, AppointmentSerializer
+from .serializers import RoomSerializer, ServiceSerializer, AppointmentSerializer, RecurringAppointmentSerializer
+from .pagination import AppointmentKeysetPagination
+from .availability import find_slots
 
 
 class RoomViewSet(viewsets.ModelViewSet):
@@ -17,23 +33,130 @@ class ServiceViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ExportMixin, TokenClaimsReadMixin, OptimizedQuerySetMixin, viewsets.ModelViewSet):
+    """
+    GET /api/scheduling/appointments/export/?file_format=csv|parquet streams
+    the appointments the user can see, with the list filters applied.
+    """
+    queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['status', 'start_time', 'patient', 'therapist']
+    filterset_fields = {
+        'status': ['exact'],
+        'start_time': ['exact', 'gte', 'lt'],
+        'patient': ['exact'],
+        'therapist': ['exact'],
+    }
     ordering_fields = ['start_time']
     ordering = ['start_time']
+    pagination_class = AppointmentKeysetPagination
+    export_filename = 'appointments'
+    export_columns = [
+        ('id', 'id', 'string'),
+        ('patient_id', 'patient_id', 'string'),
+        ('patient_first_name', 'patient__first_name', 'string'),
+        ('patient_last_name', 'patient__last_name', 'string'),
+        ('therapist_id', 'therapist_id', 'string'),
+        ('service', 'service__name', 'string'),
+        ('price', 'service__price', 'money'),
+        ('room', 'room__name', 'string'),
+        ('start_time', 'start_time', 'datetime'),
+        ('end_time', 'end_time', 'datetime'),
+        ('status', 'status', 'string'),
+    ]
 
     def get_queryset(self):
         user = self.request.user
+        queryset = super().get_queryset()
 
         if user.is_superuser or user.is_staff or user.role in ['ADMIN', 'RECEPTION']:
-            return Appointment.objects.all()
+            return queryset
 
         if user.role == 'PHYSIO':
-            return Appointment.objects.filter(therapist=user)
-        if hasattr(user, 'patient_profile'):
-            return Appointment.objects.filter(patient__user=user)
+            return queryset.filter(therapist_id=user.pk)
+
+        # Empty for users without a patient profile
+        return queryset.filter(patient__user_id=user.pk)
+
+    def list(self, request, *args, **kwargs):
+        """
+        With ?include_risk=true (staff only) every appointment also gets its
+        no-show risk_score and risk_label, scored for the whole page at once.
+        Combine with start_time__gte / start_time__lt to score a day's schedule.
+        """
+        response = super().list(request, *args, **kwargs)
+
+        if request.query_params.get('include_risk') == 'true' and request.user.role != 'PATIENT':
+            rows = response.data['results'] if isinstance(response.data, dict) else response.data
+            to_pk = Appointment._meta.pk.to_python
+            risks = NoShowPredictor().predict_appointments([to_pk(row['id']) for row in rows])
+            for row in rows:
+                risk = risks.get(to_pk(row['id']), {})
+                row['risk_score'] = risk.get('risk_score')
+                row['risk_label'] = risk.get('risk_label')
+
+        return response
+
+    @action(detail=False, methods=['post'])
+    def recurring(self, request):
+        """
+        Books a recurring treatment plan in one transaction.
+        POST: /api/scheduling/appointments/recurring/
+              {...first session fields, "frequency": "WEEKLY" | "BIWEEKLY", "count": 10 | "until": "YYYY-MM-DD"}
+        """
+        serializer = RecurringAppointmentSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        appointments = serializer.save()
+
+        return Response(AppointmentSerializer(appointments, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class AvailabilityView(APIView):
+    """
+    Free slots for a service.
+    GET: /api/scheduling/availability/?service=<id>&start=YYYY-MM-DD&end=YYYY-MM-DD[&therapist=<id>][&room=<id>]
+    `end` is inclusive and defaults to two weeks from `start` (default today).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        service_id = request.query_params.get('service')
+        if not service_id:
+            raise ValidationError({'service': "This parameter is required."})
+        try:
+            service = get_object_or_404(Service, pk=service_id)
+        except DjangoValidationError:
+            raise ValidationError({'service': "Not a valid id."})
+
+        start = self.parse_day(request, 'start', timezone.localdate())
+        end = self.parse_day(request, 'end', start + timedelta(days=13))
+        if end < start:
+            raise ValidationError({'end': "Must not be before start."})
+        if (end - start).days >= settings.AVAILABILITY_MAX_DAYS:
+            raise ValidationError({'end': f"The range is limited to {settings.AVAILABILITY_MAX_DAYS} days."})
+
+        slots = find_slots(
+            service, start, end,
+            therapist=request.query_params.get('therapist'),
+            room=request.query_params.get('room'),
+        )
+
+        return Response({
+            'service': str(service.pk),
+            'duration_minutes': service.duration_minutes,
+            'slots': slots,
+        })
 
-        return Appointment.objects.none()
+    @staticmethod
+    def parse_day(request, name, default):
+        value = request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: "Use the YYYY-MM-DD format."})
+        return day
@@ -0,0 +1,128 @@
+import copy
+from threading import Lock
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+# Users resolved from tokens, kept for a few seconds so back-to-back API calls
+# don't hit the DB. Entries are dropped when the user is saved or deleted
+# (see apps.users.signals); the TTL bounds staleness across worker processes.
+_user_cache = TTLCache(
+    maxsize=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 30),
+)
+_user_cache_lock = Lock()
+
+
+def invalidate_cached_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(str(user_id), None)
+
+
+def clear_user_cache():
+    with _user_cache_lock:
+        _user_cache.clear()
+
+
+class SharedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that runs at most once per request.
+
+    The outcome (user + token, None, or the authentication error) is stored
+    on the underlying HttpRequest, so AuditLogMiddleware and DRF share one
+    token verification and one user lookup.
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+
+        if not hasattr(http_request, '_jwt_auth_result'):
+            try:
+                http_request._jwt_auth_result = super().authenticate(request)
+            except AuthenticationFailed as exc:
+                http_request._jwt_auth_result = exc
+
+        result = http_request._jwt_auth_result
+        if isinstance(result, AuthenticationFailed):
+            raise result
+        return result
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+        with _user_cache_lock:
+            user = _user_cache.get(str(user_id))
+
+        if user is None:
+            user = super().get_user(validated_token)
+            with _user_cache_lock:
+                _user_cache[str(user_id)] = user
+        elif api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation depends on the token, so it can't be answered from the cache.
+            user = super().get_user(validated_token)
+
+        # Each request gets its own copy, so views can't mutate the cached instance.
+        return copy.copy(user)
+
+
+# Claims written by MyTokenObtainPairSerializer.get_token
+USER_CLAIMS = ('role', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+class TokenClaimsUser(TokenUser):
+    """
+    User rebuilt from the access token's claims, without a database row.
+    role, email, names and flags come from the token, so changes to them
+    only show up once the client refreshes its token.
+    """
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    @cached_property
+    def id(self):
+        # Same type as User.pk, so comparisons and ORM filters behave alike.
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    def __str__(self):
+        return self.email or str(self.id)
+
+
+class TokenClaimsAuthentication(SharedJWTAuthentication):
+    """
+    Stateless variant used for read-only actions (see
+    apps.core.mixins.TokenClaimsReadMixin). Tokens issued before the
+    claims were added fall back to the regular user lookup.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM in validated_token and all(c in validated_token for c in USER_CLAIMS):
+            user = TokenClaimsUser(validated_token)
+            # Same check as the regular lookup
+            if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                raise AuthenticationFailed("User is inactive", code="user_inactive")
+            return user
+        return super().get_user(validated_token)
+
+    def authenticate(self, request):
+        # Not memoized on the request: the shared result must stay a real User for writes.
+        return JWTAuthentication.authenticate(self, request)
+
+
+def resolve_jwt_user(request):
+    """
+    Returns the user behind the request's bearer token, or None.
+    Never raises: DRF reports invalid tokens when the view runs.
+    """
+    try:
+        result = SharedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
@@ -1,6 +1,7 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from .models import User
+from .authentication import invalidate_cached_user
 from apps.patients.models import Patient
 
 
@@ -24,4 +25,13 @@ def handle_role_change(sender, instance, **kwargs):
                     pass
 
         except User.DoesNotExist:
-            pass
\ No newline at end of file
+            pass
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """
+    Keeps the JWT user cache from serving a stale role or active flag.
+    """
+    invalidate_cached_user(instance.pk)
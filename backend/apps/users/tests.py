@@ -1,3 +1,125 @@
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from apps.patients.models import Patient
+from apps.users.authentication import TokenClaimsAuthentication, TokenClaimsUser, clear_user_cache
+from apps.users.models import User
+from apps.users.serializers import MyTokenObtainPairSerializer
+
+
+class SharedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_user_cache()
+        self.user = User.objects.create_user(
+            email='physio@test.com', password='password123', role='PHYSIO'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_lookups(self, url='/api/users/me/'):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [q for q in ctx.captured_queries if 'FROM "users_user"' in q['sql']]
+
+    def test_token_is_resolved_once_per_request(self):
+        response, lookups = self.user_lookups()
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(response.data['email'], 'physio@test.com')
+
+    def test_cached_user_is_reused_across_requests(self):
+        self.user_lookups()
+        response, lookups = self.user_lookups()
+        self.assertEqual(len(lookups), 0)
+        self.assertEqual(response.data['email'], 'physio@test.com')
+
+    def test_cache_is_invalidated_on_user_update(self):
+        self.user_lookups()
+
+        self.user.first_name = "Updated"
+        self.user.save()
+
+        response, lookups = self.user_lookups()
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(response.data['first_name'], "Updated")
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_user_cache()
+        self.physio = User.objects.create_user(
+            email='physio@test.com', password='password123', role='PHYSIO'
+        )
+        self.patient_user = User.objects.create_user(
+            email='patient@test.com', password='password123', role='PATIENT'
+        )
+        self.patient = Patient.objects.create(
+            user=self.patient_user, first_name="Mario", last_name="Rossi", tax_id="RSSMRA80A01H501U"
+        )
+        Patient.objects.create(first_name="Luigi", last_name="Verdi", tax_id="VRDLGU80A01H501U")
+
+    def authenticate(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_lookups(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, [q for q in ctx.captured_queries if 'FROM "users_user"' in q['sql']]
+
+    def test_list_is_served_from_token_claims(self):
+        self.authenticate(self.physio)
+        response, lookups = self.user_lookups('get', '/api/patients/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(lookups), 0)
+        self.assertEqual(len(response.data), 2)
+
+    def test_patient_scope_is_kept_with_token_claims(self):
+        self.authenticate(self.patient_user)
+        response, lookups = self.user_lookups('get', '/api/patients/')
+        self.assertEqual(len(lookups), 0)
+        self.assertEqual([p['id'] for p in response.data], [str(self.patient.id)])
+
+        response, _ = self.user_lookups('get', '/api/scheduling/appointments/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_load_the_user(self):
+        self.authenticate(self.physio)
+        response, lookups = self.user_lookups('patch', f'/api/patients/{self.patient.id}/', {'phone_number': '123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(lookups), 1)
+
+    def test_inactive_users_are_rejected_from_token_claims(self):
+        # The token claims the user is inactive; no lookup is needed to refuse it
+        self.physio.is_active = False
+        self.authenticate(self.physio)
+
+        response, lookups = self.user_lookups('get', '/api/patients/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(lookups), 0)
+
+    def test_token_claims_carry_the_staff_flags(self):
+        admin = User.objects.create_superuser(email='admin@test.com', password='password123', role='ADMIN')
+        token = MyTokenObtainPairSerializer.get_token(admin).access_token
+
+        user = TokenClaimsAuthentication().get_user(token)
+        self.assertIsInstance(user, TokenClaimsUser)
+        self.assertTrue(user.is_active)
+        self.assertTrue(user.is_staff)
+        self.assertTrue(user.is_superuser)
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        token = RefreshToken.for_user(self.physio).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response, lookups = self.user_lookups('get', '/api/patients/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(len(response.data), 2)
@@ -49,7 +49,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.SharedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -161,6 +161,31 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# In-process cache of users resolved from JWTs (seconds / max entries per worker)
+JWT_USER_CACHE_TTL = 30
+JWT_USER_CACHE_SIZE = 1024
+
+# --- CACHE SETTINGS ---
+# Per-process memory by default; set CACHE_REDIS_URL to share the cache between workers.
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Analytics responses are cached per role; entries are also invalidated when the data changes
+ANALYTICS_CACHE_TIMEOUT = 300
+# How long a worker may hold the recomputation lock before others compute as well
+ANALYTICS_CACHE_LOCK_TIMEOUT = 30
+
 # --- CELERY SETTINGS ---
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
@@ -170,16 +195,84 @@ CELERY_TIMEZONE = "UTC"
 # This prints emails to the terminal instead of sending them.
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Appointments handled per query / mail batch by the reminder task
+REMINDER_CHUNK_SIZE = 500
+# Reminders are queued per appointment; the sweep only picks up those overdue by this many minutes.
+REMINDER_SWEEP_GRACE_MINUTES = 15
+# Reminders due further ahead are queued by the hourly sweep, not when the appointment is booked
+REMINDER_QUEUE_HORIZON_MINUTES = 60
+
+# Patient search results returned by default / at most (?limit=)
+PATIENT_SEARCH_LIMIT = 20
+PATIENT_SEARCH_MAX_LIMIT = 100
+
+# Bulk patient import: rows validated and inserted per batch, per-row errors reported at most
+PATIENT_IMPORT_CHUNK_SIZE = 1000
+PATIENT_IMPORT_MAX_ERRORS = 1000
+
+# Streaming CSV/Parquet exports: rows per database fetch (and per Parquet row group)
+EXPORT_CHUNK_SIZE = 2000
+
+# Upcoming / recent appointments returned by patients/me/ (each)
+PATIENT_PORTAL_APPOINTMENTS = 10
+
+# Opening hours (TIME_ZONE) used by the availability search
+CLINIC_OPEN_WEEKDAYS = [0, 1, 2, 3, 4]
+CLINIC_OPENING_TIME = '09:00'
+CLINIC_CLOSING_TIME = '18:00'
+AVAILABILITY_SLOT_STEP_MINUTES = 15
+# Cached days are also invalidated whenever one of their appointments changes
+AVAILABILITY_CACHE_TIMEOUT = 300
+AVAILABILITY_MAX_DAYS = 31
+
+# No-show model (see apps.analytics.training): versioned artifacts are written here
+NO_SHOW_MODEL_DIR = os.getenv('NO_SHOW_MODEL_DIR', BASE_DIR / 'ml_models')
+NO_SHOW_TRAINING_CHUNK_SIZE = 2000
+NO_SHOW_MIN_TRAINING_ROWS = 50
+# How often a process looks for a newer model (or a first one) in NO_SHOW_MODEL_DIR
+NO_SHOW_MODEL_RELOAD_SECONDS = 300
+
+# Demand forecast: weeks of history used and the smoothing factor (higher = recent weeks weigh more)
+DEMAND_FORECAST_HISTORY_WEEKS = 26
+DEMAND_FORECAST_SMOOTHING = 0.3
+
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
-    'send-reminders-every-30-mins': {
+    'reconcile-reminders-hourly': {
         'task': 'apps.scheduling.tasks.send_appointment_reminders',
-        # Run every 30 minutes
-        'schedule': crontab(minute='*/30'),
+        # Safety net for lost reminder tasks, reminders are queued per appointment
+        'schedule': crontab(minute=0),
+    },
+    'reconcile-dashboard-counters-nightly': {
+        'task': 'apps.analytics.tasks.reconcile_dashboard_counters',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'precompute-demand-forecasts-nightly': {
+        'task': 'apps.analytics.tasks.precompute_demand_forecasts',
+        'schedule': crontab(hour=2, minute=45),
+    },
+    'train-no-show-model-weekly': {
+        'task': 'apps.analytics.tasks.train_no_show_model',
+        'schedule': crontab(hour=4, minute=0, day_of_week=0),
+    },
+    'maintain-audit-log-daily': {
+        'task': 'apps.core.tasks.maintain_audit_log',
+        'schedule': crontab(hour=3, minute=0),
     },
 }
 
+# --- AUDIT LOG SETTINGS ---
+# Entries are buffered per request and written with one bulk insert.
+# Set AUDIT_LOG_ASYNC=True to hand the batches to Celery instead.
+AUDIT_LOG_ASYNC = os.getenv('AUDIT_LOG_ASYNC') == 'True'
+AUDIT_LOG_BUFFER_SIZE = 500
+# What to do when the buffer is full: 'flush' writes early, 'drop' discards new entries.
+AUDIT_LOG_BACKPRESSURE = 'flush'
+# Months kept in the database; older months are archived to gzipped JSON Lines files.
+AUDIT_LOG_RETENTION_MONTHS = 24
+AUDIT_LOG_ARCHIVE_DIR = os.getenv('AUDIT_LOG_ARCHIVE_DIR', BASE_DIR / 'audit_archive')
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/inventory/', include('apps.inventory.urls')),
     path('api/billing/', include('apps.billing.urls')),
     path('api/analytics/', include('apps.analytics.urls')),
+    path('api/audit/', include('apps.core.urls')),
 
 #JWT Auth urls
     #path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
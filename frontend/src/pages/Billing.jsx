@@ -45,7 +45,6 @@ const Billing = () => {
         try {
             const payload = {
                 patient: formData.patient_id,
-                total_amount: parseFloat(formData.amount),
                 status: formData.status,
                 notes: formData.description,
                 issue_date: new Date().toISOString().split('T')[0]
@@ -54,7 +53,11 @@ const Billing = () => {
             if (selectedInvoiceId) {
                 await api.put(`billing/invoices/${selectedInvoiceId}/`, payload);
             } else {
-                await api.post("billing/invoices/", payload);
+                // The total follows the invoice's line items, so the amount is added as one
+                const res = await api.post("billing/invoices/", payload);
+                await api.post(`billing/invoices/${res.data.id}/add-items/`, {
+                    items: [{ description: (formData.description || "Invoice amount").slice(0, 255), unit_price: formData.amount }]
+                });
             }
             fetchInvoices();
             setIsModalOpen(false);
@@ -131,6 +134,7 @@ const Billing = () => {
                         <div>
                             <label className="block text-sm font-medium text-gray-700 mb-1">Amount (€)</label>
                             <input type="number" className="border p-2 rounded w-full" placeholder="0.00" required step="0.01"
+                                disabled={!!selectedInvoiceId}
                                 value={formData.amount} onChange={e => setFormData({...formData, amount: e.target.value})} />
                         </div>
                         <div>
@@ -18,6 +18,8 @@ const Calendar = () => {
     const [services, setServices] = useState([]);
 
     const [selectedEventId, setSelectedEventId] = useState(null);
+    const [visibleRange, setVisibleRange] = useState(null);
+    const [freeSlots, setFreeSlots] = useState([]);
 
     const [formData, setFormData] = useState({
         patient_id: "",
@@ -29,18 +31,32 @@ const Calendar = () => {
     });
 
     const isPhysio = user?.role === 'PHYSIO';
+    const bookingDay = formData.start_time.slice(0, 10);
 
     useEffect(() => {
-        fetchAppointments();
         fetchPatients();
         fetchTherapists();
         fetchServices();
     }, []);
 
+    useEffect(() => {
+        if (isModalOpen && !selectedEventId && formData.service_id && bookingDay) {
+            fetchFreeSlots();
+        } else {
+            setFreeSlots([]);
+        }
+    }, [isModalOpen, selectedEventId, formData.service_id, formData.therapist_id, bookingDay]);
+
 
-    const fetchAppointments = async () => {
+    const fetchAppointments = async (range = visibleRange) => {
+        if (!range) return;
         try {
-            const response = await api.get("scheduling/appointments/");
+            const response = await api.get("scheduling/appointments/", {
+                params: {
+                    start_time__gte: range.start.toISOString(),
+                    start_time__lt: range.end.toISOString()
+                }
+            });
 
             let rawData = response.data;
             if (isPhysio) {
@@ -59,6 +75,29 @@ const Calendar = () => {
         } catch (error) { console.error("Error loading schedule", error); }
     };
 
+    const fetchFreeSlots = async () => {
+        try {
+            const res = await api.get("scheduling/availability/", {
+                params: {
+                    service: formData.service_id,
+                    start: bookingDay,
+                    end: bookingDay,
+                    ...(formData.therapist_id && { therapist: formData.therapist_id })
+                }
+            });
+            setFreeSlots(res.data.slots);
+        } catch (error) { console.error("Error loading availability", error); }
+    };
+
+    const handleSlotPick = (slot) => {
+        setFormData({
+            ...formData,
+            therapist_id: formData.therapist_id || slot.therapists[0],
+            start_time: toLocalInputString(new Date(slot.start_time)),
+            end_time: toLocalInputString(new Date(slot.end_time))
+        });
+    };
+
     const fetchPatients = async () => {
         try {
             const res = await api.get("patients/");
@@ -94,6 +133,12 @@ const Calendar = () => {
     };
 
 
+    const handleDatesSet = (arg) => {
+        const range = { start: arg.start, end: arg.end };
+        setVisibleRange(range);
+        fetchAppointments(range);
+    };
+
     const handleDateClick = (arg) => {
         setSelectedEventId(null);
 
@@ -168,6 +213,11 @@ const Calendar = () => {
             fetchAppointments();
             setIsModalOpen(false);
         } catch (error) {
+            if (error.response?.status === 409) {
+                const booked = error.response.data.conflicts.map(c => c.resource).join(" and ");
+                alert(`The ${booked} ${error.response.data.conflicts.length > 1 ? "are" : "is"} already booked at that time.`);
+                return;
+            }
             alert(`Error: ${JSON.stringify(error.response?.data || "Check fields")}`);
             console.error(error);
         }
@@ -201,6 +251,7 @@ const Calendar = () => {
                     // FIX 3: Prevent Overlapping Visuals
                     slotEventOverlap={false}
                     events={events}
+                    datesSet={handleDatesSet}
                     dateClick={handleDateClick}
                     eventClick={handleEventClick}
                     height="75vh"
@@ -271,6 +322,21 @@ const Calendar = () => {
                         </div>
                     </div>
 
+                    {/* FREE SLOTS (new bookings only) */}
+                    {freeSlots.length > 0 && (
+                        <div>
+                            <label className="block text-sm font-medium text-gray-700 mb-1">Free slots on {bookingDay}</label>
+                            <div className="flex flex-wrap gap-2 max-h-24 overflow-y-auto">
+                                {freeSlots.map(slot => (
+                                    <button type="button" key={slot.start_time} onClick={() => handleSlotPick(slot)}
+                                        className="px-2 py-1 text-sm rounded border border-green-300 bg-green-50 text-green-700 hover:bg-green-100">
+                                        {new Date(slot.start_time).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                                    </button>
+                                ))}
+                            </div>
+                        </div>
+                    )}
+
                     <div>
                         <label className="block text-sm font-medium text-gray-700 mb-1">Notes</label>
                         <textarea placeholder="Session Notes" className="border p-2 rounded w-full" rows="3"
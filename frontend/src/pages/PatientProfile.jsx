@@ -25,33 +25,27 @@ const PatientProfile = () => {
 
     useEffect(() => {
         if (user) {
-            fetchMyPatientProfile();
-            fetchMyAppointments();
+            fetchMyProfile();
             fetchServices();
         }
     }, [user]);
 
-    const fetchMyPatientProfile = async () => {
+    // Profile and appointments come from one call
+    const fetchMyProfile = async () => {
         try {
-            const res = await api.get(`patients/?search=${user.email}`);
-            if (res.data && res.data.length > 0) {
-                const p = res.data[0];
-                setPatientData(p);
-                setEditFormData({
-                    phone_number: p.phone_number || "",
-                    date_of_birth: p.date_of_birth || "",
-                    gender: p.gender || "O"
-                });
-            }
-        } catch (error) { console.error("Could not find patient profile", error); }
-    };
-
-    const fetchMyAppointments = async () => {
-        try {
-            const res = await api.get("scheduling/appointments/");
-            const sorted = res.data.sort((a, b) => new Date(b.start_time) - new Date(a.start_time));
+            const res = await api.get("patients/me/");
+            const p = res.data.profile;
+            setPatientData(p);
+            setEditFormData({
+                phone_number: p.phone_number || "",
+                date_of_birth: p.date_of_birth || "",
+                gender: p.gender || "O"
+            });
+
+            const sorted = [...res.data.upcoming, ...res.data.recent]
+                .sort((a, b) => new Date(b.start_time) - new Date(a.start_time));
             setAppointments(sorted);
-        } catch (error) { console.error("Error fetching appointments", error); }
+        } catch (error) { console.error("Could not find patient profile", error); }
     };
 
     const fetchServices = async () => {